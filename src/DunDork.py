@@ -2,7 +2,6 @@
 
 from __future__ import annotations
 
-import random
 import re
 import tkinter as tk
 import importlib.util
@@ -10,11 +9,14 @@ import subprocess
 import shutil
 import threading
 import queue
-import json
 from pathlib import Path
-from types import SimpleNamespace
 from tkinter import messagebox, scrolledtext, simpledialog, ttk
 
+try:
+    from PIL import Image, ImageDraw, ImageFont, ImageTk
+except ImportError:  # Pillow is optional; without it the minimap draws glyphs as canvas text.
+    Image = None
+
 try:
     import DunDorkCore as core
 except ModuleNotFoundError:
@@ -26,6 +28,129 @@ except ModuleNotFoundError:
 
 ANSI_RE = re.compile(r"\x1b\[[0-9;]*m")
 
+# Minimap canvas items by key kind: (item type, stacking layer). Layers are listed bottom first.
+MINIMAP_LAYERS = ("link", "tile", "mark", "label", "overlay")
+MINIMAP_ITEM_KINDS = {
+    "link": ("line", "link"),
+    "tile": ("rectangle", "tile"),
+    "image": ("image", "tile"),
+    "glyph": ("text", "mark"),
+    "glyph_image": ("image", "mark"),
+    "room_id": ("text", "mark"),
+    "label": ("text", "label"),
+    "sealed": ("line", "overlay"),
+    "lock": ("text", "overlay"),
+    "status": ("text", "overlay"),
+}
+
+# The chronicle widget keeps only its newest lines; the full history goes to chronicle.log.
+LOG_MAX_LINES = 2000
+CHRONICLE_MAX_BYTES = 1 << 20
+
+EMOJI_FAMILY = "Apple Color Emoji"
+# Emoji font files Pillow may find in the system font folders (macOS, Linux, Windows).
+EMOJI_FONT_FILES = ("Apple Color Emoji.ttc", "NotoColorEmoji.ttf", "seguiemj.ttf")
+# Colour emoji fonts are often bitmap-only; these are the strike sizes they ship.
+EMOJI_STRIKE_SIZES = (109, 160, 96, 64, 48)
+
+
+class TileCache:
+    """Minimap tiles rendered once with Pillow and reused as images.
+
+    A tile is the room square plus the emoji glyphs drawn on it, keyed by
+    colour, size and glyphs. Glyphs that are not emoji, or would be clipped
+    at the tile's edge, are handed back; glyph() has images for the emoji
+    among them and the rest are canvas text. Without Pillow or an emoji font
+    every glyph is text, so the map still works everywhere.
+    """
+
+    def __init__(self, master=None):
+        self.master = master
+        self.pixels_per_point = master.winfo_fpixels("1p") if master is not None else 96 / 72
+        self.tiles = {}
+        self.look = None
+        self.fonts = {}
+        self.font_file = None
+        if Image is not None:
+            self.font_file = next((name for name in EMOJI_FONT_FILES if self._open_font(name, 64)), None)
+
+    @staticmethod
+    def _open_font(name, pixels):
+        for size in (pixels, *EMOJI_STRIKE_SIZES):
+            try:
+                return ImageFont.truetype(name, size)
+            except OSError:
+                continue
+        return None
+
+    def invalidate(self, *look):
+        """Drop every tile when the look (theme, avatar, tile size) changes."""
+        if look != self.look:
+            self.tiles.clear()
+            self.look = look
+
+    def tile(self, color, size, glyphs):
+        """Return (image or None, glyphs left for the canvas) for a tile of half-width size.
+
+        glyphs is a list of (dx, dy, text, font) drawn centred at that offset.
+        """
+        if self.font_file is None:
+            return None, glyphs
+        key = (color, size, tuple(glyphs))
+        if key not in self.tiles:
+            image, rest = self.render(color, size, glyphs)
+            self.tiles[key] = (ImageTk.PhotoImage(image, master=self.master), rest)
+        return self.tiles[key]
+
+    def glyph(self, text, font):
+        """Return an image of one emoji glyph, or None if it has to be canvas text."""
+        if self.font_file is None or not self._is_emoji(text, font):
+            return None
+        key = (text, font)
+        if key not in self.tiles:
+            self.tiles[key] = ImageTk.PhotoImage(self._glyph(text, self._pixels(font)), master=self.master)
+        return self.tiles[key]
+
+    def render(self, color, size, glyphs):
+        """Draw a tile into a Pillow image; return it with the glyphs it left out."""
+        image = Image.new("RGBA", (size * 2 + 1, size * 2 + 1))
+        ImageDraw.Draw(image).rectangle((0, 0, size * 2, size * 2), fill=color, outline="#dbe5f0", width=2)
+        rest = []
+        for glyph in glyphs:
+            dx, dy, text, font = glyph
+            if not self._is_emoji(text, font):
+                rest.append(glyph)
+                continue
+            mark = self._glyph(text, self._pixels(font))
+            x = int(size + dx) - mark.width // 2
+            y = int(size + dy) - mark.height // 2
+            if x < 0 or y < 0 or x + mark.width > image.width or y + mark.height > image.height:
+                # Would be clipped, like the item badge on the smallest tiles.
+                rest.append(glyph)
+                continue
+            image.paste(mark, (x, y), mark)
+        return image, rest
+
+    @staticmethod
+    def _is_emoji(text, font):
+        return font[0] == EMOJI_FAMILY and any(ord(ch) >= 0x2000 for ch in text)
+
+    def _pixels(self, font):
+        return round(font[1] * self.pixels_per_point)
+
+    def _glyph(self, text, pixels):
+        font = self.fonts.get(pixels)
+        if font is None:
+            font = self.fonts[pixels] = self._open_font(self.font_file, pixels)
+        left, top, right, bottom = font.getbbox(text)
+        mark = Image.new("RGBA", (max(1, right - left), max(1, bottom - top)))
+        ImageDraw.Draw(mark).text((-left, -top), text, font=font, fill="white", embedded_color=True)
+        if font.size != pixels:
+            # Bitmap strike: scale the glyph to the size the canvas font would have.
+            scale = pixels / font.size
+            mark = mark.resize((max(1, round(mark.width * scale)), max(1, round(mark.height * scale))), Image.LANCZOS)
+        return mark
+
 
 class DorkTkApp:
     def __init__(self, root: tk.Tk):
@@ -38,6 +163,8 @@ class DorkTkApp:
         self.show_room_ids = False
         self.closing = False
         self.map_x_offset = 0
+        self.minimap_items: dict[tuple, list] = {}
+        self.tile_cache = TileCache(self.root)
         self.player_avatar = "🙂"
         self.emoji_theme = True
         self.voice_enabled = False
@@ -50,7 +177,17 @@ class DorkTkApp:
         self.base_dir = Path(__file__).resolve().parent
         self.data_dir = self.base_dir / "data"
         self.meta_path = self.data_dir / "meta.json"
-        self.save_path = self.data_dir / "savegame.json"
+        self.save_path = self.data_dir / "savegame.dork"
+        self.legacy_save_path = self.data_dir / "savegame.json"
+        self.chronicle_path = self.data_dir / "chronicle.log"
+        self.output_buffer: list[tuple[str, str]] | None = None
+        self.journal = core.SaveJournal(
+            self.save_path,
+            self.data_dir / "savegame.journal",
+            data_dir=self.data_dir,
+            world_cache=self.data_dir / "world.cache",
+        )
+        self.save_writer = core.SaveWriter(self.journal)
         self.theme = {
             "bg": "#2b2218",
             "panel": "#d8ccb5",
@@ -72,7 +209,7 @@ class DorkTkApp:
         self.player_avatar = self._default_avatar_emoji(self.player.player_class)
         self.root.protocol("WM_DELETE_WINDOW", self._shutdown)
 
-        self.player.play_game()
+        self.player.begin_session()
         self.refresh_views()
 
     def _center_window(self):
@@ -88,13 +225,25 @@ class DorkTkApp:
         if saved:
             resume = messagebox.askyesno("Resume Run", "A saved run was found. Resume it?", parent=self.root)
             if resume:
+                if saved.get("version") == core.RUN_STATE_VERSION:
+                    return core.load_state(
+                        saved,
+                        self.data_dir,
+                        world_cache=self.data_dir / "world.cache",
+                        meta_path=self.meta_path,
+                        input_func=self._game_input,
+                        output_func=None,
+                        sinks=[self._game_event],
+                        show_ascii_minimap=False,
+                        interface_mode="ui",
+                    )
                 return self._build_player_from_save(saved)
+            self._clear_save_slot()
 
         return self._build_new_player()
 
     def _build_new_player(self):
         meta = core.load_meta(self.meta_path)
-        mutator = core.choose_mutator()
         unlocked = meta.get("unlocked_classes", ["adventurer"])
         default_class = meta.get("last_class", "adventurer")
         chosen = simpledialog.askstring(
@@ -107,29 +256,23 @@ class DorkTkApp:
         if player_class not in unlocked:
             player_class = default_class
 
-        gens = core.genlocs_from_file(self.data_dir / "genlocs.csv")
-        npcs = core.npcs_from_file(self.data_dir / "npcs.csv")
-        objs = core.objects_from_file(self.data_dir / "objects.csv")
-        locs = core.locations_from_file(self.data_dir / "locations.csv", gens)
-        core.prepare_world(locs, objs, npcs)
-
-        return core.Player(
-            locs,
-            objs,
-            npcs,
+        return core.new_run(
+            player_class=player_class,
             meta=meta,
+            data_dir=self.data_dir,
+            record=True,
+            world_cache=self.data_dir / "world.cache",
             meta_path=self.meta_path,
-            mutator=mutator,
-            player_class=player_class,
             input_func=self._game_input,
-            output_func=self._game_output,
+            output_func=None,
+            sinks=[self._game_event],
             show_ascii_minimap=False,
             interface_mode="ui",
         )
 
     def _build_player_from_save(self, saved):
-        locs = [
-            SimpleNamespace(
+        locs = core.RoomSet.from_fields(
+            dict(
                 ID=row["id"],
                 N=row["n"],
                 S=row["s"],
@@ -145,9 +288,9 @@ class DorkTkApp:
                 SecretSolved=row.get("secret_solved", False),
             )
             for row in saved.get("locs", [])
-        ]
+        )
         objs = [
-            SimpleNamespace(
+            core.Object.from_fields(
                 ID=row["id"],
                 Name=row["name"],
                 Desc=row["desc"],
@@ -157,7 +300,7 @@ class DorkTkApp:
             for row in saved.get("objs", [])
         ]
         npcs = [
-            SimpleNamespace(
+            core.NPC.from_fields(
                 ID=row["id"],
                 Name=row["name"],
                 Desc=row["desc"],
@@ -176,7 +319,11 @@ class DorkTkApp:
             for row in saved.get("npcs", [])
         ]
         meta = saved.get("meta") or core.load_meta(self.meta_path)
-        mutator = saved.get("mutator") or core.choose_mutator()
+        rng = core.GameRandom(saved.get("seed"))
+        if saved.get("rng_state"):
+            version, internal, gauss_next = saved["rng_state"]
+            rng.setstate((version, tuple(internal), gauss_next))
+        mutator = saved.get("mutator") or core.choose_mutator(rng)
         player_class = saved.get("player_class", meta.get("last_class", "adventurer"))
 
         player = core.Player(
@@ -188,9 +335,11 @@ class DorkTkApp:
             mutator=mutator,
             player_class=player_class,
             input_func=self._game_input,
-            output_func=self._game_output,
+            output_func=None,
+            sinks=[self._game_event],
             show_ascii_minimap=False,
             interface_mode="ui",
+            rng=rng,
         )
 
         state = saved.get("player", {})
@@ -212,121 +361,39 @@ class DorkTkApp:
         player.revealed_rooms = set(state.get("revealed_rooms", [player.current_loc]))
         player.hunter_awake = state.get("hunter_awake", False)
         player.timed_block = dict(state.get("timed_block", player.timed_block))
+        if player.timed_block["ttl"] > 0:
+            player.routes.disable_edge(player.timed_block["loc"], player.timed_block["dir"])
         player.turn_count = state.get("turn_count", 0)
         player.required_artifacts = set(state.get("required_artifacts", [2, 3, 4]))
         player.quests = list(state.get("quests", player.quests))
 
-        player.loc_by_id = {l.ID: l for l in player.locs}
-        player.obj_by_id = {o.ID: o for o in player.objs}
         player.npc_by_id = {n.ID: n for n in player.npcs}
         pending_id = state.get("pending_encounter_id")
         player.pending_encounter = player.npc_by_id.get(pending_id) if pending_id is not None else None
+        if saved.get("replay"):
+            player.replay = core.Replay.from_dict(saved["replay"])
         return player
 
     def _read_save_slot(self):
-        if not self.save_path.exists():
-            return None
-        try:
-            with open(self.save_path, "r", encoding="utf-8") as handle:
-                return json.load(handle)
-        except (OSError, json.JSONDecodeError):
-            return None
+        saved = self.journal.load()
+        if saved is None:
+            legacy = core.SaveJournal(self.legacy_save_path, self.journal.journal_path, data_dir=self.data_dir)
+            saved = legacy.load()
+        return saved
 
     def _save_game_slot(self):
         if not hasattr(self, "player"):
             return
-        player = self.player
         try:
             self.data_dir.mkdir(parents=True, exist_ok=True)
         except OSError:
             return
-        payload = {
-            "version": 1,
-            "player_class": player.player_class,
-            "mutator": player.mutator,
-            "meta": player.meta,
-            "player": {
-                "backpack": list(player.backpack),
-                "current_loc": player.current_loc,
-                "previous_loc": player.previous_loc,
-                "health": player.health,
-                "max_health": player.max_health,
-                "game_over": player.game_over,
-                "new_location": player.new_location,
-                "told_story": player.told_story,
-                "xp": player.xp,
-                "perks": dict(player.perks),
-                "map_boost_active": player.map_boost_active,
-                "lore_seen": sorted(player.lore_seen),
-                "defeated_npcs": sorted(player.defeated_npcs),
-                "combat_log": list(player.combat_log),
-                "reputation": dict(player.reputation),
-                "revealed_rooms": sorted(player.revealed_rooms),
-                "hunter_awake": player.hunter_awake,
-                "timed_block": dict(player.timed_block),
-                "turn_count": player.turn_count,
-                "required_artifacts": sorted(player.required_artifacts),
-                "quests": list(player.quests),
-                "pending_encounter_id": player.pending_encounter.ID if player.pending_encounter else None,
-            },
-            "locs": [
-                {
-                    "id": loc.ID,
-                    "n": loc.N,
-                    "s": loc.S,
-                    "e": loc.E,
-                    "w": loc.W,
-                    "is_dark": getattr(loc, "IsDark", 0),
-                    "story": loc.Story,
-                    "desc": loc.Desc,
-                    "object_id": loc.ObjectID,
-                    "npc_id": getattr(loc, "NpcID", 0),
-                    "tag": getattr(loc, "Tag", "safe"),
-                    "event_resolved": getattr(loc, "EventResolved", False),
-                    "secret_solved": getattr(loc, "SecretSolved", False),
-                }
-                for loc in player.locs
-            ],
-            "objs": [
-                {
-                    "id": obj.ID,
-                    "name": obj.Name,
-                    "desc": obj.Desc,
-                    "story": getattr(obj, "Story", ""),
-                    "required_to_win": getattr(obj, "RequiredToWin", ""),
-                }
-                for obj in player.objs
-            ],
-            "npcs": [
-                {
-                    "id": npc.ID,
-                    "name": npc.Name,
-                    "desc": npc.Desc,
-                    "object_id": npc.ObjectID,
-                    "can_move": getattr(npc, "CanMove", ""),
-                    "start_loc": getattr(npc, "StartLocationID", 0),
-                    "current_loc": getattr(npc, "CurrentLocationID", 0),
-                    "hostile": getattr(npc, "Hostile", True),
-                    "patrol": list(getattr(npc, "Patrol", [])),
-                    "is_boss": getattr(npc, "IsBoss", False),
-                    "hp": getattr(npc, "HP", 40),
-                    "max_hp": getattr(npc, "MaxHP", 40),
-                    "phase": getattr(npc, "Phase", 1),
-                    "telegraph": getattr(npc, "Telegraph", None),
-                }
-                for npc in player.npcs
-            ],
-        }
-        try:
-            with open(self.save_path, "w", encoding="utf-8") as handle:
-                json.dump(payload, handle, indent=2)
-        except OSError:
-            pass
+        self.save_writer.submit(core.save_state(self.player))
 
     def _clear_save_slot(self):
+        self.save_writer.clear()
         try:
-            if self.save_path.exists():
-                self.save_path.unlink()
+            self.legacy_save_path.unlink(missing_ok=True)
         except OSError:
             pass
 
@@ -741,25 +808,59 @@ class DorkTkApp:
         }
         return plain.get(key, key)
 
-    def _game_output(self, message, is_user=False):
-        text = self._strip_ansi(str(message))
+    def _game_event(self, event):
+        self._game_output(event.text, speech=event.speech)
+
+    def _game_output(self, message, is_user=False, speech=None):
+        text = str(message)
         if text and set(text) == {"-"} and len(text) > 50:
             text = "-" * 42
         if not hasattr(self, "log"):
             return
         formatted = text
-        self.log.configure(state="normal")
         tag = "user" if is_user else "system"
-        self.log.insert("end", formatted + "\n\n", tag)
+        if self.output_buffer is None:
+            self._write_output([(formatted, tag)])
+        else:
+            self.output_buffer.append((formatted, tag))
+        if not is_user:
+            self._queue_voice(speech or formatted)
+
+    def _flush_output(self):
+        if self.output_buffer:
+            self._write_output(self.output_buffer)
+            self.output_buffer.clear()
+
+    def _write_output(self, entries):
+        """Add (text, tag) entries to the chronicle in one insert, trimming the oldest lines."""
+        chunks = []
+        for text, tag in entries:
+            chunks += [text + "\n\n", tag]
+        self.log.configure(state="normal")
+        self.log.insert("end", *chunks)
+        excess = int(self.log.index("end-1c").split(".")[0]) - LOG_MAX_LINES
+        if excess > 0:
+            self.log.delete("1.0", f"{excess + 1}.0")
         self.log.see("end")
         self.log.configure(state="disabled")
-        if not is_user:
-            self._queue_voice(formatted)
+        self._append_chronicle(entries)
+
+    def _append_chronicle(self, entries):
+        try:
+            with open(self.chronicle_path, "a", encoding="utf-8") as handle:
+                handle.writelines(f"> {text}\n" if tag == "user" else f"{text}\n" for text, tag in entries)
+                size = handle.tell()
+            if size > CHRONICLE_MAX_BYTES:
+                self.chronicle_path.replace(Path(f"{self.chronicle_path}.1"))
+        except OSError:
+            pass
 
     def _game_input(self, prompt: str) -> str:
         if self.command_queue:
             return self.command_queue.pop(0)
 
+        # Show what the command has printed so far before asking about it.
+        self._flush_output()
         prompt = self._strip_ansi(prompt)
         lower = prompt.lower()
         if "y/n" in lower or "are you sure" in lower:
@@ -792,48 +893,32 @@ class DorkTkApp:
     def _send_command(self, command: str):
         if self.player.game_over:
             return
+        self.output_buffer = []
+        try:
+            self._run_command(command)
+        finally:
+            self._flush_output()
+            self.output_buffer = None
 
+    def _run_command(self, command: str):
         before = self._snapshot_state()
         self._game_output(command, is_user=True)
         util_cmd = command.strip().lower()
 
-        if self.player.pending_encounter:
-            if util_cmd in {"i", "inventory", "backpack"}:
-                self._game_output("[UI] Inventory is shown in the panel on the right.")
-                self.refresh_views()
-                return
-            if util_cmd == "status":
-                self._game_output("[UI] Status is shown at the top of the right panel.")
-                self.refresh_views()
-                return
-            if util_cmd in {"h", "help", "?"}:
-                self.player.show_instructions()
-                self.refresh_views()
-                return
-
-            self.command_queue.append(command)
-            self.player.handle_encounter_turn()
-        else:
-            if util_cmd in {"i", "inventory", "backpack"}:
-                self._game_output("[UI] Inventory is shown in the panel on the right.")
-                self.refresh_views()
-                return
-            if util_cmd == "status":
-                self._game_output("[UI] Status is shown at the top of the right panel.")
-                self.refresh_views()
-                return
-            verb, args = self.player.parse_command(command)
-            acted = self.player.execute_command(verb, args)
-            if acted and not self.player.game_over:
-                self.player.turn_count += 1
-                self.player.spawn_timed_events()
-                self.player.move_npcs()
-                self.player.apply_end_of_turn_effects()
-                self.player.check_player_death()
-                if self.player.new_location and not self.player.game_over:
-                    self.player.play_game()
-            else:
-                self.player.check_player_death()
+        if util_cmd in {"i", "inventory", "backpack"}:
+            self._game_output("[UI] Inventory is shown in the panel on the right.")
+            self.refresh_views()
+            return
+        if util_cmd == "status":
+            self._game_output("[UI] Status is shown at the top of the right panel.")
+            self.refresh_views()
+            return
+        if self.player.pending_encounter and util_cmd in {"h", "help", "?"}:
+            self.player.show_instructions()
+            self.refresh_views()
+            return
+
+        self.player.run_command(command)
 
         after = self._snapshot_state()
         self._emit_state_delta(before, after, command)
@@ -854,6 +939,7 @@ class DorkTkApp:
                 self._clear_save_slot()
             else:
                 self._save_game_slot()
+        self.save_writer.close()
         try:
             self.voice_queue.put(None)
         except Exception:
@@ -972,11 +1058,7 @@ class DorkTkApp:
                 label = f"{self._item_emoji(obj.ID)} {obj.Name}" if self.emoji_theme else obj.Name
                 parts.append(f"Here: {label}")
 
-        npcs_here = [
-            npc
-            for npc in self.player.npcs
-            if npc.CurrentLocationID == self.player.current_loc and npc.ID not in self.player.defeated_npcs
-        ]
+        npcs_here = self.player.npcs_in_room(self.player.current_loc)
         if npcs_here:
             hostile = any(npc.Hostile for npc in npcs_here)
             if hostile:
@@ -1038,10 +1120,7 @@ class DorkTkApp:
             return "@"
         if loc_id not in self.player.revealed_rooms:
             return "?"
-        if any(
-            npc.Hostile and npc.CurrentLocationID == loc_id and npc.ID not in self.player.defeated_npcs
-            for npc in self.player.npcs
-        ):
+        if self.player.hostile_npcs_in_room(loc_id):
             return "!"
         loc = self.player.location(loc_id)
         if loc.ObjectID:
@@ -1050,11 +1129,8 @@ class DorkTkApp:
             return "."
         return "?"
 
-    def _draw_cell(self, cx, cy, token, label, size):
-        x1 = cx - size
-        y1 = cy - size
-        x2 = cx + size
-        y2 = cy + size
+    def _cell_items(self, scene, slot, cx, cy, token, label, size):
+        """Add the canvas items for the tile in slot ("@", "N", "W", "E" or "S") to scene."""
         color = {
             "@": "#4c7b4a",
             "!": "#8f3e32",
@@ -1063,50 +1139,81 @@ class DorkTkApp:
             "?": "#6f6458",
             "#": "#3b332a",
         }[token]
-        self.canvas.create_rectangle(x1, y1, x2, y2, fill=color, outline="#dbe5f0", width=2)
+        emoji_font = (EMOJI_FAMILY, 24)
+        glyphs = []
         if token == "#":
             # Fill wall tiles with a brick pattern so blocked rooms feel solid.
             cols = 3
             rows = 3
             x_step = (size * 2) / (cols + 1)
             y_step = (size * 2) / (rows + 1)
-            start_x = cx - size + x_step
-            start_y = cy - size + y_step
             for r in range(rows):
                 for c in range(cols):
-                    self.canvas.create_text(
-                        start_x + (c * x_step),
-                        start_y + (r * y_step),
-                        text="🧱",
-                        fill="white",
-                        font=("Apple Color Emoji", 14),
-                    )
-            return
-        loc = self.player.location(label) if label else None
-        item_id = loc.ObjectID if loc else 0
-        if self.emoji_theme:
-            marker = self._token_emoji(token, item_id=item_id)
-            self.canvas.create_text(cx, cy, text=marker, fill="white", font=("Apple Color Emoji", 24))
+                    glyphs.append((x_step * (c + 1) - size, y_step * (r + 1) - size, "🧱", (EMOJI_FAMILY, 14)))
+        else:
+            loc = self.player.location(label) if label else None
+            item_id = loc.ObjectID if loc else 0
+            if self.emoji_theme:
+                glyphs.append((0, 0, self._token_emoji(token, item_id=item_id), emoji_font))
+            elif token == "@":
+                glyphs.append((0, 0, self.player_avatar, emoji_font))
+            elif item_id and token in {"*", "."}:
+                glyphs.append((0, 0, self._item_emoji(item_id), emoji_font))
+            else:
+                glyphs.append((0, 0, token, ("Courier", 22, "bold")))
             if token == "@" and item_id:
-                self.canvas.create_text(
-                    cx + 26, cy - 26, text=self._item_emoji(item_id), fill="white", font=("Apple Color Emoji", 14)
-                )
-        elif token == "@":
-            self.canvas.create_text(cx, cy, text=self.player_avatar, fill="white", font=("Apple Color Emoji", 24))
-            if item_id:
-                self.canvas.create_text(cx + 26, cy - 26, text=self._item_emoji(item_id), fill="white", font=("Apple Color Emoji", 14))
-        elif item_id and token in {"*", "."}:
-            item_emoji = self._item_emoji(item_id)
-            self.canvas.create_text(cx, cy, text=item_emoji, fill="white", font=("Apple Color Emoji", 24))
+                glyphs.append((26, -26, self._item_emoji(item_id), (EMOJI_FAMILY, 14)))
+        image, glyphs = self.tile_cache.tile(color, size, glyphs)
+        if image is not None:
+            scene[("image", slot)] = ((cx, cy), {"image": image})
         else:
-            self.canvas.create_text(cx, cy, text=token, fill="white", font=("Courier", 22, "bold"))
-        if self.show_room_ids:
-            self.canvas.create_text(cx, cy + 20, text=f"{label:03d}", fill="#dbe5f0", font=("Courier", 9, "bold"))
+            scene[("tile", slot)] = ((cx - size, cy - size, cx + size, cy + size), {"fill": color, "outline": "#dbe5f0", "width": 2})
+        for index, (dx, dy, text, font) in enumerate(glyphs):
+            glyph = self.tile_cache.glyph(text, font)
+            if glyph is not None:
+                scene[("glyph_image", slot, index)] = ((cx + dx, cy + dy), {"image": glyph})
+            else:
+                scene[("glyph", slot, index)] = ((cx + dx, cy + dy), {"text": text, "fill": "white", "font": font})
+        if self.show_room_ids and token != "#":
+            scene[("room_id", slot)] = ((cx, cy + 20), {"text": f"{label:03d}", "fill": "#dbe5f0", "font": ("Courier", 9, "bold")})
+
+    def _sync_minimap(self, scene):
+        """Bring the pooled minimap items in line with scene.
+
+        Items are created the first time their key appears and hidden, not
+        deleted, when it drops out; otherwise only changed coordinates and
+        options reach the canvas, so an unchanged map costs no Tk calls.
+        """
+        created = False
+        for key, (coords, options) in scene.items():
+            options = dict(options, state="normal")
+            entry = self.minimap_items.get(key)
+            if entry is None:
+                kind, layer = MINIMAP_ITEM_KINDS[key[0]]
+                item = getattr(self.canvas, f"create_{kind}")(*coords, tags=(f"minimap-{layer}",), **options)
+                self.minimap_items[key] = [item, coords, options]
+                created = True
+                continue
+            item, shown_coords, shown = entry
+            if coords != shown_coords:
+                self.canvas.coords(item, *coords)
+                entry[1] = coords
+            changed = {name: value for name, value in options.items() if shown.get(name) != value}
+            if changed:
+                self.canvas.itemconfigure(item, **changed)
+                shown.update(changed)
+        for key, (item, _coords, shown) in self.minimap_items.items():
+            if key not in scene and shown["state"] != "hidden":
+                self.canvas.itemconfigure(item, state="hidden")
+                shown["state"] = "hidden"
+        if created:
+            # New items land on top of the stack; restore the layer order.
+            for layer in MINIMAP_LAYERS:
+                self.canvas.tag_raise(f"minimap-{layer}")
 
     def _draw_minimap(self):
         if not hasattr(self, "player"):
             return
-        self.canvas.delete("all")
         loc = self.player.location()
         blocked = self.player.get_blocked_direction()
         width = max(self.canvas.winfo_width(), 500)
@@ -1126,6 +1233,7 @@ class DorkTkApp:
         center_spacing = (tile_half * 2) + gap_between_tiles
         cx = (width // 2) + self.map_x_offset
         cy = (height - bottom_pad + top_pad) // 2
+        self.tile_cache.invalidate(self.emoji_theme, self.player_avatar, tile_half)
 
         neighbors = {
             "N": (cx, cy - center_spacing, loc.N),
@@ -1145,48 +1253,46 @@ class DorkTkApp:
         if loc.E:
             connector_segments["E"] = (cx + tile_half, cy, cx + center_spacing - tile_half, cy)
 
-        for seg in connector_segments.values():
-            self.canvas.create_line(*seg, fill="#dbe5f0", width=3)
+        scene = {}
+        for key, seg in connector_segments.items():
+            scene[("link", key)] = (seg, {"fill": "#dbe5f0", "width": 3})
 
-        # Draw current room first.
-        self._draw_cell(cx, cy, "@", self.player.current_loc, tile_half)
+        self._cell_items(scene, "@", cx, cy, "@", self.player.current_loc, tile_half)
 
         for key, (x, y, room_id) in neighbors.items():
             if not room_id:
                 continue
             token = self._room_kind(room_id)
-            self._draw_cell(x, y, token, room_id or 0, tile_half)
+            self._cell_items(scene, key, x, y, token, room_id or 0, tile_half)
             label_y = y + tile_half + 24 if key == "S" else y - tile_half - 22
             if blocked == key:
                 label_text = f"{key} 🔒" if self.emoji_theme else f"{key} (sealed)"
             else:
                 label_text = key
             label_color = "#ffcc66" if blocked == key else "#dbe5f0"
-            self.canvas.create_text(x, label_y, text=label_text, fill=label_color, font=("Helvetica", 9, "bold"))
+            scene[("label", key)] = ((x, label_y), {"text": label_text, "fill": label_color, "font": ("Helvetica", 9, "bold")})
 
         if blocked in connector_segments:
-            self.canvas.create_line(*connector_segments[blocked], fill="#ffcc66", width=5, dash=(6, 4))
+            scene[("sealed",)] = (connector_segments[blocked], {"fill": "#ffcc66", "width": 5, "dash": (6, 4)})
             x1, y1, x2, y2 = connector_segments[blocked]
             lock_x = (x1 + x2) / 2
             lock_y = (y1 + y2) / 2
             lock_text = "🔒" if self.emoji_theme else "LOCK"
             lock_font = ("Apple Color Emoji", 14) if self.emoji_theme else ("Helvetica", 9, "bold")
-            self.canvas.create_text(lock_x, lock_y, text=lock_text, fill="#ffcc66", font=lock_font)
-
-        if blocked:
-            self.canvas.create_text(
-                cx,
-                height - 16,
-                text=f"Blocked direction: {blocked}",
-                fill="#ffcc66",
-                font=("Helvetica", 10, "bold"),
-            )
-        else:
-            self.canvas.create_text(cx, height - 16, text="", fill="#dbe5f0", font=("Helvetica", 10, "bold"))
+            scene[("lock",)] = ((lock_x, lock_y), {"text": lock_text, "fill": "#ffcc66", "font": lock_font})
+
+        scene[("status",)] = (
+            (cx, height - 16),
+            {
+                "text": f"Blocked direction: {blocked}" if blocked else "",
+                "fill": "#ffcc66" if blocked else "#dbe5f0",
+                "font": ("Helvetica", 10, "bold"),
+            },
+        )
+        self._sync_minimap(scene)
 
 
 def main():
-    random.seed()
     root = tk.Tk()
     DorkTkApp(root)
     root.mainloop()
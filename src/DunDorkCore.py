@@ -2,13 +2,42 @@
 Copyright 2021 (c) JamesBurchill.com
 """
 
+import argparse
+import contextlib
+import copy
 import csv
+import functools
+import hashlib
+import heapq
 import json
+import logging
+import marshal
+import math
+import os
 import random
+import secrets
+import sqlite3
+import struct
+import threading
 import time
-from collections import deque
+import zlib
+from array import array
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+log = logging.getLogger("DunDorkCore")
+
+CLASSES = ("adventurer", "fighter", "scout", "scholar")
 
 DIRECTION_ALIASES = {
     "N": "N",
@@ -31,6 +60,59 @@ COLORS = {
 }
 
 
+class GameRandom(random.Random):
+    """Random generator owned by one run; run_seed reproduces it from the start."""
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.SystemRandom().randrange(2**63)
+        self.run_seed = seed
+        super().__init__(seed)
+
+    def __reduce__(self):
+        return self.__class__, (self.run_seed,), self.getstate()
+
+    def __copy__(self):
+        clone = self.__class__.__new__(self.__class__)
+        clone.run_seed = self.run_seed
+        clone.setstate(self.getstate())
+        return clone
+
+
+class GameEvent:
+    """Something that happened in a run, with its text rendered on demand.
+
+    kind names the event (damage_taken, item_gained, quest_completed, ...)
+    and fields carries its data. note holds trailing metadata such as an XP
+    reason: text shows it in parentheses, speech leaves it out.
+    """
+
+    __slots__ = ("kind", "template", "color", "note", "fields")
+
+    def __init__(self, kind, template, color=None, note=None, fields=None):
+        self.kind = kind
+        self.template = template
+        self.color = color
+        self.note = note
+        self.fields = fields or {}
+
+    @property
+    def speech(self):
+        return self.template.format(**self.fields) if self.fields else self.template
+
+    @property
+    def text(self):
+        if self.note:
+            return f"{self.speech} ({self.note})"
+        return self.speech
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"GameEvent({self.kind!r}, {self.fields!r})"
+
+
 def isna(value):
     if value is None:
         return True
@@ -52,33 +134,219 @@ def rows_from_csv(path):
         return list(csv.DictReader(handle))
 
 
-def load_meta(meta_path):
-    default = {
+def default_meta():
+    return {
         "wins": 0,
         "total_xp": 0,
         "unlocked_classes": ["adventurer"],
         "last_class": "adventurer",
         "best_ending": "",
     }
-    if not meta_path.exists():
-        return default
+
+
+ENDING_RANK = ("", "Narrow Escape", "Warrior's Escape", "Scholar's Escape")
+CLASS_UNLOCK_WINS = {"fighter": 1, "scout": 2, "scholar": 3}
+META_VIEWS = {}
+
+
+def win_increment(player_class, xp, ending):
+    """The meta progression change for one won run."""
+    return {"wins": 1, "total_xp": xp, "best_ending": ending, "last_class": player_class}
+
+
+def summary_increment(summary):
+    """The meta increment for a run_summary result, or None if the run was not won."""
+    if summary["ending"] not in ENDING_RANK[1:]:
+        return None
+    return win_increment(summary["class"], summary["xp"], summary["ending"])
+
+
+def fold_meta(meta, increment):
+    """Add one increment to meta in place.
+
+    Counts add up, the best ending by ENDING_RANK is kept and unlocks follow
+    from the win total, so increments may be folded in any order.
+    """
+    meta["wins"] = int(meta.get("wins", 0)) + increment.get("wins", 0)
+    meta["total_xp"] = int(meta.get("total_xp", 0)) + increment.get("total_xp", 0)
+    ending = increment.get("best_ending")
+    if ending and _ending_rank(ending) >= _ending_rank(meta.get("best_ending", "")):
+        meta["best_ending"] = ending
+    if increment.get("last_class"):
+        meta["last_class"] = increment["last_class"]
+    unlocks = set(meta.get("unlocked_classes", ["adventurer"]))
+    unlocks.update(name for name, wins in CLASS_UNLOCK_WINS.items() if meta["wins"] >= wins)
+    meta["unlocked_classes"] = sorted(unlocks)
+    return meta
+
+
+def _ending_rank(ending):
+    return ENDING_RANK.index(ending) if ending in ENDING_RANK else 0
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on path, shared by every process and thread that uses it."""
+    with open(path, "a+b") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _meta_paths(meta_path):
+    return Path(f"{meta_path}.log"), Path(f"{meta_path}.merging"), Path(f"{meta_path}.lock")
+
+
+def _read_meta_log(path):
+    """(token, increments) from a meta log; lines torn by a crash are skipped."""
+    token, increments = None, []
+    try:
+        with open(path, "rb") as handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(entry, dict):
+                    continue
+                if "log" in entry:
+                    token = entry["log"] if token is None else token
+                else:
+                    increments.append(entry)
+    except OSError:
+        pass
+    return token, increments
+
+
+def _end_meta_log(handle):
+    """Make sure the log in handle ends with a whole line before appending to it.
+
+    A tail left by a crash mid-append is cut off, unless it is a complete
+    entry that only lost its newline, which is kept.
+    """
+    end = handle.seek(0, os.SEEK_END)
+    start = end
+    while start > 0:
+        start = max(0, start - 4096)
+        handle.seek(start)
+        newline = handle.read(end - start).rfind(b"\n")
+        if newline >= 0:
+            start += newline + 1
+            break
+    if start == end:
+        return
+    handle.seek(start)
+    try:
+        json.loads(handle.read())
+    except ValueError:
+        handle.truncate(start)
+    else:
+        handle.write(b"\n")
+
+
+def _read_meta_file(meta_path):
+    meta = default_meta()
     try:
         with open(meta_path, "r", encoding="utf-8") as handle:
-            saved = json.load(handle)
-            default.update(saved)
-    except (OSError, json.JSONDecodeError):
+            meta.update(json.load(handle))
+    except (OSError, ValueError):
+        pass
+    return meta
+
+
+def load_meta(meta_path):
+    """Meta progression from meta_path with every posted increment folded in.
+
+    The view is cached until one of the files changes.
+    """
+    paths = (Path(meta_path), *_meta_paths(meta_path)[:2])
+    stamps = []
+    for path in paths:
+        try:
+            stat = path.stat()
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            stamps.append(None)
+    cached = META_VIEWS.get(paths[0])
+    if cached is not None and cached[0] == stamps:
+        return copy.deepcopy(cached[1])
+    meta = _read_meta_file(meta_path)
+    for path in reversed(paths[1:]):
+        token, increments = _read_meta_log(path)
+        if token is not None and token != meta.get("merged_log"):
+            for increment in increments:
+                fold_meta(meta, increment)
+    meta.pop("merged_log", None)
+    META_VIEWS[paths[0]] = (stamps, meta)
+    return copy.deepcopy(meta)
+
+
+def post_meta(meta_path, increments, merge_bytes=16 * 1024):
+    """Append meta increments to meta_path's log under its lock.
+
+    Nothing is rewritten until the log passes merge_bytes, so many runs, in
+    any number of processes, can post without losing each other's updates.
+    """
+    log_path, _, lock_path = _meta_paths(meta_path)
+    lines = "".join(json.dumps(increment) + "\n" for increment in increments).encode("utf-8")
+    try:
+        with file_lock(lock_path):
+            with open(log_path, "a+b") as handle:
+                _end_meta_log(handle)
+                if handle.seek(0, os.SEEK_END) == 0:
+                    handle.write(json.dumps({"log": secrets.token_hex(8)}).encode("utf-8") + b"\n")
+                handle.write(lines)
+                size = handle.tell()
+            if size > merge_bytes:
+                _merge_meta_locked(meta_path)
+    except OSError:
         pass
-    return default
 
 
-def save_meta(meta_path, data):
+def merge_meta(meta_path):
+    """Fold meta_path's log into the file itself."""
     try:
-        with open(meta_path, "w", encoding="utf-8") as handle:
-            json.dump(data, handle, indent=2)
+        with file_lock(_meta_paths(meta_path)[2]):
+            _merge_meta_locked(meta_path)
     except OSError:
         pass
 
 
+def _merge_meta_locked(meta_path):
+    # The log is moved aside before folding and meta_path records the moved log's
+    # token, so a merge cut short by a crash is finished, never repeated, next time.
+    log_path, merging_path, _ = _meta_paths(meta_path)
+    if merging_path.exists():
+        _fold_meta_log(meta_path, merging_path)
+    if log_path.exists():
+        os.replace(log_path, merging_path)
+        _fold_meta_log(meta_path, merging_path)
+
+
+def _fold_meta_log(meta_path, log_path):
+    meta = _read_meta_file(meta_path)
+    token, increments = _read_meta_log(log_path)
+    if token is not None and token != meta.get("merged_log"):
+        for increment in increments:
+            fold_meta(meta, increment)
+        meta["merged_log"] = token
+        temp_path = Path(f"{meta_path}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump(meta, handle, indent=2)
+        os.replace(temp_path, meta_path)
+    log_path.unlink()
+
+
 class Player:
     """Main protagonist in the game."""
 
@@ -95,24 +363,26 @@ class Player:
         output_func=print,
         show_ascii_minimap=True,
         interface_mode="cli",
+        routes=None,
+        rng=None,
+        sinks=None,
     ):
-        self.locs = loc_list
-        self.loc_by_id = {l.ID: l for l in loc_list}
-        self.objs = obj_list
-        self.obj_by_id = {o.ID: o for o in obj_list}
-        self.npcs = npc_list
-        self.npc_by_id = {n.ID: n for n in npc_list}
-
-        self.meta = meta or {
-            "wins": 0,
-            "total_xp": 0,
-            "unlocked_classes": ["adventurer"],
-            "last_class": "adventurer",
-            "best_ending": "",
-        }
+        self.locs = RoomSet.adopt(loc_list)
+        self.objs = obj_list if isinstance(obj_list, ObjectList) else ObjectList(obj_list)
+        self.obj_by_id = self.objs.by_id
+        self.npcs = [NPC.adopt(n) for n in npc_list]
+        self.npc_by_id = {n.ID: n for n in self.npcs}
+        self.routes = routes or RouteTable(self.locs)
+        self.rng = rng or GameRandom()
+        self.shared_routes = False
+
+        self.meta = meta or default_meta()
         self.meta_path = meta_path
         self.input_func = input_func
         self.output_func = output_func
+        self.sinks = list(sinks or [])
+        self.replay = None
+        self.pending_question = None
         self.show_ascii_minimap = show_ascii_minimap
         self.interface_mode = interface_mode
 
@@ -126,6 +396,9 @@ class Player:
         self.health = 100
         self.max_health = 100
         self.game_over = False
+        self.ending = None
+        self.death_cause = None
+        self.last_damage_cause = None
         self.new_location = True
         self.valid_command = True
         self.told_story = False
@@ -226,45 +499,28 @@ class Player:
             "Escape the Dungeons, but first collect 3 relics: Amulet, Dagger, Book of Spells.\n"
             "Move: N/S/E/W or north/south/east/west.\n"
             "Core: look, pickup <item>, drop <item>, inventory, map, quests, status, quit.\n"
-            "Combat: attack, flee, use <item>, powerstrike (fighter), analyze (scholar), scan (scout).\n"
+            "Combat: attack, flee, use <item>, forecast, powerstrike (fighter), analyze (scholar), scan (scout).\n"
             "World: rune <word>, style color, style type, log\n"
             "----------------------------------------------------------------------------------"
         )
 
-        self._normalize_entities()
+        self.rebuild_occupancy()
         self._apply_class_modifiers()
         self._apply_mutator_modifiers()
 
         if self.interface_mode == "cli":
             self.say(self.instructions)
-        self.say(f"Class: {self.player_class} | Mutator: {self.mutator['name']} - {self.mutator['desc']}")
-
-    def _normalize_entities(self):
-        for loc in self.locs:
-            if not hasattr(loc, "Tag"):
-                loc.Tag = "safe"
-            if not hasattr(loc, "EventResolved"):
-                loc.EventResolved = False
-            if not hasattr(loc, "SecretSolved"):
-                loc.SecretSolved = False
-        for obj in self.objs:
-            if not hasattr(obj, "Story"):
-                obj.Story = ""
-        for npc in self.npcs:
-            if not hasattr(npc, "Hostile"):
-                npc.Hostile = True
-            if not hasattr(npc, "Patrol"):
-                npc.Patrol = []
-            if not hasattr(npc, "IsBoss"):
-                npc.IsBoss = False
-            if not hasattr(npc, "HP"):
-                npc.HP = 40
-            if not hasattr(npc, "MaxHP"):
-                npc.MaxHP = npc.HP
-            if not hasattr(npc, "Phase"):
-                npc.Phase = 1
-            if not hasattr(npc, "Telegraph"):
-                npc.Telegraph = None
+        self.emit(
+            "run_started",
+            "Class: {player_class} | Mutator: {mutator} - {mutator_desc}",
+            player_class=self.player_class,
+            mutator=self.mutator["name"],
+            mutator_desc=self.mutator["desc"],
+        )
+
+    @property
+    def seed(self):
+        return self.rng.run_seed
 
     def _apply_class_modifiers(self):
         if self.player_class == "fighter":
@@ -285,11 +541,59 @@ class Player:
             return text
         return f"{COLORS.get(color, '')}{text}{COLORS['reset']}"
 
+    def ask(self, text, action, *args):
+        """Ask the player something and pass the answer to method action(*args, answer).
+
+        With an input_func the answer is read at once and action's result is
+        returned. Without one the question is left pending: the next
+        run_command text answers it, and the turn that asked ends only then.
+        """
+        if self.input_func is not None:
+            return getattr(self, action)(*args, self.prompt(text))
+        self.pending_question = {"text": text, "action": action, "args": list(args), "acted": False, "combat": bool(self.pending_encounter)}
+        self.emit("question", "{text}", "cyan", text=text)
+        return False
+
+    def answer_question(self, text):
+        question, self.pending_question = self.pending_question, None
+        if self.replay is not None and self.replay.steps:
+            self.replay.steps[-1][1].append(text)
+        acted = getattr(self, question["action"])(*question["args"], text) or question["acted"]
+        if self.pending_question is not None:
+            self.pending_question.update(acted=acted, combat=question["combat"])
+        elif not question["combat"]:
+            self.end_turn(acted)
+        return acted
+
     def prompt(self, text):
-        return self.input_func(text)
+        answer = self.input_func(text)
+        if self.replay is not None and self.replay.steps:
+            self.replay.steps[-1][1].append(answer)
+        return answer
 
     def say(self, text, color=None, log=False):
-        msg = self.colorize(str(text), color) if color else str(text)
+        return self.emit("message", str(text), color, log)
+
+    def emit(self, kind, template, color=None, log=False, note=None, **fields):
+        """Publish a GameEvent to the sinks and, if set, the text output.
+
+        With no sinks, no text output and no log entry nothing is built, so
+        headless runs never pay for message formatting.
+        """
+        if not log and not self.sinks and self.output_func is None:
+            return None
+        event = GameEvent(kind, template, color, note, fields)
+        for sink in self.sinks:
+            sink(event)
+        if self.output_func is not None:
+            self.write_text(event)
+        if log:
+            self.combat_log.append(event)
+            self.combat_log = self.combat_log[-25:]
+        return event
+
+    def write_text(self, event):
+        msg = self.colorize(event.text, event.color) if event.color else event.text
         if self.style["typewriter"] and self.output_func is print:
             for ch in msg:
                 print(ch, end="", flush=True)
@@ -297,9 +601,12 @@ class Player:
             print()
         else:
             self.output_func(msg)
-        if log:
-            self.combat_log.append(str(text))
-            self.combat_log = self.combat_log[-25:]
+
+    def begin_session(self):
+        """Report the current situation when a run starts or is resumed from a save."""
+        if self.replay is not None:
+            self.replay.steps.append([None, []])
+        return self.play_game()
 
     def play_game(self):
         if self.pending_encounter:
@@ -317,13 +624,21 @@ class Player:
         self.check_player_death()
         return self.game_over
 
+    def take_damage(self, amount, cause, template, color=None, log=False, **fields):
+        self.health -= amount
+        if amount > 0:
+            self.last_damage_cause = cause
+        self.emit("damage_taken", template, color, log, amount=amount, source=cause, hp=self.health, **fields)
+
     def check_player_death(self):
         if self.health > 0:
             return False
         if not self.game_over:
             self.game_over = True
+            self.ending = "Death"
+            self.death_cause = self.last_damage_cause
             self.pending_encounter = None
-            self.say("You collapse in the dungeon. Game over.", "red")
+            self.emit("player_died", "You collapse in the dungeon. Game over.", "red", cause=self.death_cause)
         return True
 
     def report_location_status(self):
@@ -355,31 +670,154 @@ class Player:
             ending = "Narrow Escape"
             detail = "You barely outrun the dungeon, but you made it."
 
-        self.say("Congratulations, you escaped the Dungeons of Dork!", "green")
-        self.say(f"Ending: {ending}")
+        self.ending = ending
+        self.emit("run_won", "Congratulations, you escaped the Dungeons of Dork!", "green", ending=ending)
+        self.emit("ending", "Ending: {ending}", ending=ending)
         self.say(detail)
-        self.say(f"Summary: XP {self.xp}, Quests {completed}/3, Lore {lore}, Defeated NPCs {defeated}")
-
-        self.meta["wins"] = int(self.meta.get("wins", 0)) + 1
-        self.meta["total_xp"] = int(self.meta.get("total_xp", 0)) + self.xp
-        self.meta["best_ending"] = ending
-        self.meta["last_class"] = self.player_class
-        unlocks = set(self.meta.get("unlocked_classes", ["adventurer"]))
-        if self.meta["wins"] >= 1:
-            unlocks.add("fighter")
-        if self.meta["wins"] >= 2:
-            unlocks.add("scout")
-        if self.meta["wins"] >= 3:
-            unlocks.add("scholar")
-        self.meta["unlocked_classes"] = sorted(unlocks)
+        self.emit(
+            "run_summary",
+            "Summary: XP {xp}, Quests {quests}/3, Lore {lore}, Defeated NPCs {defeated}",
+            xp=self.xp,
+            quests=completed,
+            lore=lore,
+            defeated=defeated,
+        )
+
+        increment = win_increment(self.player_class, self.xp, ending)
+        fold_meta(self.meta, increment)
         if self.meta_path:
-            save_meta(self.meta_path, self.meta)
+            post_meta(self.meta_path, [increment])
         return self.game_over
 
     def location(self, loc_id=None):
         if loc_id is None:
             loc_id = self.current_loc
-        return self.loc_by_id[loc_id]
+        return self.locs.by_id(loc_id)
+
+    def writable_routes(self):
+        """Return the route table for changes, copying it first if a fork still shares it."""
+        if self.shared_routes:
+            self.routes = self.routes.copy()
+            self.shared_routes = False
+        return self.routes
+
+    def fork(self, input_func=None, output_func=None, sinks=None):
+        """Return an independent branch of this run, for search and previews.
+
+        The world and the route table stay shared (the routes until one side
+        edits them); the room overlay, NPCs and the small per-run containers
+        are copied. The branch continues the same random stream,
+        records no replay and never writes meta to disk.
+        """
+        branch = object.__new__(type(self))
+        branch.__dict__.update(self.__dict__)
+        self.shared_routes = branch.shared_routes = True
+        branch.locs = self.locs.copy()
+        branch.npcs = [copy.copy(npc) for npc in self.npcs]
+        branch.npc_by_id = {n.ID: n for n in branch.npcs}
+        if self.pending_encounter is not None:
+            branch.pending_encounter = branch.npcs[self.npcs.index(self.pending_encounter)]
+        branch.rebuild_occupancy()
+        branch.rng = copy.copy(self.rng)
+
+        branch.backpack = list(self.backpack)
+        branch.perks = dict(self.perks)
+        branch.reputation = dict(self.reputation)
+        branch.timed_block = dict(self.timed_block)
+        branch.quests = [dict(q) for q in self.quests]
+        branch.lore_seen = set(self.lore_seen)
+        branch.defeated_npcs = set(self.defeated_npcs)
+        branch.revealed_rooms = set(self.revealed_rooms)
+        branch.required_artifacts = set(self.required_artifacts)
+        branch.combat_log = list(self.combat_log)
+        branch.meta = dict(self.meta)
+        branch.style = dict(self.style)
+        if self.pending_question is not None:
+            branch.pending_question = dict(self.pending_question, args=list(self.pending_question["args"]))
+
+        branch.meta_path = None
+        branch.replay = None
+        branch.input_func = input_func or default_prompt_answer
+        branch.output_func = output_func
+        branch.sinks = list(sinks or [])
+        return branch
+
+    def combat_forecast(self):
+        """Solve the pending encounter; actions come back as command text."""
+        if self.pending_encounter is None:
+            return None
+        forecast = solve_combat(combat_state(self))
+        forecast["actions"] = [self.combat_command(action) for action in forecast["actions"]]
+        return forecast
+
+    def combat_command(self, action):
+        if action[0] != "use":
+            return action[0]
+        return "use " + " with ".join(self.obj_by_id[i].Name.lower() for i in action[1:])
+
+    def show_combat_forecast(self):
+        forecast = self.combat_forecast()
+        if forecast is None:
+            self.say("There is no fight to forecast.")
+            return False
+        templates = {
+            "win": "Forecast: victory in {rounds} rounds with {hp} health left. Best move: {command}.",
+            "flee": "Forecast: escape in {rounds} rounds with {hp} health left. Best move: {command}.",
+            "death": "Forecast: defeat in {rounds} rounds even with best play. Best move: {command}.",
+        }
+        self.emit(
+            "combat_forecast",
+            templates[forecast["outcome"]],
+            "cyan",
+            command=forecast["actions"][0] if forecast["actions"] else "none",
+            **forecast,
+        )
+        return True
+
+    def state_key(self):
+        """Hashable summary of everything that decides how this run can continue.
+
+        Positions with equal keys play out alike apart from the random stream,
+        which the key leaves out. The previous room only counts mid-encounter,
+        where fleeing returns to it.
+        """
+        pending = self.pending_encounter
+        return (
+            self.current_loc,
+            self.previous_loc if pending is not None else 0,
+            self.health,
+            self.max_health,
+            self.xp,
+            tuple(self.backpack),
+            tuple(name for name, on in self.perks.items() if on),
+            tuple((npc.CurrentLocationID, npc.HP, npc.Phase, npc.Hostile) for npc in self.npcs),
+            self.npcs.index(pending) if pending is not None else -1,
+            tuple((loc.ID, loc.ObjectID, loc.SecretSolved) for loc in self.locs.resolved()),
+            tuple((q["accepted"], q["completed"]) for q in self.quests),
+            tuple(sorted(self.lore_seen)),
+            tuple(sorted(self.defeated_npcs)),
+            tuple(self.reputation.values()),
+            tuple(self.timed_block.values()),
+            self.turn_count % 12,
+            min(self.turn_count, 15),
+            self.hunter_awake,
+            self.map_boost_active,
+            self.ending,
+        )
+
+    def snapshot(self):
+        """Capture the current state; restore() returns to it any number of times."""
+        snap = self.fork()
+        snap.replay_length = len(self.replay.steps) if self.replay is not None else None
+        return snap
+
+    def restore(self, snap):
+        """Return this run to a snapshot, keeping its own output, prompts and meta."""
+        kept = {name: getattr(self, name) for name in ("input_func", "output_func", "sinks", "meta", "meta_path", "replay")}
+        self.__dict__.update(snap.fork().__dict__)
+        self.__dict__.update(kept)
+        if self.replay is not None and snap.replay_length is not None:
+            del self.replay.steps[snap.replay_length :]
 
     def has_item(self, item_id):
         return any(slot == item_id for slot in self.backpack)
@@ -428,7 +866,7 @@ class Player:
         direction = DIRECTION_ALIASES.get(direction, direction)
         blocked = self.get_blocked_direction()
         if blocked == direction:
-            self.say(f"The way {direction} is blocked.", "yellow")
+            self.emit("move_blocked", "The way {direction} is blocked.", "yellow", direction=direction)
             return False
 
         loc = self.location()
@@ -449,7 +887,13 @@ class Player:
         if next_loc == 90 and not self.required_artifacts.issubset(self.backpack):
             missing_ids = [i for i in sorted(self.required_artifacts) if i not in self.backpack]
             missing_names = [self.obj_by_id[i].Name for i in missing_ids]
-            self.say("The exit gate rejects you. Missing relics: " + ", ".join(missing_names), "yellow")
+            self.emit(
+                "gate_locked",
+                "The exit gate rejects you. Missing relics: {missing}",
+                "yellow",
+                missing=", ".join(missing_names),
+                missing_ids=missing_ids,
+            )
             return False
 
         self.previous_loc = self.current_loc
@@ -463,19 +907,23 @@ class Player:
 
         if allow_bonus and self.map_boost_active and self.perks["extra_move_on_map"]:
             self.map_boost_active = False
-            bonus = self.prompt("Map insight grants a bonus move (N/S/E/W or skip) > ").strip().upper()
-            if bonus and bonus[0] in {"N", "S", "E", "W"}:
-                self.move(bonus[0], allow_bonus=False)
+            self.ask("Map insight grants a bonus move (N/S/E/W or skip) > ", "bonus_move")
 
         return True
 
+    def bonus_move(self, answer):
+        bonus = answer.strip().upper()
+        if bonus and bonus[0] in {"N", "S", "E", "W"}:
+            self.move(bonus[0], allow_bonus=False)
+        return False
+
     def look_around(self):
         self.new_location = False
         loc = self.location()
         if self.told_story:
-            self.say(loc.Desc)
+            self.emit("room_described", "{text}", room=loc.ID, text=loc.Desc)
         else:
-            self.say(loc.Story)
+            self.emit("room_entered", "{text}", room=loc.ID, text=loc.Story, tag=loc.Tag)
             self.told_story = True
         return True
 
@@ -483,9 +931,9 @@ class Player:
         directions = self.get_available_directions()
         blocked = self.get_blocked_direction()
         if blocked:
-            self.say(f"You may go {directions} (but {blocked} is blocked)")
+            self.emit("exits", "You may go {directions} (but {blocked} is blocked)", directions=directions, blocked=blocked)
         else:
-            self.say(f"You may go {directions}")
+            self.emit("exits", "You may go {directions}", directions=directions, blocked=None)
         return True
 
     def find_item_id_by_name(self, text):
@@ -516,9 +964,8 @@ class Player:
         else:
             for i, item_id in enumerate(self.backpack):
                 if item_id is not None:
-                    self.say(f"[{i}] {self.obj_by_id[item_id].Name}")
-            drop = self.prompt("Which object do you wish to drop? Type number or name > ").strip()
-            return self.drop_object(drop)
+                    self.emit("backpack_slot", "[{slot}] {item}", slot=i, item=self.obj_by_id[item_id].Name)
+            return self.ask("Which object do you wish to drop? Type number or name > ", "drop_object")
 
         if target_item_id is None:
             self.say("Please choose a valid object number or name.")
@@ -528,13 +975,16 @@ class Player:
             self.say("There is already something on the ground here.")
             return False
 
-        confirm = self.prompt(f"Drop {self.obj_by_id[target_item_id].Name}? Y/N > ").strip().upper()
+        return self.ask(f"Drop {self.obj_by_id[target_item_id].Name}? Y/N > ", "confirm_drop", target_item_id)
+
+    def confirm_drop(self, target_item_id, answer):
+        confirm = answer.strip().upper()
         if not (confirm and confirm[0] == "Y"):
             return False
 
         self.location().ObjectID = target_item_id
         self.remove_item(target_item_id)
-        self.say(f"Dropped {self.obj_by_id[target_item_id].Name}")
+        self.emit("item_dropped", "Dropped {item}", item=self.obj_by_id[target_item_id].Name, item_id=target_item_id)
         return True
 
     def pickup_object(self, wanted_name=""):
@@ -549,7 +999,7 @@ class Player:
             return False
 
         if wanted_name and normalize(obj.Name) != normalize(wanted_name):
-            self.say(f"You do not see '{wanted_name}' here.")
+            self.emit("item_missing", "You do not see '{wanted}' here.", wanted=wanted_name)
             return False
 
         if not self.add_item(oid):
@@ -557,9 +1007,9 @@ class Player:
             return False
 
         self.location().ObjectID = 0
-        self.say(f"You pick up {obj.Name}", "green")
+        self.emit("item_gained", "You pick up {item}", "green", item=obj.Name, item_id=oid)
         if getattr(obj, "Story", ""):
-            self.say(obj.Story)
+            self.emit("item_story", "{text}", item_id=oid, text=obj.Story)
 
         if oid == 103:
             self.say("The Cursed Idol chills your hands. Carry it too long and it will drain you.", "yellow")
@@ -570,22 +1020,36 @@ class Player:
         if not items:
             self.say("Your backpack is empty.")
             return False
-        self.say("Backpack: " + ", ".join(items))
+        self.emit("backpack", "Backpack: {items}", items=", ".join(items))
         return True
 
     def show_status(self):
         completed = sum(1 for q in self.quests if q["completed"])
-        self.say(
-            f"Health: {self.health}/{self.max_health} | XP: {self.xp} | Quests: {completed}/3 | "
-            f"Lore: {len(self.lore_seen)} | Rep S:{self.reputation['scholars']} O:{self.reputation['outcasts']}"
+        self.emit(
+            "status",
+            "Health: {hp}/{max_hp} | XP: {xp} | Quests: {quests}/3 | Lore: {lore} | Rep S:{scholars} O:{outcasts}",
+            hp=self.health,
+            max_hp=self.max_health,
+            xp=self.xp,
+            quests=completed,
+            lore=len(self.lore_seen),
+            scholars=self.reputation["scholars"],
+            outcasts=self.reputation["outcasts"],
         )
-        self.say("Perks: " + (", ".join(k for k, v in self.perks.items() if v) or "none"))
+        self.emit("perks", "Perks: {perks}", perks=", ".join(k for k, v in self.perks.items() if v) or "none")
         return True
 
     def show_quests(self):
         for q in self.quests:
             state = "completed" if q["completed"] else "active" if q["accepted"] else "not started"
-            self.say(f"- {q['title']} ({state}): {q['description']}")
+            self.emit(
+                "quest_status",
+                "- {title} ({state}): {description}",
+                quest=q["id"],
+                title=q["title"],
+                state=state,
+                description=q["description"],
+            )
         return True
 
     def show_log(self):
@@ -594,20 +1058,28 @@ class Player:
             return False
         self.say("Recent combat log:", "cyan")
         for line in self.combat_log[-8:]:
-            self.say(f"- {line}")
+            self.emit("log_line", "- {line}", line=line)
         return True
 
+    def confirm_quit(self, answer):
+        confirm = answer.strip().upper()
+        if confirm and confirm[0] == "Y":
+            return self.quit_game()
+        return False
+
     def quit_game(self):
         self.game_over = True
-        self.meta["last_class"] = self.player_class
+        self.ending = "Quit"
+        increment = {"last_class": self.player_class}
+        fold_meta(self.meta, increment)
         if self.meta_path:
-            save_meta(self.meta_path, self.meta)
+            post_meta(self.meta_path, [increment])
         return True
 
     def show_instructions(self):
         if self.interface_mode == "ui":
             self.say("Commands: N/S/E/W, look, pickup <item>, drop <item>, map, quests, status, help, quit")
-            self.say("Combat: attack, flee, use <item>, powerstrike (fighter), analyze (scholar), scan (scout)")
+            self.say("Combat: attack, flee, use <item>, forecast, powerstrike (fighter), analyze (scholar), scan (scout)")
             self.say("World: rune <word>, style color, style type, log")
             return True
         self.say(self.instructions)
@@ -617,65 +1089,99 @@ class Player:
     def list_objects(self):
         oid = self.location().ObjectID
         if oid:
-            self.say(f"There is {self.obj_by_id[oid].Desc} here.")
+            self.emit("item_here", "There is {desc} here.", item_id=oid, desc=self.obj_by_id[oid].Desc)
 
-    def active_hostile_npcs_here(self):
-        active = []
+    def rebuild_occupancy(self):
+        """Index NPCs by room; call after moving NPCs without relocate_npc()."""
+        self.npc_rank = {id(npc): idx for idx, npc in enumerate(self.npcs)}
+        self.npc_rooms = {}
+        self.npc_room_of = {}
         for npc in self.npcs:
-            if npc.Hostile and npc.CurrentLocationID == self.current_loc and npc.ID not in self.defeated_npcs:
-                active.append(npc)
-        return active
+            self.npc_rooms.setdefault(npc.CurrentLocationID, []).append(npc)
+            self.npc_room_of[id(npc)] = npc.CurrentLocationID
+
+    def relocate_npc(self, npc, loc_id):
+        old = self.npc_room_of.get(id(npc), npc.CurrentLocationID)
+        occupants = [n for n in self.npc_rooms.get(old, []) if n is not npc]
+        if occupants:
+            self.npc_rooms[old] = occupants
+        else:
+            self.npc_rooms.pop(old, None)
+
+        npc.CurrentLocationID = loc_id
+        self.npc_room_of[id(npc)] = loc_id
+        occupants = self.npc_rooms.setdefault(loc_id, [])
+        occupants.append(npc)
+        # Keep roster order so encounter and blocker choice stay stable.
+        occupants.sort(key=lambda n: self.npc_rank.get(id(n), len(self.npc_rank)))
+
+    def npcs_in_room(self, loc_id):
+        return [npc for npc in self.npc_rooms.get(loc_id, []) if npc.ID not in self.defeated_npcs]
+
+    def hostile_npcs_in_room(self, loc_id):
+        return [npc for npc in self.npcs_in_room(loc_id) if npc.Hostile]
+
+    def active_hostile_npcs_here(self):
+        return self.hostile_npcs_in_room(self.current_loc)
 
     def list_npcs(self):
-        for npc in self.npcs:
-            if npc.CurrentLocationID == self.current_loc and npc.ID not in self.defeated_npcs:
-                mood = "hostile" if npc.Hostile else "friendly"
-                label = "BOSS" if npc.IsBoss else mood
-                self.say(f"There is {npc.Desc} here. ({label})")
+        for npc in self.npcs_in_room(self.current_loc):
+            mood = "hostile" if npc.Hostile else "friendly"
+            label = "BOSS" if npc.IsBoss else mood
+            self.emit("npc_here", "There is {desc} here.", note=label, npc=npc.ID, desc=npc.Desc)
 
     def add_xp(self, amount, reason):
         if amount <= 0:
             return
         self.xp += amount
-        self.say(f"+{amount} XP ({reason})", "green")
+        self.emit("xp_gained", "+{amount} XP", "green", note=reason, amount=amount, reason=reason)
         self.check_level_rewards()
 
     def check_level_rewards(self):
         if self.xp >= 20 and not self.perks["trap_detection"]:
             self.perks["trap_detection"] = True
-            self.say("Perk unlocked: trap_detection", "green")
+            self.emit("perk_unlocked", "Perk unlocked: {perk}", "green", perk="trap_detection")
 
         if self.xp >= 40 and not self.perks["extra_slot"]:
             self.perks["extra_slot"] = True
             self.backpack.append(None)
-            self.say("Perk unlocked: extra_slot (+1 backpack slot)", "green")
+            self.emit("perk_unlocked", "Perk unlocked: {perk}", "green", note="+1 backpack slot", perk="extra_slot")
 
         if self.xp >= 60 and not self.perks["extra_move_on_map"]:
             self.perks["extra_move_on_map"] = True
-            self.say("Perk unlocked: extra_move_on_map (after using map)", "green")
+            self.emit("perk_unlocked", "Perk unlocked: {perk}", "green", note="after using map", perk="extra_move_on_map")
 
     def apply_end_of_turn_effects(self):
         if self.has_item(103):
             drain = 1 if self.perks.get("idol_dampened") else 2
-            self.health -= drain
-            self.say(f"The Cursed Idol drains {drain} health.", "yellow")
+            self.take_damage(drain, "Cursed Idol", "The Cursed Idol drains {amount} health.", "yellow")
 
         if self.timed_block["ttl"] > 0:
             self.timed_block["ttl"] -= 1
             if self.timed_block["ttl"] == 0:
-                self.say("A sealed corridor grinds open again.", "cyan")
+                self.writable_routes().enable_edge(self.timed_block["loc"], self.timed_block["dir"])
+                self.emit("seal_lifted", "A sealed corridor grinds open again.", "cyan", **self.timed_block)
 
     def spawn_timed_events(self):
         if self.turn_count > 0 and self.turn_count % 12 == 0:
             dirs = self.get_available_directions()
             if dirs:
-                self.timed_block = {"loc": self.current_loc, "dir": random.choice(dirs), "ttl": 3}
-                self.say(f"Stone plates slam shut. Direction {self.timed_block['dir']} is sealed briefly.", "yellow")
+                routes = self.writable_routes()
+                if self.timed_block["ttl"] > 0:
+                    routes.enable_edge(self.timed_block["loc"], self.timed_block["dir"])
+                self.timed_block = {"loc": self.current_loc, "dir": self.rng.choice(dirs), "ttl": 3}
+                routes.disable_edge(self.current_loc, self.timed_block["dir"])
+                self.emit(
+                    "seal_closed",
+                    "Stone plates slam shut. Direction {dir} is sealed briefly.",
+                    "yellow",
+                    **self.timed_block,
+                )
 
         if self.turn_count >= 15 and not self.hunter_awake and self.hunter_id in self.npc_by_id:
             self.hunter_awake = True
             self.npc_by_id[self.hunter_id].Hostile = True
-            self.say("A distant horn echoes. The Hunter has entered the maze.", "red")
+            self.emit("hunter_awake", "A distant horn echoes. The Hunter has entered the maze.", "red")
 
     def get_user_input(self):
         text = self.prompt("What now? > ").strip()
@@ -691,7 +1197,90 @@ class Player:
             self.apply_end_of_turn_effects()
         return acted
 
-    def parse_command(self, text):
+    def run_command(self, text):
+        """Play one command as a full turn and return whether it acted.
+
+        Out of combat an accepted command advances the world (timed events,
+        NPC moves, end-of-turn effects) and reports a newly entered room. In
+        combat the command is one encounter exchange. While a question is
+        pending (see ask) the text answers it instead.
+        """
+        if self.game_over:
+            return False
+        if self.pending_question is not None:
+            return self.answer_question(text)
+        if self.pending_encounter and normalize(text) == "forecast":
+            self.show_combat_forecast()
+            return False
+        if self.replay is not None:
+            self.replay.steps.append([text, []])
+        if self.pending_encounter:
+            self.handle_encounter_turn(text)
+            return True
+
+        verb, args = self.parse_command(text)
+        acted = self.execute_command(verb, args)
+        if self.pending_question is not None:
+            self.pending_question["acted"] = acted
+        else:
+            self.end_turn(acted)
+        return acted
+
+    def end_turn(self, acted):
+        if acted and not self.game_over:
+            self.turn_count += 1
+            self.spawn_timed_events()
+            self.move_npcs()
+            self.apply_end_of_turn_effects()
+            self.check_player_death()
+            if self.new_location and not self.game_over:
+                self.play_game()
+        else:
+            self.check_player_death()
+
+    def legal_commands(self):
+        """Commands that can act in the current state, as player-typed text."""
+        if self.game_over:
+            return []
+        carried = [self.obj_by_id[i].Name.lower() for i in self.backpack if i is not None and i in self.obj_by_id]
+        if self.pending_encounter:
+            commands = ["attack"]
+            if not self.pending_encounter.IsBoss:
+                commands.append("flee")
+            if self.player_class == "fighter":
+                commands.append("powerstrike")
+            if self.player_class == "scholar":
+                commands.append("analyze")
+            return commands + [f"use {name}" for name in carried]
+
+        commands = []
+        blocked = self.get_blocked_direction()
+        has_relics = self.required_artifacts.issubset(self.backpack)
+        for d, nxt in self.neighbors(self.current_loc):
+            if nxt and d != blocked and (nxt != 90 or has_relics):
+                commands.append(d)
+        loc = self.location()
+        if loc.ObjectID and None in self.backpack:
+            commands.append("pickup")
+        if not loc.ObjectID:
+            commands.extend(f"drop {name}" for name in carried)
+        if self.has_item(100):
+            commands.append("map")
+        if self.has_item(104) and self.health < self.max_health:
+            commands.append("use healing herb")
+        if self.has_item(101) and not self.perks["trap_detection"]:
+            commands.append("use engineer toolkit")
+        for left, right in ((1, 105), (2, 102), (101, 103)):
+            if self.has_item(left) and self.has_item(right):
+                commands.append(f"use {self.obj_by_id[left].Name.lower()} with {self.obj_by_id[right].Name.lower()}")
+        if self.current_loc == self.secret_room and not loc.SecretSolved:
+            commands.append(f"rune {self.secret_keyword}")
+        if self.player_class == "scout":
+            commands.append("scan")
+        return commands
+
+    @staticmethod
+    def parse_command(text):
         words = text.strip().split()
         if not words:
             return "", []
@@ -766,10 +1355,7 @@ class Player:
         if verb == "MOVES":
             return self.list_directions()
         if verb == "QUIT":
-            confirm = self.prompt("Are you sure? Y/N > ").strip().upper()
-            if confirm and confirm[0] == "Y":
-                return self.quit_game()
-            return False
+            return self.ask("Are you sure? Y/N > ", "confirm_quit")
         if verb == "ATTACK":
             if self.pending_encounter:
                 return self.resolve_attack()
@@ -807,7 +1393,12 @@ class Player:
         if verb == "LOG":
             return self.show_log()
         if verb == "CLASS":
-            self.say(f"Current class: {self.player_class} | Unlocked: {', '.join(self.meta.get('unlocked_classes', []))}")
+            self.emit(
+                "class_info",
+                "Current class: {player_class} | Unlocked: {unlocked}",
+                player_class=self.player_class,
+                unlocked=", ".join(self.meta.get("unlocked_classes", [])),
+            )
             return True
 
         self.say("Sorry, I do not understand that instruction. Press 'H' for help.")
@@ -817,11 +1408,11 @@ class Player:
         token = normalize(arg)
         if token in {"color", "colour"}:
             self.style["color"] = not self.style["color"]
-            self.say(f"Color output: {'on' if self.style['color'] else 'off'}")
+            self.emit("style", "Color output: {state}", option="color", state="on" if self.style["color"] else "off")
             return True
         if token in {"type", "typewriter"}:
             self.style["typewriter"] = not self.style["typewriter"]
-            self.say(f"Typewriter: {'on' if self.style['typewriter'] else 'off'}")
+            self.emit("style", "Typewriter: {state}", option="typewriter", state="on" if self.style["typewriter"] else "off")
             return True
         self.say("Usage: style color | style type")
         return False
@@ -831,10 +1422,18 @@ class Player:
         hostiles = self.active_hostile_npcs_here()
         if hostiles:
             self.pending_encounter = hostiles[0]
-            if self.pending_encounter.IsBoss:
-                self.say(f"{self.pending_encounter.Name} emerges from shadow. Final battle begins.", "red")
+            npc = self.pending_encounter
+            if npc.IsBoss:
+                self.emit("encounter_started", "{npc} emerges from shadow. Final battle begins.", "red", npc=npc.Name, boss=True)
             else:
-                self.say(f"{self.pending_encounter.Name} confronts you! (attack / flee / use <item>)", "red")
+                self.emit(
+                    "encounter_started",
+                    "{npc} confronts you!",
+                    "red",
+                    note="attack / flee / use <item>",
+                    npc=npc.Name,
+                    boss=False,
+                )
 
     def apply_faction_tension(self):
         """Faction reputation can cool or inflame specific enemies."""
@@ -845,26 +1444,38 @@ class Player:
             elif "hunter" in name:
                 npc.Hostile = self.hunter_awake
 
-    def handle_encounter_turn(self):
+    def handle_encounter_turn(self, command=None):
         npc = self.pending_encounter
         if npc is None:
             return
 
         if npc.IsBoss and npc.Telegraph:
             dmg = npc.Telegraph["damage"] + self.mutator.get("enemy_damage_bonus", 0)
-            self.health -= dmg
-            self.say(f"Boss attack lands: {npc.Telegraph['name']} hits for {dmg}.", "red", log=True)
+            self.take_damage(
+                dmg, npc.Name, "Boss attack lands: {attack} hits for {amount}.", "red", log=True, attack=npc.Telegraph["name"]
+            )
             npc.Telegraph = None
             if self.check_player_death():
                 return
 
         if npc.IsBoss:
-            self.say(f"Boss HP {npc.HP}/{npc.MaxHP} | Your HP {self.health}/{self.max_health}", "yellow")
+            template = "Boss HP {npc_hp}/{npc_max_hp} | Your HP {hp}/{max_hp}"
         else:
-            self.say(f"Combat with {npc.Name}. Health {self.health}/{self.max_health}", "yellow")
+            template = "Combat with {npc}. Health {hp}/{max_hp}"
+        self.emit(
+            "combat_status",
+            template,
+            "yellow",
+            npc=npc.Name,
+            npc_hp=npc.HP,
+            npc_max_hp=npc.MaxHP,
+            hp=self.health,
+            max_hp=self.max_health,
+        )
 
-        command = self.prompt("Combat > ").strip()
-        verb, args = self.parse_command(command)
+        if command is None:
+            command = self.prompt("Combat > ")
+        verb, args = self.parse_command(command.strip())
         if verb == "ATTACK":
             self.resolve_attack()
         elif verb == "FLEE":
@@ -876,11 +1487,9 @@ class Player:
         elif verb == "ANALYZE":
             self.class_analyze()
         elif verb == "QUIT":
-            confirm = self.prompt("Are you sure? Y/N > ").strip().upper()
-            if confirm and confirm[0] == "Y":
-                self.quit_game()
+            self.ask("Are you sure? Y/N > ", "confirm_quit")
         else:
-            self.say("Combat commands: attack, flee, use <item>, powerstrike, analyze")
+            self.say("Combat commands: attack, flee, use <item>, forecast, powerstrike, analyze")
 
         if self.check_player_death():
             return
@@ -895,7 +1504,15 @@ class Player:
             npc.Telegraph = {"name": "Rift Wave", "damage": 12}
         else:
             npc.Telegraph = {"name": "Cataclysmic Arc", "damage": 16}
-        self.say(f"Telegraph: {npc.Name} begins charging {npc.Telegraph['name']}.", "yellow", log=True)
+        self.emit(
+            "boss_telegraph",
+            "Telegraph: {npc} begins charging {attack}.",
+            "yellow",
+            log=True,
+            npc=npc.Name,
+            attack=npc.Telegraph["name"],
+            damage=npc.Telegraph["damage"],
+        )
 
     def resolve_attack(self):
         npc = self.pending_encounter
@@ -909,7 +1526,7 @@ class Player:
 
         if npc.IsBoss:
             npc.HP -= base_damage
-            self.say(f"You strike {npc.Name} for {base_damage} damage.", "green", log=True)
+            self.emit("damage_dealt", "You strike {target} for {amount} damage.", "green", log=True, target=npc.Name, amount=base_damage)
             self.advance_boss_phase(npc)
             if npc.HP <= 0:
                 return self.defeat_npc(npc)
@@ -919,18 +1536,21 @@ class Player:
         if weakness and self.has_item(weakness):
             boosted = base_damage + 16
             npc.HP -= boosted
-            self.say(
-                f"You exploit {npc.Name}'s weakness using {self.obj_by_id[weakness].Name} "
-                f"for {boosted} damage.",
+            self.emit(
+                "damage_dealt",
+                "You exploit {target}'s weakness using {item} for {amount} damage.",
                 "green",
                 log=True,
+                target=npc.Name,
+                item=self.obj_by_id[weakness].Name,
+                amount=boosted,
             )
             if npc.HP <= 0:
                 return self.defeat_npc(npc)
             return True
 
         npc.HP -= base_damage
-        self.say(f"You hit {npc.Name} for {base_damage} damage.", "green", log=True)
+        self.emit("damage_dealt", "You hit {target} for {amount} damage.", "green", log=True, target=npc.Name, amount=base_damage)
         if npc.HP <= 0:
             return self.defeat_npc(npc)
 
@@ -939,8 +1559,7 @@ class Player:
             dmg = max(0, dmg - 4)
             self.perks["aura_shield"] = False
             self.say("Your protective aura absorbs part of the retaliation.", "cyan", log=True)
-        self.health -= dmg
-        self.say(f"{npc.Name} retaliates. You lose {dmg} health.", "red", log=True)
+        self.take_damage(dmg, npc.Name, "{source} retaliates. You lose {amount} health.", "red", log=True)
         return True
 
     def advance_boss_phase(self, npc):
@@ -948,10 +1567,10 @@ class Player:
         threshold3 = int(npc.MaxHP * 0.33)
         if npc.Phase == 1 and npc.HP <= threshold2:
             npc.Phase = 2
-            self.say(f"{npc.Name} enters phase 2. The room distorts.", "red", log=True)
+            self.emit("boss_phase", "{npc} enters phase {phase}. The room distorts.", "red", log=True, npc=npc.Name, phase=2)
         if npc.Phase == 2 and npc.HP <= threshold3:
             npc.Phase = 3
-            self.say(f"{npc.Name} enters phase 3. The air crackles.", "red", log=True)
+            self.emit("boss_phase", "{npc} enters phase {phase}. The air crackles.", "red", log=True, npc=npc.Name, phase=3)
 
     def resolve_flee(self):
         npc = self.pending_encounter
@@ -960,11 +1579,10 @@ class Player:
         if npc.IsBoss:
             self.say("No escape. The boss seals the chamber.", "red")
             return False
-        self.health -= 5
         self.current_loc = self.previous_loc
         self.new_location = True
         self.pending_encounter = None
-        self.say(f"You flee from {npc.Name}. You lose 5 health.", "yellow", log=True)
+        self.take_damage(5, "flight", "You flee from {npc}. You lose {amount} health.", "yellow", log=True, npc=npc.Name)
         return True
 
     def resolve_use_in_combat(self, item_name):
@@ -983,7 +1601,7 @@ class Player:
             return False
 
         if item_id == npc.ObjectID:
-            self.say(f"{npc.Name} recoils from {self.obj_by_id[item_id].Name}.", "green", log=True)
+            self.emit("npc_recoils", "{npc} recoils from {item}.", "green", log=True, npc=npc.Name, item=self.obj_by_id[item_id].Name)
             if npc.IsBoss:
                 npc.HP -= 25
                 self.advance_boss_phase(npc)
@@ -995,12 +1613,11 @@ class Player:
         if item_id == 104:
             self.health = min(self.max_health, self.health + 20)
             self.remove_item(104)
-            self.say("You use a Healing Herb and recover 20 health.", "green", log=True)
+            self.emit("healed", "You use a Healing Herb and recover {amount} health.", "green", log=True, amount=20)
             return True
 
         dmg = 10 + self.mutator.get("enemy_damage_bonus", 0)
-        self.health -= dmg
-        self.say(f"That item has no effect. The enemy hits you for {dmg} health.", "red", log=True)
+        self.take_damage(dmg, npc.Name, "That item has no effect. The enemy hits you for {amount} health.", "red", log=True)
         return True
 
     def resolve_synergy_use(self, left_name, right_name, in_combat=False):
@@ -1033,11 +1650,11 @@ class Player:
         return False
 
     def defeat_npc(self, npc):
-        npc.CurrentLocationID = -1
+        self.relocate_npc(npc, -1)
         self.defeated_npcs.add(npc.ID)
         self.pending_encounter = None
         self.add_xp(15 if not npc.IsBoss else 40, f"defeated {npc.Name}")
-        self.say(f"{npc.Name} is defeated.", "green", log=True)
+        self.emit("npc_defeated", "{npc} is defeated.", "green", log=True, npc=npc.Name, boss=npc.IsBoss)
         if npc.IsBoss:
             self.reputation["outcasts"] += 1
         return True
@@ -1058,7 +1675,7 @@ class Player:
         if item_id == 104:
             self.health = min(self.max_health, self.health + 20)
             self.remove_item(104)
-            self.say("You use a Healing Herb and recover 20 health.", "green")
+            self.emit("healed", "You use a Healing Herb and recover {amount} health.", "green", amount=20)
             return True
         if item_id == 101:
             self.say("The Engineer Toolkit sharpens your awareness.", "green")
@@ -1069,31 +1686,7 @@ class Player:
         return False
 
     def shortest_path_step(self, start, target):
-        queue = deque([start])
-        came_from = {start: None}
-
-        while queue:
-            loc_id = queue.popleft()
-            if loc_id == target:
-                break
-            for d, nxt in self.neighbors(loc_id):
-                if nxt and nxt not in came_from:
-                    came_from[nxt] = (loc_id, d)
-                    queue.append(nxt)
-
-        if target not in came_from:
-            return None, 999
-
-        cur = target
-        path = []
-        while came_from[cur] is not None:
-            parent, direction = came_from[cur]
-            path.append((parent, cur, direction))
-            cur = parent
-        path.reverse()
-        if not path:
-            return None, 0
-        return path[0][2], len(path)
+        return self.routes.step(start, target)
 
     def shortest_next_step_to_exit(self):
         step, _ = self.shortest_path_step(self.current_loc, 90)
@@ -1105,10 +1698,10 @@ class Player:
             return False
         hint = self.shortest_next_step_to_exit()
         if hint:
-            if self.mutator.get("fog") and random.random() < 0.35:
-                hint = random.choice(["N", "S", "E", "W"])
+            if self.mutator.get("fog") and self.rng.random() < 0.35:
+                hint = self.rng.choice(["N", "S", "E", "W"])
                 self.say("Fog mutator distorts the map...")
-            self.say(f"Map hint: safest route points {hint}")
+            self.emit("map_hint", "Map hint: safest route points {direction}", direction=hint)
         else:
             self.say("The map is too damaged to read here.")
 
@@ -1125,17 +1718,19 @@ class Player:
             if nxt:
                 marker = "*" if nxt in self.revealed_rooms else "?"
                 nearby.append(f"{d}:{nxt}{marker}")
-        self.say(f"Map reveal: discovered {len(self.revealed_rooms)} rooms. Adjacent -> {' '.join(nearby)}")
+        self.emit(
+            "map_reveal",
+            "Map reveal: discovered {count} rooms. Adjacent -> {adjacent}",
+            count=len(self.revealed_rooms),
+            adjacent=" ".join(nearby),
+        )
 
     def room_visual_token(self, loc_id):
         if not loc_id:
             return "#####"
         if loc_id == self.current_loc:
             return f"@{loc_id:03d}"
-        if any(
-            npc.Hostile and npc.CurrentLocationID == loc_id and npc.ID not in self.defeated_npcs
-            for npc in self.npcs
-        ):
+        if self.hostile_npcs_in_room(loc_id):
             return f"!{loc_id:03d}"
         loc = self.location(loc_id)
         if loc.ObjectID:
@@ -1196,7 +1791,7 @@ class Player:
         return [("N", loc.N), ("S", loc.S), ("E", loc.E), ("W", loc.W)]
 
     def move_npcs(self):
-        relic_rooms = [l.ID for l in self.locs if l.ObjectID in self.required_artifacts]
+        relic_field = self.routes.field(self.locs.holding(self.required_artifacts))
 
         for npc in self.npcs:
             if npc.ID in self.defeated_npcs or not npc.Hostile:
@@ -1208,43 +1803,27 @@ class Player:
             if npc.ID == self.hunter_id and not self.hunter_awake:
                 continue
 
-            target = None
+            # A single goal needs no field: the route table already has the step.
+            toward_player, distance = self.routes.step(npc.CurrentLocationID, self.current_loc)
             if npc.ID == self.hunter_id:
-                target = self.current_loc
+                step = toward_player
+            # Ambush flank: if close to player, prioritize player.
+            elif distance <= 3:
+                step = toward_player
             else:
-                best_dist = 999
-                for rr in relic_rooms:
-                    _, dist = self.shortest_path_step(npc.CurrentLocationID, rr)
-                    if dist < best_dist:
-                        best_dist = dist
-                        target = rr
-                # Ambush flank: if close to player, prioritize player.
-                _, pdist = self.shortest_path_step(npc.CurrentLocationID, self.current_loc)
-                if pdist <= 3:
-                    target = self.current_loc
-
-            if target and target != npc.CurrentLocationID:
-                step, _ = self.shortest_path_step(npc.CurrentLocationID, target)
-                if step:
-                    loc = self.location(npc.CurrentLocationID)
-                    if step == "N" and loc.N:
-                        npc.CurrentLocationID = loc.N
-                    elif step == "S" and loc.S:
-                        npc.CurrentLocationID = loc.S
-                    elif step == "E" and loc.E:
-                        npc.CurrentLocationID = loc.E
-                    elif step == "W" and loc.W:
-                        npc.CurrentLocationID = loc.W
-                    continue
+                step = relic_field.step(npc.CurrentLocationID)
+            if step:
+                self.relocate_npc(npc, getattr(self.location(npc.CurrentLocationID), step))
+                continue
 
-            if len(npc.Patrol) >= 2 and random.random() < 0.5:
-                npc.CurrentLocationID = npc.Patrol[1] if npc.CurrentLocationID == npc.Patrol[0] else npc.Patrol[0]
+            if len(npc.Patrol) >= 2 and self.rng.random() < 0.5:
+                self.relocate_npc(npc, npc.Patrol[1] if npc.CurrentLocationID == npc.Patrol[0] else npc.Patrol[0])
 
     def handle_room_event(self):
-        loc = self.location()
-        if loc.EventResolved:
+        if self.location().EventResolved:
             return
 
+        loc = self.location()
         loc.EventResolved = True
         tag = loc.Tag
 
@@ -1258,29 +1837,27 @@ class Player:
                         self.add_item(104)
             else:
                 dmg = 12 if self.mutator.get("extra_traps") else 10
-                self.health -= dmg
-                self.say(f"A floor trap snaps shut. You lose {dmg} health.", "red")
-                if random.random() < 0.35 and not loc.ObjectID:
+                self.take_damage(dmg, "trap", "A floor trap snaps shut. You lose {amount} health.", "red")
+                if self.rng.random() < 0.35 and not loc.ObjectID:
                     loc.ObjectID = 103
                     self.say("The trap chamber hides a Cursed Idol. Risk and reward.", "yellow")
 
         elif tag == "treasure":
             chance = 0.85 if self.mutator.get("rich_loot") else 0.7
-            if not loc.ObjectID and random.random() < chance:
-                loc.ObjectID = random.choice([102, 104, 105])
+            if not loc.ObjectID and self.rng.random() < chance:
+                loc.ObjectID = self.rng.choice([102, 104, 105])
             self.say("This side room feels rewarding. Keep searching.", "green")
 
         elif tag == "lore":
-            snippet = random.choice(self.lore_snippets)
+            snippet = self.rng.choice(self.lore_snippets)
             if snippet not in self.lore_seen:
                 self.lore_seen.add(snippet)
-                self.say("Lore: " + snippet, "cyan")
+                self.emit("lore_found", "Lore: {text}", "cyan", text=snippet)
                 self.add_xp(5, "lore discovered")
 
         elif tag == "dark":
             if not self.has_item(1) and not self.has_item(2):
-                self.health -= 3
-                self.say("The darkness disorients you. You lose 3 health.", "yellow")
+                self.take_damage(3, "darkness", "The darkness disorients you. You lose {amount} health.", "yellow")
             else:
                 self.say("Your light source keeps the darkness at bay.")
 
@@ -1291,33 +1868,38 @@ class Player:
 
             if not q["accepted"]:
                 q["accepted"] = True
-                self.say(f"{q['giver']} offers quest: {q['title']}", "cyan")
+                self.emit("quest_offered", "{giver} offers quest: {title}", "cyan", quest=q["id"], giver=q["giver"], title=q["title"])
                 self.say(q["description"])
 
             if self.has_item(q["required_item"]):
                 q["completed"] = True
-                self.say(f"Quest complete: {q['title']}", "green")
+                self.emit("quest_completed", "Quest complete: {title}", "green", quest=q["id"], title=q["title"])
                 self.add_xp(q["reward_xp"], q["title"])
                 self.reputation[q["faction"]] += 1
                 reward_item = q["reward_item"]
                 if reward_item and not self.has_item(reward_item):
                     if self.add_item(reward_item):
-                        self.say("Reward received: " + self.obj_by_id[reward_item].Name, "green")
+                        self.emit(
+                            "item_gained", "Reward received: {item}", "green", item=self.obj_by_id[reward_item].Name, item_id=reward_item
+                        )
                     elif not self.location().ObjectID:
                         self.location().ObjectID = reward_item
-                        self.say("Reward dropped at your feet: " + self.obj_by_id[reward_item].Name)
+                        self.emit(
+                            "item_placed", "Reward dropped at your feet: {item}", item=self.obj_by_id[reward_item].Name, item_id=reward_item
+                        )
 
     def solve_rune(self, word):
         if self.current_loc != self.secret_room:
             self.say("No runes react here.")
             return False
-        loc = self.location()
-        if loc.SecretSolved:
+        if self.location().SecretSolved:
             self.say("The rune mechanism is already solved.")
             return False
         if normalize(word) == self.secret_keyword:
+            loc = self.location()
             loc.SecretSolved = True
             loc.E = self.secret_shortcut_target
+            self.writable_routes().insert_edge(loc.ID, "E", loc.E)
             self.say("Runes flare. A hidden eastern passage grinds open.", "green")
             self.add_xp(10, "secret solved")
             return True
@@ -1334,7 +1916,7 @@ class Player:
                 nloc = self.location(nxt)
                 details.append(f"{d}->{nxt}:{nloc.Tag}")
                 self.revealed_rooms.add(nxt)
-        self.say("Scout scan: " + (", ".join(details) if details else "no exits"), "cyan")
+        self.emit("scan", "Scout scan: {details}", "cyan", details=", ".join(details) if details else "no exits")
         self.add_xp(3, "scout scan")
         return True
 
@@ -1346,13 +1928,13 @@ class Player:
             npc = self.pending_encounter
             item = self.obj_by_id.get(npc.ObjectID)
             weak = item.Name if item else "unknown"
-            self.say(f"Analyze: {npc.Name} weakness appears to be {weak}.", "cyan", log=True)
+            self.emit("analysis", "Analyze: {npc} weakness appears to be {item}.", "cyan", log=True, npc=npc.Name, item=weak)
             self.add_xp(2, "combat analysis")
             return True
-        snippet = random.choice(self.lore_snippets)
+        snippet = self.rng.choice(self.lore_snippets)
         if snippet not in self.lore_seen:
             self.lore_seen.add(snippet)
-            self.say("Analyze uncovers lore: " + snippet, "cyan")
+            self.emit("lore_found", "Analyze uncovers lore: {text}", "cyan", text=snippet)
             self.add_xp(4, "scholar analysis")
             return True
         self.say("Analyze finds nothing new.")
@@ -1372,45 +1954,279 @@ class Player:
             self.perks["oil_torch_boost"] = False
         if npc.IsBoss:
             npc.HP -= dmg
-            self.say(f"Powerstrike hits {npc.Name} for {dmg} damage!", "green", log=True)
+            self.emit("damage_dealt", "Powerstrike hits {target} for {amount} damage!", "green", log=True, target=npc.Name, amount=dmg)
             self.advance_boss_phase(npc)
             if npc.HP <= 0:
                 return self.defeat_npc(npc)
             return True
 
         npc.HP -= dmg
-        self.say(f"Powerstrike hits {npc.Name} for {dmg} damage!", "green", log=True)
+        self.emit("damage_dealt", "Powerstrike hits {target} for {amount} damage!", "green", log=True, target=npc.Name, amount=dmg)
         if npc.HP <= 0:
             return self.defeat_npc(npc)
 
         retaliation = 8 + self.mutator.get("enemy_damage_bonus", 0)
-        self.health -= retaliation
-        self.say(f"{npc.Name} retaliates for {retaliation} damage.", "red", log=True)
+        self.take_damage(retaliation, npc.Name, "{source} retaliates for {amount} damage.", "red", log=True)
         return True
 
 
+class Entity:
+    """Base for the slotted world records: a fixed set of fields, cheap copies and plain-dict views.
+
+    field_names lists the public fields, defaults fills the ones a duck-typed
+    record (from a test or an old save) may lack.
+    """
+
+    __slots__ = ()
+    field_names = ()
+    defaults = {}
+
+    @classmethod
+    def from_fields(cls, **fields):
+        item = cls.__new__(cls)
+        for name in cls.field_names:
+            setattr(item, name, fields[name] if name in fields else copy.copy(cls.defaults[name]))
+        return item
+
+    @classmethod
+    def adopt(cls, item):
+        """Return item as this class, converting any object that has the same attributes."""
+        if isinstance(item, cls):
+            return item
+        return cls.from_fields(**{name: getattr(item, name) for name in cls.field_names if hasattr(item, name)})
+
+    def fields(self):
+        return {name: getattr(self, name) for name in self.field_names}
+
+    def __copy__(self):
+        item = type(self).__new__(type(self))
+        for name in self.__slots__:
+            setattr(item, name, getattr(self, name))
+        return item
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{k}={v!r}' for k, v in self.fields().items())})"
+
+
+class RoomInfo(Entity):
+    """The fixed part of a room: exits, CSV text and starting contents.
+
+    One RoomInfo is shared by every run of a world. A blank story or
+    description is None; each run draws its own generic text.
+    """
+
+    __slots__ = ("ID", "N", "S", "W", "E", "IsDark", "Story", "Desc", "ObjectID", "NpcID")
+    field_names = __slots__
+    defaults = {"N": 0, "S": 0, "W": 0, "E": 0, "IsDark": 0, "Story": None, "Desc": None, "ObjectID": 0, "NpcID": 0}
+
+    @classmethod
+    def from_row(cls, loc):
+        return cls.from_fields(
+            ID=to_int(loc["LOC_ID"]),
+            N=to_int(loc["LOC_N"]),
+            S=to_int(loc["LOC_S"]),
+            W=to_int(loc["LOC_W"]),
+            E=to_int(loc["LOC_E"]),
+            IsDark=to_int(loc.get("LOC_IS_DARK", 0)),
+            Story=None if isna(loc["LOC_STORY"]) else loc["LOC_STORY"],
+            Desc=None if isna(loc["LOC_DESC"]) else loc["LOC_DESC"],
+            ObjectID=to_int(loc["LOC_OBJ_ID"]),
+            NpcID=to_int(loc["LOC_NPC_ID"]),
+        )
+
+
+ROOM_TAGS = ("safe", "dark", "treasure", "trap", "lore")
+
+
+def room_field(name, default=None):
+    """A Location attribute read from the run's overlay, else from the RoomInfo (or default if given)."""
+
+    def get(loc):
+        changed = loc.rooms.changes.get(loc.index)
+        if changed is not None and name in changed:
+            return changed[name]
+        if default is not None:
+            return default
+        return getattr(loc.rooms.rooms[loc.index], name)
+
+    def set(loc, value):
+        loc.rooms.changes.setdefault(loc.index, {})[name] = value
+
+    return property(get, set)
+
+
 class Location:
-    """Locations in the game."""
-
-    def __init__(self, loc, gen_text):
-        rint = random.randint(0, len(gen_text) - 1)
-        self.ID = to_int(loc["LOC_ID"])
-        self.N = to_int(loc["LOC_N"])
-        self.S = to_int(loc["LOC_S"])
-        self.W = to_int(loc["LOC_W"])
-        self.E = to_int(loc["LOC_E"])
-        self.IsDark = to_int(loc.get("LOC_IS_DARK", 0))
-        self.Story = gen_text[rint].Story if isna(loc["LOC_STORY"]) else loc["LOC_STORY"]
-        self.Desc = gen_text[rint].Desc if isna(loc["LOC_DESC"]) else loc["LOC_DESC"]
-        self.ObjectID = to_int(loc["LOC_OBJ_ID"])
-        self.NpcID = to_int(loc["LOC_NPC_ID"])
-        self.Tag = "safe"
-        self.EventResolved = False
-        self.SecretSolved = False
-
-
-class Object:
-    """Objects in the game."""
+    """Locations in the game: a view of one room of a RoomSet.
+
+    Reads check the run's overlay before the shared RoomInfo and writes go
+    to the overlay, so views are cheap and can be made on every lookup.
+    """
+
+    __slots__ = ("rooms", "index")
+    field_names = RoomInfo.field_names + ("Tag", "EventResolved", "SecretSolved")
+
+    def __init__(self, rooms, index):
+        self.rooms = rooms
+        self.index = index
+
+    N = room_field("N")
+    S = room_field("S")
+    W = room_field("W")
+    E = room_field("E")
+    IsDark = room_field("IsDark")
+    NpcID = room_field("NpcID")
+    EventResolved = room_field("EventResolved", False)
+    SecretSolved = room_field("SecretSolved", False)
+
+    @property
+    def info(self):
+        return self.rooms.rooms[self.index]
+
+    @property
+    def ID(self):
+        return self.rooms.rooms[self.index].ID
+
+    def generic_text(self, name):
+        changed = self.rooms.changes.get(self.index)
+        if changed is not None and name in changed:
+            return changed[name]
+        text = getattr(self.rooms.rooms[self.index], name)
+        if text is None and self.rooms.gens:
+            text = getattr(self.rooms.gens[self.rooms.text[self.index]], name)
+        return text
+
+    @property
+    def Story(self):
+        return self.generic_text("Story")
+
+    @Story.setter
+    def Story(self, value):
+        self.rooms.changes.setdefault(self.index, {})["Story"] = value
+
+    @property
+    def Desc(self):
+        return self.generic_text("Desc")
+
+    @Desc.setter
+    def Desc(self, value):
+        self.rooms.changes.setdefault(self.index, {})["Desc"] = value
+
+    @property
+    def ObjectID(self):
+        return self.rooms.contents.get(self.index, 0)
+
+    @ObjectID.setter
+    def ObjectID(self, value):
+        if value:
+            self.rooms.contents[self.index] = value
+        else:
+            self.rooms.contents.pop(self.index, None)
+
+    @property
+    def Tag(self):
+        return ROOM_TAGS[self.rooms.tags[self.index]]
+
+    @Tag.setter
+    def Tag(self, value):
+        self.rooms.tags[self.index] = ROOM_TAGS.index(value)
+
+    def fields(self):
+        return {name: getattr(self, name) for name in self.field_names}
+
+    def __eq__(self, other):
+        return isinstance(other, Location) and other.rooms is self.rooms and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.rooms), self.index))
+
+    def __repr__(self):
+        return f"Location({', '.join(f'{k}={v!r}' for k, v in self.fields().items())})"
+
+
+class RoomSet:
+    """The rooms of one run: shared RoomInfo records under a small per-run overlay.
+
+    rooms, index (room ID to position) and gens are shared by every run of a
+    world. tags holds each room's tag as a byte and text which generic entry
+    fills its blank story and description. contents maps positions to the
+    object lying there, and changes holds any other field the run has set.
+    Indexing and iteration give Location views; by_id looks a room up.
+    """
+
+    def __init__(self, rooms, gens=(), index=None):
+        self.rooms = rooms
+        self.gens = gens
+        self.index = index if index is not None else {room.ID: i for i, room in enumerate(rooms)}
+        self.tags = bytearray(len(rooms))
+        self.text = array("H", bytes(2 * len(rooms)))
+        self.contents = {i: room.ObjectID for i, room in enumerate(rooms) if room.ObjectID}
+        self.changes = {}
+
+    @classmethod
+    def from_fields(cls, rows):
+        """Build a stand-alone RoomSet from dicts of Location fields (as saves and tests hold them)."""
+        rows = list(rows)
+        rooms = [RoomInfo.from_fields(**{k: v for k, v in row.items() if k in RoomInfo.field_names}) for row in rows]
+        locs = cls(rooms)
+        for loc, row in zip(locs, rows):
+            loc.Tag = row.get("Tag", "safe")
+            for name in ("EventResolved", "SecretSolved"):
+                if row.get(name):
+                    setattr(loc, name, True)
+        return locs
+
+    @classmethod
+    def adopt(cls, locs):
+        """Return locs as a RoomSet, converting any sequence of room-like objects."""
+        if isinstance(locs, cls):
+            return locs
+        return cls.from_fields({n: getattr(loc, n) for n in Location.field_names if hasattr(loc, n)} for loc in locs)
+
+    def draw_generic_text(self, rng=random):
+        """Pick every room's generic text entry, one draw per room in order."""
+        top = len(self.gens) - 1
+        for i in range(len(self.rooms)):
+            self.text[i] = rng.randint(0, top)
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def __iter__(self):
+        return (Location(self, i) for i in range(len(self.rooms)))
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self.rooms)
+        if not 0 <= i < len(self.rooms):
+            raise IndexError("room index out of range")
+        return Location(self, i)
+
+    def by_id(self, loc_id):
+        return Location(self, self.index[loc_id])
+
+    def holding(self, object_ids):
+        """IDs of the rooms where any of object_ids lies."""
+        return [self.rooms[i].ID for i, obj in self.contents.items() if obj in object_ids]
+
+    def resolved(self):
+        """Rooms whose event is resolved, in room order."""
+        return [Location(self, i) for i in sorted(self.changes) if self.changes[i].get("EventResolved")]
+
+    def copy(self):
+        """Return an independent overlay over the same shared rooms."""
+        locs = copy.copy(self)
+        locs.tags = bytearray(self.tags)
+        locs.contents = dict(self.contents)
+        locs.changes = {i: dict(changed) for i, changed in self.changes.items()}
+        return locs
+
+
+class Object(Entity):
+    """Objects in the game. They never change, so runs share them."""
+
+    __slots__ = ("ID", "Desc", "Name", "Story", "RequiredToWin")
+    field_names = __slots__
+    defaults = {"Story": "", "RequiredToWin": ""}
 
     def __init__(self, obj):
         self.ID = to_int(obj["OBJ_ID"])
@@ -1420,9 +2236,49 @@ class Object:
         self.RequiredToWin = obj["OBJ_WIN"]
 
 
-class NPC:
+class ObjectList(tuple):
+    """A world's objects with their ID index, shared by every run of it."""
+
+    def __new__(cls, objs):
+        objs = super().__new__(cls, (Object.adopt(o) for o in objs))
+        objs.by_id = {o.ID: o for o in objs}
+        return objs
+
+
+class NPC(Entity):
     """Non-player characters."""
 
+    __slots__ = (
+        "ID",
+        "Name",
+        "Desc",
+        "ObjectID",
+        "CanMove",
+        "StartLocationID",
+        "CurrentLocationID",
+        "Hostile",
+        "Patrol",
+        "IsBoss",
+        "HP",
+        "MaxHP",
+        "Phase",
+        "Telegraph",
+    )
+    field_names = __slots__
+    defaults = {
+        "ObjectID": 0,
+        "CanMove": "",
+        "StartLocationID": 0,
+        "CurrentLocationID": 0,
+        "Hostile": True,
+        "Patrol": [],
+        "IsBoss": False,
+        "HP": 40,
+        "MaxHP": 40,
+        "Phase": 1,
+        "Telegraph": None,
+    }
+
     def __init__(self, n):
         self.ID = to_int(n["NPC_ID"])
         self.Name = n["NPC_NAME"]
@@ -1439,23 +2295,312 @@ class NPC:
         self.Phase = 1
         self.Telegraph = None
 
+    @classmethod
+    def from_fields(cls, **fields):
+        if "MaxHP" not in fields:
+            fields["MaxHP"] = fields.get("HP", 40)
+        return super().from_fields(**fields)
+
 
-class Genloc:
+class Genloc(Entity):
     """Arbitrary text for game locations."""
 
+    __slots__ = ("ID", "Story", "Desc")
+    field_names = __slots__
+
     def __init__(self, gl):
         self.ID = to_int(gl["GEN_LOC_ID"])
         self.Story = gl["GEN_STORY"]
         self.Desc = gl["GEN_DESC"]
 
 
-def locations_from_file(fname, g):
+class RouteTable:
+    """All-pairs room distances and first steps for the dungeon topology.
+
+    Each row matches what a breadth-first search over N/S/E/W exits from that
+    room would return. The table keeps its own copy of the exits, so runtime
+    edits (insert_edge, remove_edge, disable_edge, enable_edge) repair only the
+    distance entries that route through the edited edge. recomputed counts the
+    entries touched by builds and repairs.
+    """
+
+    directions = ("N", "S", "E", "W")
+    max_cached_fields = 16
+
+    def __init__(self, locs):
+        self.loc_by_id = {l.ID: l for l in locs}
+        self.disabled = set()
+        self.recomputed = 0
+        self.fields = OrderedDict()
+        self.rebuild()
+
+    def rebuild(self):
+        self.fields = OrderedDict()
+        self.edges = {}
+        self.links = {}
+        self.preds = {loc_id: set() for loc_id in self.loc_by_id}
+        for loc_id, loc in self.loc_by_id.items():
+            self.edges[loc_id] = {d: getattr(loc, d) for d in self.directions if getattr(loc, d)}
+        for loc_id in self.loc_by_id:
+            for _, nxt in self.exits(loc_id):
+                self.links[(loc_id, nxt)] = self.links.get((loc_id, nxt), 0) + 1
+                self.preds[nxt].add(loc_id)
+        self.dist = {}
+        self.hops = {}
+        for loc_id in self.loc_by_id:
+            self._build_row(loc_id)
+
+    def copy(self):
+        """Return an independent table with the same routes, without recomputing them."""
+        table = object.__new__(type(self))
+        table.loc_by_id = self.loc_by_id
+        table.disabled = set(self.disabled)
+        table.recomputed = 0
+        table.fields = OrderedDict(self.fields)
+        table.edges = {loc_id: dict(edges) for loc_id, edges in self.edges.items()}
+        table.links = dict(self.links)
+        table.preds = {loc_id: set(prev) for loc_id, prev in self.preds.items()}
+        table.dist = {loc_id: dict(row) for loc_id, row in self.dist.items()}
+        table.hops = {loc_id: dict(row) for loc_id, row in self.hops.items()}
+        return table
+
+    def exits(self, loc_id):
+        edges = self.edges.get(loc_id, {})
+        return [
+            (d, edges[d])
+            for d in self.directions
+            if d in edges and edges[d] in self.loc_by_id and (loc_id, d) not in self.disabled
+        ]
+
+    def _build_row(self, start):
+        dist = {start: 0}
+        hops = {start: None}
+        queue = deque([start])
+        while queue:
+            loc_id = queue.popleft()
+            for d, nxt in self.exits(loc_id):
+                if nxt not in dist:
+                    dist[nxt] = dist[loc_id] + 1
+                    hops[nxt] = d if loc_id == start else hops[loc_id]
+                    queue.append(nxt)
+        self.dist[start] = dist
+        self.hops[start] = hops
+        self.recomputed += len(dist)
+
+    def step(self, start, target):
+        """Return (first direction, path length), or (None, 999) if unreachable."""
+        row = self.dist.get(start)
+        if row is None or target not in row:
+            return None, 999
+        return self.hops[start][target], row[target]
+
+    def field(self, sources):
+        """Return the (cached) DistanceField towards the nearest of sources.
+
+        The least recently used field is dropped once max_cached_fields are held.
+        """
+        key = frozenset(sources)
+        cached = self.fields.get(key)
+        if cached is not None:
+            self.fields.move_to_end(key)
+            return cached
+        if len(self.fields) >= self.max_cached_fields:
+            self.fields.popitem(last=False)
+        cached = self.fields[key] = DistanceField(self, key)
+        return cached
+
+    def insert_edge(self, loc_id, direction, target):
+        """Open (or redirect) the exit `direction` of loc_id towards target."""
+        if self.edges.get(loc_id, {}).get(direction) == target:
+            return
+        self.remove_edge(loc_id, direction)
+        if not target or loc_id not in self.edges:
+            return
+        self.edges[loc_id][direction] = target
+        if (loc_id, direction) not in self.disabled and target in self.loc_by_id:
+            self._link(loc_id, target)
+        self._refresh_row_hops(loc_id)
+
+    def remove_edge(self, loc_id, direction):
+        target = self.edges.get(loc_id, {}).pop(direction, None)
+        if target is None:
+            return
+        if (loc_id, direction) in self.disabled:
+            self.disabled.discard((loc_id, direction))
+        elif target in self.loc_by_id:
+            self._unlink(loc_id, target)
+        self._refresh_row_hops(loc_id)
+
+    def disable_edge(self, loc_id, direction):
+        """Temporarily close an exit without forgetting where it leads."""
+        target = self.edges.get(loc_id, {}).get(direction)
+        if target is None or (loc_id, direction) in self.disabled:
+            return
+        self.disabled.add((loc_id, direction))
+        if target in self.loc_by_id:
+            self._unlink(loc_id, target)
+        self._refresh_row_hops(loc_id)
+
+    def enable_edge(self, loc_id, direction):
+        if (loc_id, direction) not in self.disabled:
+            return
+        self.disabled.discard((loc_id, direction))
+        target = self.edges[loc_id][direction]
+        if target in self.loc_by_id:
+            self._link(loc_id, target)
+        self._refresh_row_hops(loc_id)
+
+    def _link(self, src, dst):
+        self.fields.clear()
+        count = self.links.get((src, dst), 0)
+        self.links[(src, dst)] = count + 1
+        self.preds[dst].add(src)
+        if count == 0:
+            self._repair_insert(src, dst)
+
+    def _unlink(self, src, dst):
+        self.fields.clear()
+        count = self.links.pop((src, dst)) - 1
+        if count:
+            self.links[(src, dst)] = count
+            return
+        self.preds[dst].discard(src)
+        self._repair_remove(src, dst)
+
+    def _repair_insert(self, src, dst):
+        # A shortest path from dst never loops back through src -> dst,
+        # so dst's row is still valid and can be spliced onto each source.
+        tail = self.dist[dst]
+        changed = []
+        for s, row in self.dist.items():
+            if src not in row or row[src] + 1 >= row.get(dst, 999):
+                continue
+            head = row[src] + 1
+            for t, d in tail.items():
+                self.recomputed += 1
+                if head + d < row.get(t, 999):
+                    row[t] = head + d
+                    changed.append((s, t))
+        self._refresh_hops(changed)
+
+    def _repair_remove(self, src, dst):
+        tail = self.dist[dst]
+        changed = []
+        for s, row in self.dist.items():
+            if src not in row or row.get(dst) != row[src] + 1:
+                continue
+            head = row[src] + 1
+            candidates = sorted(
+                (t for t, d in tail.items() if row.get(t) == head + d),
+                key=row.get,
+            )
+            self.recomputed += len(candidates)
+
+            # Candidates still backed by an unaffected predecessor keep their
+            # distance; the rest lost every shortest path through this edge.
+            lost = set()
+            for t in candidates:
+                want = row[t] - 1
+                if not any(p not in lost and row.get(p) == want for p in self.preds[t]):
+                    lost.add(t)
+            if not lost:
+                continue
+
+            best = {}
+            for t in lost:
+                for p in self.preds[t]:
+                    if p not in lost and p in row:
+                        best[t] = min(best.get(t, 999), row[p] + 1)
+            for t in lost:
+                del row[t]
+                changed.append((s, t))
+            frontier = [(d, t) for t, d in best.items()]
+            heapq.heapify(frontier)
+            while frontier:
+                d, t = heapq.heappop(frontier)
+                if t in row:
+                    continue
+                row[t] = d
+                for _, nxt in self.exits(t):
+                    if nxt in lost and nxt not in row and d + 1 < best.get(nxt, 999):
+                        best[nxt] = d + 1
+                        heapq.heappush(frontier, (d + 1, nxt))
+        self._refresh_hops(changed)
+
+    def _refresh_hops(self, changed):
+        touched = set()
+        for s, t in changed:
+            touched.add((s, t))
+            for p in self.preds[s]:
+                touched.add((p, t))
+        for s, t in touched:
+            self._refresh_hop(s, t)
+
+    def _refresh_row_hops(self, loc_id):
+        for t in list(self.hops[loc_id]):
+            self._refresh_hop(loc_id, t)
+
+    def _refresh_hop(self, s, t):
+        # BFS visits exits in N/S/E/W order, so its first step is always the
+        # first exit whose room is one step closer to the target.
+        row = self.dist[s]
+        hops = self.hops[s]
+        self.recomputed += 1
+        if t not in row:
+            hops.pop(t, None)
+            return
+        want = row[t] - 1
+        hops[t] = None
+        for d, nxt in self.exits(s):
+            if self.dist[nxt].get(t) == want:
+                hops[t] = d
+                break
+
+
+class DistanceField:
+    """Distance from every room to the nearest goal room, plus the step downhill.
+
+    Built with one reverse breadth-first search from all goals at once, so every
+    NPC chasing the same goals reads its move from a single search.
+    """
+
+    def __init__(self, routes, sources):
+        self.sources = frozenset(s for s in sources if s in routes.loc_by_id)
+        self.dist = {s: 0 for s in self.sources}
+        self.downhill = {}
+        queue = deque(sorted(self.sources))
+        while queue:
+            loc_id = queue.popleft()
+            nearer = self.dist[loc_id]
+            for prev in routes.preds[loc_id]:
+                if prev in self.dist:
+                    continue
+                # Every room at distance `nearer` is already known here, so the
+                # first such exit is the step a BFS from prev would take.
+                self.dist[prev] = nearer + 1
+                for d, nxt in routes.exits(prev):
+                    if self.dist.get(nxt) == nearer:
+                        self.downhill[prev] = d
+                        break
+                queue.append(prev)
+
+    def distance(self, loc_id):
+        return self.dist.get(loc_id, 999)
+
+    def step(self, loc_id):
+        return self.downhill.get(loc_id)
+
+
+def locations_from_file(fname, g, rng=random):
     try:
         rows = rows_from_csv(fname)
     except FileNotFoundError as exc:
         raise Exception("Cannot open locations file within data folder.") from exc
     try:
-        return [Location(r, g) for r in rows]
+        locs = RoomSet([RoomInfo.from_row(r) for r in rows], g or ())
+        if g is not None:
+            locs.draw_generic_text(rng)
+        return locs
     except Exception as exc:
         raise Exception("Cannot create LOCATION list.") from exc
 
@@ -1548,67 +2693,69 @@ def neighbors(loc):
     return [v for v in [loc.N, loc.S, loc.E, loc.W] if v]
 
 
-def choose_mutator():
-    options = [
-        {
-            "name": "None",
-            "desc": "Standard dungeon conditions.",
-            "enemy_damage_bonus": 0,
-            "fog": False,
-            "extra_traps": False,
-            "rich_loot": False,
-        },
-        {
-            "name": "Ironman",
-            "desc": "Lower max health, no mercy.",
-            "enemy_damage_bonus": 2,
-            "fog": False,
-            "extra_traps": False,
-            "rich_loot": False,
-        },
-        {
-            "name": "Fog of War",
-            "desc": "Map hints can lie.",
-            "enemy_damage_bonus": 0,
-            "fog": True,
-            "extra_traps": False,
-            "rich_loot": False,
-        },
-        {
-            "name": "Relentless Foes",
-            "desc": "Enemies hit harder.",
-            "enemy_damage_bonus": 5,
-            "fog": False,
-            "extra_traps": False,
-            "rich_loot": False,
-        },
-        {
-            "name": "Rich Vaults",
-            "desc": "Treasure rooms are more generous.",
-            "enemy_damage_bonus": 0,
-            "fog": False,
-            "extra_traps": False,
-            "rich_loot": True,
-        },
-        {
-            "name": "Hazard Floors",
-            "desc": "Trap rooms hurt more.",
-            "enemy_damage_bonus": 0,
-            "fog": False,
-            "extra_traps": True,
-            "rich_loot": False,
-        },
-    ]
-    return random.choice(options)
-
-
-def assign_room_tags(locs):
+MUTATORS = [
+    {
+        "name": "None",
+        "desc": "Standard dungeon conditions.",
+        "enemy_damage_bonus": 0,
+        "fog": False,
+        "extra_traps": False,
+        "rich_loot": False,
+    },
+    {
+        "name": "Ironman",
+        "desc": "Lower max health, no mercy.",
+        "enemy_damage_bonus": 2,
+        "fog": False,
+        "extra_traps": False,
+        "rich_loot": False,
+    },
+    {
+        "name": "Fog of War",
+        "desc": "Map hints can lie.",
+        "enemy_damage_bonus": 0,
+        "fog": True,
+        "extra_traps": False,
+        "rich_loot": False,
+    },
+    {
+        "name": "Relentless Foes",
+        "desc": "Enemies hit harder.",
+        "enemy_damage_bonus": 5,
+        "fog": False,
+        "extra_traps": False,
+        "rich_loot": False,
+    },
+    {
+        "name": "Rich Vaults",
+        "desc": "Treasure rooms are more generous.",
+        "enemy_damage_bonus": 0,
+        "fog": False,
+        "extra_traps": False,
+        "rich_loot": True,
+    },
+    {
+        "name": "Hazard Floors",
+        "desc": "Trap rooms hurt more.",
+        "enemy_damage_bonus": 0,
+        "fog": False,
+        "extra_traps": True,
+        "rich_loot": False,
+    },
+]
+
+
+def choose_mutator(rng=random):
+    return dict(rng.choice(MUTATORS))
+
+
+def assign_room_tags(locs, rng=random):
     for loc in locs:
         if loc.ID in {1, 90}:
             loc.Tag = "safe"
             continue
         exits = len(neighbors(loc))
-        roll = random.random()
+        roll = rng.random()
         if loc.IsDark:
             loc.Tag = "dark"
         elif exits <= 1 and roll < 0.65:
@@ -1623,13 +2770,13 @@ def assign_room_tags(locs):
             loc.Tag = "safe"
 
 
-def place_items_for_replayability(locs):
+def place_items_for_replayability(locs, rng=random):
     loc_by_id = {l.ID: l for l in locs}
     for loc in locs:
         loc.ObjectID = 0
 
     valid_ids = [l.ID for l in locs if l.ID not in {1, 90}]
-    random.shuffle(valid_ids)
+    rng.shuffle(valid_ids)
 
     required = [2, 3, 4]
     for rid in required:
@@ -1671,17 +2818,17 @@ def ensure_minimum_npcs(npcs):
         next_id += 1
 
 
-def place_npcs_for_replayability(locs, npcs):
+def place_npcs_for_replayability(locs, npcs, rng=random):
     loc_by_id = {l.ID: l for l in locs}
     spawnable = [l.ID for l in locs if l.ID not in {1, 90} and neighbors(l)]
     if not spawnable:
         return
 
     for npc in npcs:
-        random.shuffle(spawnable)
+        rng.shuffle(spawnable)
         base = spawnable[0]
         nbs = neighbors(loc_by_id[base])
-        patrol_to = random.choice(nbs) if nbs else base
+        patrol_to = rng.choice(nbs) if nbs else base
         npc.StartLocationID = base
         npc.CurrentLocationID = base
         npc.Patrol = [base, patrol_to]
@@ -1724,14 +2871,1497 @@ def choose_class(meta):
     return choice
 
 
-def prepare_world(locs, objs, npcs):
+def build_world(data_dir=DATA_DIR, rng=random, cache_path=None, share_routes=False):
+    """Prepare a fresh run of the CSV world in data_dir.
+
+    The parsed world comes from world_template, so only the first run (or the
+    first after a CSV edit) reads the files. cache_path is passed through.
+    With share_routes the returned RouteTable is the template's own, which
+    must be copied before any edit (Player.shared_routes does that).
+    """
+    locs, objs, npcs, routes = world_template(data_dir, cache_path).instantiate(rng, share_routes)
+    prepare_world(locs, objs, npcs, rng, routes)
+    return locs, objs, npcs, routes
+
+
+def prepare_world(locs, objs, npcs, rng=random, routes=None):
     add_bonus_objects(objs)
-    assign_room_tags(locs)
-    place_items_for_replayability(locs)
+    assign_room_tags(locs, rng)
+    place_items_for_replayability(locs, rng)
     ensure_minimum_npcs(npcs)
-    place_npcs_for_replayability(locs, npcs)
+    place_npcs_for_replayability(locs, npcs, rng)
     add_boss_npc(npcs)
+    return routes if routes is not None else RouteTable(locs)
+
+
+WORLD_FILES = ("genlocs.csv", "npcs.csv", "objects.csv", "locations.csv")
+WORLD_TEMPLATES = {}
+
+
+class WorldTemplate:
+    """The parsed CSV world, never modified once built, which every run of it shares.
+
+    rooms holds the RoomInfo records, objs the objects (bonus ones included)
+    and routes the table built from the CSV exits. instantiate gives a run a
+    RoomSet overlay on the rooms and its own NPC records. digest is the
+    SHA-256 of the CSVs when the template came from world_template.
+    """
+
+    cache_version = 4
+    route_fields = {"disabled", "recomputed", "edges", "links", "preds", "dist", "hops"}
+
+    def __init__(self, gens, rooms, objs, npcs, routes=None):
+        self.gens = tuple(gens)
+        self.rooms = tuple(rooms)
+        self.room_index = {room.ID: i for i, room in enumerate(self.rooms)}
+        self.objs = ObjectList(objs)
+        self.npcs = list(npcs)
+        self.routes = routes or RouteTable(self.rooms)
+        self.digest = None
+
+    @classmethod
+    def from_dir(cls, data_dir=DATA_DIR):
+        data_dir = Path(data_dir)
+        gens = genlocs_from_file(data_dir / "genlocs.csv")
+        npcs = npcs_from_file(data_dir / "npcs.csv")
+        objs = objects_from_file(data_dir / "objects.csv")
+        locs = locations_from_file(data_dir / "locations.csv", None)
+        add_bonus_objects(objs)
+        return cls(gens, locs.rooms, objs, npcs)
+
+    def instantiate(self, rng=random, share_routes=False):
+        """Return (locs, objs, npcs, routes) for a new run, drawing room text from rng like the CSV loaders.
+
+        routes is a private copy unless share_routes is set.
+        """
+        locs = RoomSet(self.rooms, self.gens, self.room_index)
+        locs.draw_generic_text(rng)
+        npcs = []
+        for proto in self.npcs:
+            npc = copy.copy(proto)
+            npc.Patrol = list(npc.Patrol)
+            npcs.append(npc)
+        routes = self.routes if share_routes else self.routes.copy()
+        return locs, self.objs, npcs, routes
+
+    def to_data(self):
+        routes = {key: value for key, value in vars(self.routes).items() if key not in ("loc_by_id", "fields")}
+        return {
+            "version": self.cache_version,
+            "gens": [g.fields() for g in self.gens],
+            "rooms": [r.fields() for r in self.rooms],
+            "objs": [o.fields() for o in self.objs],
+            "npcs": [n.fields() for n in self.npcs],
+            "routes": routes,
+        }
+
+    @classmethod
+    def from_data(cls, data):
+        if data.get("version") != cls.cache_version:
+            raise ValueError(f"Unsupported world cache version: {data.get('version')}")
+        if set(data["routes"]) != cls.route_fields:
+            raise ValueError("World cache routes are incomplete.")
+        rooms = [RoomInfo.from_fields(**fields) for fields in data["rooms"]]
+        routes = object.__new__(RouteTable)
+        routes.__dict__.update(data["routes"])
+        routes.loc_by_id = {room.ID: room for room in rooms}
+        routes.fields = OrderedDict()
+        return cls(
+            [Genloc.from_fields(**fields) for fields in data["gens"]],
+            rooms,
+            [Object.from_fields(**fields) for fields in data["objs"]],
+            [NPC.from_fields(**fields) for fields in data["npcs"]],
+            routes,
+        )
+
+
+def world_fingerprint(data_dir):
+    """(name, mtime_ns, size) for each world CSV; a missing file is left to the loaders to report."""
+    stamps = []
+    for name in WORLD_FILES:
+        try:
+            stat = (Path(data_dir) / name).stat()
+        except OSError:
+            return None
+        stamps.append((name, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+def world_digest(data_dir):
+    digest = hashlib.sha256()
+    for name in WORLD_FILES:
+        digest.update(name.encode("utf-8"))
+        digest.update((Path(data_dir) / name).read_bytes())
+    return digest.hexdigest()
+
+
+def world_template(data_dir=DATA_DIR, cache_path=None):
+    """Return the parsed world for data_dir, parsing the CSVs only when they change.
+
+    Templates stay in memory for the life of the process and are checked
+    against the files' modification times and sizes on every call. With
+    cache_path, a template missing from memory is read from that file when
+    the stamps match, or when they differ but the files' SHA-256 digest is
+    unchanged. Otherwise it is parsed again and written back. The cache is
+    best effort: an unreadable or unwritable file just means parsing.
+    """
+    data_dir = Path(data_dir).resolve()
+    fingerprint = world_fingerprint(data_dir)
+    cached = WORLD_TEMPLATES.get(data_dir)
+    if cached is not None and fingerprint is not None and cached[0] == fingerprint:
+        return cached[1]
+    template = None
+    if cache_path is not None and fingerprint is not None:
+        template = load_world_cache(cache_path, data_dir, fingerprint)
+    if template is None:
+        template = WorldTemplate.from_dir(data_dir)
+        template.digest = world_digest(data_dir)
+        if cache_path is not None and fingerprint is not None:
+            save_world_cache(cache_path, template, fingerprint, template.digest)
+    if fingerprint is not None:
+        WORLD_TEMPLATES[data_dir] = (fingerprint, template)
+    return template
+
+
+def load_world_cache(cache_path, data_dir, fingerprint):
+    """Read a template saved by save_world_cache, or None on any mismatch or damage.
+
+    The file holds plain data in marshal format, so reading it never runs code.
+    """
+    try:
+        with open(cache_path, "rb") as handle:
+            cached = marshal.load(handle)
+        if cached["fingerprint"] != fingerprint:
+            digest = world_digest(data_dir)
+            if cached["digest"] != digest:
+                return None
+            # Touched but unchanged: keep the cache and record the new stamps.
+            cached["fingerprint"] = fingerprint
+            template = WorldTemplate.from_data(cached["template"])
+            template.digest = digest
+            save_world_cache(cache_path, template, fingerprint, digest)
+            return template
+        template = WorldTemplate.from_data(cached["template"])
+        template.digest = cached["digest"]
+        return template
+    except Exception:
+        # A damaged or foreign cache file is just a miss.
+        return None
+
+
+def save_world_cache(cache_path, template, fingerprint, digest):
+    data = {"fingerprint": fingerprint, "digest": digest, "template": template.to_data()}
+    temp_path = Path(f"{cache_path}.tmp")
+    try:
+        with open(temp_path, "wb") as handle:
+            marshal.dump(data, handle)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+
+
+def default_prompt_answer(text):
+    """Confirm yes/no prompts and skip everything else (bonus moves, item pickers)."""
+    return "Y" if "y/n" in text.lower() else ""
+
+
+def random_policy(player):
+    """Pick a random legal command, never dropping items."""
+    commands = [c for c in player.legal_commands() if not c.startswith("drop ")]
+    return player.rng.choice(commands) if commands else "look"
+
+
+BOSS_TELEGRAPH_DAMAGE = {1: 8, 2: 12, 3: 16}
+COMBAT_OUTCOME_RANK = {"death": 0, "flee": 1, "win": 2}
+
+
+def combat_state(player, npc=None):
+    """Describe a fight with npc (default: the pending encounter) for solve_combat.
+
+    The state is a hashable tuple: the fixed rules of the fight followed by the
+    parts that change from round to round.
+    """
+    npc = npc or player.pending_encounter
+    telegraph = getattr(npc, "Telegraph", None)
+    rules = (
+        player.player_class == "fighter",
+        bool(npc.IsBoss),
+        player.mutator.get("enemy_damage_bonus", 0),
+        player.max_health,
+        npc.MaxHP,
+        npc.ObjectID,
+    )
+    return (
+        rules,
+        player.health,
+        npc.HP,
+        npc.Phase,
+        telegraph["damage"] if telegraph else 0,
+        tuple(sorted(i for i in player.backpack if i is not None)),
+        bool(player.perks.get("aura_shield")),
+        bool(player.perks.get("oil_torch_boost")),
+    )
+
+
+def solve_combat(state):
+    """Play a combat state perfectly and report how it ends.
+
+    Combat has no randomness, so this is an exact search over every useful
+    action, memoized across recent calls. Wins rank above escapes above deaths; ties
+    go to more health left, then fewer rounds. Actions are ("attack",),
+    ("powerstrike",), ("flee",), ("use", item) or ("use", item, other).
+    """
+    outcome, hp, npc_hp, rounds, actions = _solve_combat_round(*state)
+    return {"outcome": outcome, "hp": hp, "npc_hp": npc_hp, "rounds": rounds, "actions": list(actions)}
+
+
+def _boss_phase(npc_hp, phase, npc_max_hp):
+    if phase == 1 and npc_hp <= int(npc_max_hp * 0.66):
+        phase = 2
+    if phase == 2 and npc_hp <= int(npc_max_hp * 0.33):
+        phase = 3
+    return phase
+
+
+def _combat_moves(rules, hp, npc_hp, phase, items, aura, oil):
+    """Yield (action, result) for each useful action, mirroring handle_encounter_turn.
+
+    result is (outcome, hp, npc_hp) when the fight ends, else the next
+    (hp, npc_hp, phase, items, aura, oil) before any boss telegraph.
+    """
+    fighter, boss, bonus, max_hp, npc_max_hp, weakness = rules
+    base = (18 if fighter else 12) + (4 if 2 in items and 102 in items else 0)
+
+    def hit(action, damage, retaliation, aura_after=aura, oil_after=oil):
+        left = npc_hp - damage
+        if left <= 0:
+            return action, ("win", hp, left)
+        if boss:
+            return action, (hp, left, _boss_phase(left, phase, npc_max_hp), items, aura_after, oil_after)
+        if hp - retaliation <= 0:
+            return action, ("death", hp - retaliation, left)
+        return action, (hp - retaliation, left, phase, items, aura_after, oil_after)
+
+    if boss:
+        yield hit(("attack",), base, 0)
+    elif weakness in items:
+        yield hit(("attack",), base + 16, 0)
+    elif aura:
+        yield hit(("attack",), base, max(0, 8 + bonus - 4), aura_after=False)
+    else:
+        yield hit(("attack",), base, 8 + bonus)
+    if fighter:
+        yield hit(("powerstrike",), 32 if oil else 24, 8 + bonus, oil_after=False)
+    if not boss:
+        yield ("flee",), ("flee" if hp > 5 else "death", hp - 5, npc_hp)
+    if weakness in items:
+        yield hit(("use", weakness), 25 if boss else npc_hp, 0)
+    if 104 in items and 104 != weakness and hp < max_hp:
+        rest = list(items)
+        rest.remove(104)
+        yield ("use", 104), (min(max_hp, hp + 20), npc_hp, phase, tuple(rest), aura, oil)
+    if fighter and not oil and 1 in items and 105 in items:
+        rest = list(items)
+        rest.remove(105)
+        yield ("use", 1, 105), (hp, npc_hp, phase, tuple(rest), aura, True)
+    if not boss and not aura and 2 in items and 102 in items:
+        yield ("use", 2, 102), (hp, npc_hp, phase, items, True, oil)
+
+
+# A hard fight reaches a few thousand states, so this holds several at once
+# while keeping a long-lived server's memory bounded.
+@functools.lru_cache(maxsize=1 << 14)
+def _solve_combat_round(rules, hp, npc_hp, phase, telegraph, items, aura, oil):
+    boss, bonus = rules[1], rules[2]
+    if telegraph:
+        hp -= telegraph + bonus
+        if hp <= 0:
+            return "death", hp, npc_hp, 1, ()
+    best = best_key = None
+    for action, result in _combat_moves(rules, hp, npc_hp, phase, items, aura, oil):
+        if isinstance(result[0], str):
+            outcome, end_hp, end_npc_hp = result
+            found = (outcome, end_hp, end_npc_hp, 1, (action,))
+        else:
+            next_hp, next_npc_hp, next_phase, next_items, next_aura, next_oil = result
+            next_telegraph = BOSS_TELEGRAPH_DAMAGE.get(next_phase, 16) if boss else 0
+            outcome, end_hp, end_npc_hp, rounds, actions = _solve_combat_round(
+                rules, next_hp, next_npc_hp, next_phase, next_telegraph, next_items, next_aura, next_oil
+            )
+            found = (outcome, end_hp, end_npc_hp, rounds + 1, (action,) + actions)
+        key = (COMBAT_OUTCOME_RANK[found[0]], found[1] if found[0] != "death" else -found[2], -found[3])
+        if best_key is None or key > best_key:
+            best, best_key = found, key
+    return best
+
+
+def evaluate_position(player):
+    """Score a position from 0 (dead) to 1 (escaped) for search.
+
+    Unfinished runs score by relics carried, route distance to the next goal
+    (the nearest missing relic, else the exit), health and XP.
+    """
+    if player.game_over:
+        return 1.0 if player.ending not in (None, "Death", "Quit") else 0.0
+    missing = player.required_artifacts.difference(player.backpack)
+    goals = player.locs.holding(missing) if missing else [90]
+    distance = player.routes.field(goals).distance(player.current_loc)
+    progress = (len(player.required_artifacts) - len(missing) + max(0, 1 - distance / 20)) / (len(player.required_artifacts) + 1)
+    health = max(0, player.health) / player.max_health
+    return 0.05 + 0.5 * progress + 0.3 * health + 0.1 * min(player.xp, 200) / 200
+
+
+class SearchPolicy:
+    """Choose commands by Monte Carlo tree search over legal_commands.
+
+    Statistics live in a transposition table keyed by Player.state_key(), so a
+    position reached along different paths is searched once. Every playout
+    reseeds its fork's generator, sampling chance instead of reading the real
+    run's future. A decision runs at least one playout and stops after
+    node_budget positions or time_budget seconds, whichever comes first (give at
+    least one); last holds its statistics and nodes_per_second the rate over all
+    decisions so far.
+    """
+
+    def __init__(self, node_budget=400, time_budget=None, depth=12, rollout=4, exploration=1.0, seed=0, max_table_size=200000):
+        if node_budget is None and time_budget is None:
+            raise ValueError("SearchPolicy needs a node_budget or a time_budget.")
+        if depth < 1:
+            raise ValueError("SearchPolicy depth must be at least 1.")
+        self.node_budget = node_budget
+        self.time_budget = time_budget
+        self.depth = depth
+        self.rollout = rollout
+        self.exploration = exploration
+        self.max_table_size = max_table_size
+        self.rng = random.Random(seed)
+        self.table = {}
+        self.run = None
+        self.nodes = 0
+        self.seconds = 0.0
+        self.last = {}
+
+    @property
+    def nodes_per_second(self):
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    def __call__(self, player):
+        commands = player.legal_commands()
+        if len(commands) <= 1:
+            return commands[0] if commands else "look"
+        run = (player.seed, player.player_class, player.mutator["name"])
+        if run != self.run or len(self.table) >= self.max_table_size:
+            self.table.clear()
+            self.run = run
+
+        start = time.perf_counter()
+        nodes = playouts = 0
+        while True:
+            nodes += self.playout(player)
+            playouts += 1
+            if self.node_budget is not None and nodes >= self.node_budget:
+                break
+            if self.time_budget is not None and time.perf_counter() - start >= self.time_budget:
+                break
+        seconds = time.perf_counter() - start
+
+        root = self.table[player.state_key()]
+        command = max(root[1], key=lambda c: (root[1][c][0], root[1][c][1]))
+        visits, total = root[1][command]
+        self.nodes += nodes
+        self.seconds += seconds
+        self.last = {
+            "command": command,
+            "nodes": nodes,
+            "playouts": playouts,
+            "seconds": seconds,
+            "nodes_per_second": nodes / seconds if seconds else 0.0,
+            "value": total / visits if visits else 0.0,
+            "table_size": len(self.table),
+        }
+        return command
+
+    def playout(self, root):
+        """Run one selection, expansion and rollout from root; return positions visited."""
+        branch = root.fork()
+        branch.rng.seed(self.rng.getrandbits(64))
+        path = []
+        steps = 0
+        while steps < self.depth and not branch.game_over:
+            key = branch.state_key()
+            node = self.table.get(key)
+            expanded = node is None
+            if expanded:
+                node = self.table[key] = [0, {c: [0, 0.0] for c in branch.legal_commands() or ["look"]}]
+            command = self.select(node)
+            node[0] += 1
+            path.append(node[1][command])
+            branch.run_command(command)
+            steps += 1
+            if expanded:
+                break
+        for _ in range(self.rollout):
+            if branch.game_over:
+                break
+            commands = [c for c in branch.legal_commands() if not c.startswith("drop ")]
+            branch.run_command(self.rng.choice(commands) if commands else "look")
+            steps += 1
+
+        value = evaluate_position(branch)
+        for stats in path:
+            stats[0] += 1
+            stats[1] += value
+        return steps
+
+    def select(self, node):
+        visits, actions = node
+        untried = [c for c, (n, _) in actions.items() if n == 0]
+        if untried:
+            return self.rng.choice(untried)
+        scale = self.exploration * math.sqrt(math.log(visits))
+        return max(actions, key=lambda c: actions[c][1] / actions[c][0] + scale / math.sqrt(actions[c][0]))
+
+
+def mutator_by_name(name):
+    for mutator in MUTATORS:
+        if mutator["name"] == name:
+            return dict(mutator)
+    raise ValueError(f"Unknown mutator: {name!r}")
+
+
+def new_run(
+    seed=None,
+    player_class="adventurer",
+    mutator=None,
+    meta=None,
+    data_dir=DATA_DIR,
+    record=False,
+    world_cache=None,
+    **player_options,
+):
+    """Build a fresh world and Player from seed, class and mutator.
+
+    The mutator is always drawn from the run's generator before the world is
+    built, so a run given an explicit mutator consumes randomness exactly like
+    one that drew it. With record=True the Player records a Replay.
+    world_cache is the optional on-disk template cache (see world_template).
+    Remaining options go to Player.
+    """
+    rng = GameRandom(seed)
+    drawn = choose_mutator(rng)
+    if mutator is None:
+        mutator = drawn
+    elif isinstance(mutator, str):
+        mutator = mutator_by_name(mutator)
+    else:
+        mutator = dict(mutator)
+    locs, objs, npcs, routes = build_world(data_dir, rng, world_cache, share_routes=True)
+    if meta is None:
+        meta = {
+            "wins": 0,
+            "total_xp": 0,
+            "unlocked_classes": list(CLASSES),
+            "last_class": player_class,
+            "best_ending": "",
+        }
+    player = Player(
+        locs,
+        objs,
+        npcs,
+        meta=meta,
+        mutator=mutator,
+        player_class=player_class,
+        routes=routes,
+        rng=rng,
+        **player_options,
+    )
+    # The routes belong to the world template; the first edit copies them.
+    player.shared_routes = True
+    if record:
+        player.replay = Replay(rng.run_seed, player.player_class, player.mutator)
+    return player
+
+
+class Replay:
+    """Everything needed to play a run again: its setup and its input stream.
+
+    steps holds [command, answers] pairs in order. command is the text given
+    to run_command, or None for a begin_session call; answers are the prompt
+    replies given while that step ran.
+    """
+
+    version = 1
+
+    def __init__(self, seed, player_class, mutator, steps=None):
+        self.seed = seed
+        self.player_class = player_class
+        self.mutator = dict(mutator)
+        self.steps = [[command, list(answers)] for command, answers in steps or []]
+
+    def to_dict(self):
+        return {
+            "version": self.version,
+            "seed": self.seed,
+            "player_class": self.player_class,
+            "mutator": self.mutator,
+            "steps": [[command, list(answers)] for command, answers in self.steps],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version") != cls.version:
+            raise Exception(f"Unsupported replay version: {data.get('version')}")
+        return cls(data["seed"], data["player_class"], data["mutator"], data["steps"])
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(self.to_dict(), handle)
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                return cls.from_dict(json.load(handle))
+        except (OSError, ValueError, KeyError) as exc:
+            raise Exception(f"Error reading replay {path}: {exc}") from exc
+
+
+def replay_run(replay, stop_turn=None, stop_step=None, sinks=None, data_dir=DATA_DIR):
+    """Play a Replay back and return the resulting Player.
+
+    Playback stops before the first step taken at turn stop_turn, or after
+    stop_step steps. With no sinks nothing is rendered, so fast-forwarding runs
+    at simulation speed. The returned Player records its own Replay of the
+    steps played, so it can be played on or saved from there.
+    """
+    pending = []
+
+    def answer(text):
+        if not pending:
+            raise Exception(f"Replay diverged: unexpected prompt {text!r}")
+        return pending.pop(0)
+
+    player = new_run(
+        replay.seed,
+        replay.player_class,
+        replay.mutator,
+        data_dir=data_dir,
+        record=True,
+        input_func=answer,
+        output_func=None,
+        sinks=sinks,
+        show_ascii_minimap=False,
+        interface_mode="ui",
+    )
+    for index, (command, answers) in enumerate(replay.steps):
+        if stop_step is not None and index >= stop_step:
+            break
+        if stop_turn is not None and player.turn_count >= stop_turn:
+            break
+        pending[:] = answers
+        if command is None:
+            player.begin_session()
+        else:
+            player.run_command(command)
+    return player
+
+
+RUN_STATE_VERSION = 2
+RUN_STATE_FIELDS = (
+    "player_class",
+    "mutator",
+    "backpack",
+    "current_loc",
+    "previous_loc",
+    "health",
+    "max_health",
+    "game_over",
+    "ending",
+    "death_cause",
+    "last_damage_cause",
+    "new_location",
+    "valid_command",
+    "told_story",
+    "xp",
+    "perks",
+    "map_boost_active",
+    "required_artifacts",
+    "lore_seen",
+    "defeated_npcs",
+    "turn_count",
+    "reputation",
+    "revealed_rooms",
+    "secret_room",
+    "secret_keyword",
+    "secret_shortcut_target",
+    "hunter_id",
+    "hunter_awake",
+    "timed_block",
+    "style",
+    "quests",
+    "pending_question",
+)
+RUN_STATE_SETS = ("required_artifacts", "lore_seen", "defeated_npcs", "revealed_rooms")
+ROOM_EXITS = ("N", "S", "W", "E")
+
+
+def save_state(player):
+    """Return everything needed to resume player's run as JSON-ready data.
+
+    Unlike a full save, rooms are stored as the run's overlay on the shared
+    world, so the data stays small and load_state resumes on the shared
+    rooms and routes. Combat log entries are kept as text. The result shares
+    nothing mutable with the player, so it can be handed to another thread.
+    """
+    locs = player.locs
+    version, internal, gauss_next = player.rng.getstate()
+    fields = {}
+    for name in RUN_STATE_FIELDS:
+        value = getattr(player, name)
+        fields[name] = sorted(value) if name in RUN_STATE_SETS else copy.deepcopy(value)
+    pending = player.pending_encounter
+    return {
+        "version": RUN_STATE_VERSION,
+        "seed": player.seed,
+        "rng_state": [version, list(internal), gauss_next],
+        "meta": copy.deepcopy(player.meta),
+        "player": fields,
+        "combat_log": [str(line) for line in player.combat_log],
+        "pending_encounter": player.npcs.index(pending) if pending is not None else None,
+        "rooms": {
+            "count": len(locs),
+            "tags": locs.tags.hex(),
+            "text": locs.text.tolist(),
+            "contents": sorted(locs.contents.items()),
+            "changes": sorted((index, dict(changed)) for index, changed in locs.changes.items()),
+        },
+        "npcs": copy.deepcopy([npc.fields() for npc in player.npcs]),
+        "disabled": sorted(player.routes.disabled),
+        "replay": player.replay.to_dict() if player.replay else None,
+    }
+
+
+def load_state(state, data_dir=DATA_DIR, world_cache=None, **player_options):
+    """Resume a run saved by save_state on the shared world in data_dir.
+
+    Player options (I/O, sinks, interface) are given afresh. The rebuilt
+    Player emits nothing while it is restored.
+    """
+    if state.get("version") != RUN_STATE_VERSION:
+        raise Exception(f"Unsupported run state version: {state.get('version')}")
+    template = world_template(data_dir, world_cache)
+    rooms = state["rooms"]
+    if rooms["count"] != len(template.rooms):
+        raise Exception("Saved run does not match this world.")
+    locs = RoomSet(template.rooms, template.gens, template.room_index)
+    locs.tags[:] = bytes.fromhex(rooms["tags"])
+    locs.text = array("H", rooms["text"])
+    locs.contents = {index: obj for index, obj in rooms["contents"]}
+    locs.changes = {index: dict(changed) for index, changed in rooms["changes"]}
+
+    routes = template.routes
+    exits = [(loc, d) for loc in locs for d in ROOM_EXITS if d in locs.changes.get(loc.index, ())]
+    if exits or state["disabled"]:
+        routes = routes.copy()
+        for loc, direction in exits:
+            routes.insert_edge(loc.ID, direction, getattr(loc, direction))
+        for loc_id, direction in state["disabled"]:
+            routes.disable_edge(loc_id, direction)
+
+    version, internal, gauss_next = state["rng_state"]
+    rng = GameRandom(state["seed"])
+    rng.setstate((version, tuple(internal), gauss_next))
+
+    fields = state["player"]
+    sinks = player_options.pop("sinks", None)
+    output_func = player_options.pop("output_func", None)
+    player = Player(
+        locs,
+        template.objs,
+        [NPC.from_fields(**npc) for npc in state["npcs"]],
+        meta=state["meta"],
+        mutator=fields["mutator"],
+        player_class=fields["player_class"],
+        routes=routes,
+        rng=rng,
+        output_func=None,
+        **player_options,
+    )
+    for name in RUN_STATE_FIELDS:
+        value = copy.deepcopy(fields[name])
+        setattr(player, name, set(value) if name in RUN_STATE_SETS else value)
+    player.combat_log = list(state["combat_log"])
+    if state["pending_encounter"] is not None:
+        player.pending_encounter = player.npcs[state["pending_encounter"]]
+    player.shared_routes = routes is template.routes
+    if state.get("replay"):
+        player.replay = Replay.from_dict(state["replay"])
+    player.sinks = list(sinks or [])
+    player.output_func = output_func
+    return player
+
+
+RUN_FILE_MAGIC = b"DORKRUN"
+RUN_FILE_VERSION = 1
+RUN_FILE_HEADER = struct.Struct("<7sB32sHHHI")
+
+
+def pack_state(state, template):
+    """Encode a save_state result as compact bytes for runs of template.
+
+    The world's text is not stored, only template.digest. After a fixed
+    header come the random generator's words, the room tags and text choices
+    as raw arrays, the revealed rooms as a bitset, then the rest as
+    compressed JSON. NPCs from the CSV keep only the fields that differ from
+    the template; those added for the run are stored whole.
+    """
+    rooms = state["rooms"]
+    version, internal, gauss_next = state["rng_state"]
+    fields = dict(state["player"])
+    revealed = 0
+    for loc_id in fields.pop("revealed_rooms"):
+        revealed |= 1 << loc_id
+    rest = {key: value for key, value in state.items() if key not in ("rng_state", "rooms", "npcs", "player")}
+    rest["player"] = fields
+    rest["rng"] = [version, gauss_next]
+    rest["rooms"] = {"contents": rooms["contents"], "changes": rooms["changes"]}
+    protos = template.npcs
+    rest["npcs"] = [
+        npc if i >= len(protos) else {name: value for name, value in npc.items() if getattr(protos[i], name) != value}
+        for i, npc in enumerate(state["npcs"])
+    ]
+    body = zlib.compress(json.dumps(rest, separators=(",", ":")).encode("utf-8"), 1)
+    bits = revealed.to_bytes((revealed.bit_length() + 7) // 8, "little")
+    count = rooms["count"]
+    header = RUN_FILE_HEADER.pack(
+        RUN_FILE_MAGIC, RUN_FILE_VERSION, bytes.fromhex(template.digest or "0" * 64), count, len(internal), len(bits), len(body)
+    )
+    return b"".join(
+        (
+            header,
+            struct.pack(f"<{len(internal)}I", *internal),
+            bytes.fromhex(rooms["tags"]),
+            struct.pack(f"<{count}H", *rooms["text"]),
+            bits,
+            body,
+        )
+    )
+
+
+def unpack_state(data, template):
+    """Decode bytes from pack_state back into save_state form."""
+    magic, version, digest, count, words, bit_bytes, body_bytes = RUN_FILE_HEADER.unpack_from(data)
+    if magic != RUN_FILE_MAGIC or version != RUN_FILE_VERSION:
+        raise ValueError("Not a Dungeons of Dork run file.")
+    if template.digest is not None and digest.hex() != template.digest:
+        raise ValueError("Saved run does not match this world.")
+    offset = RUN_FILE_HEADER.size
+    internal = list(struct.unpack_from(f"<{words}I", data, offset))
+    offset += 4 * words
+    tags = data[offset : offset + count].hex()
+    offset += count
+    text = list(struct.unpack_from(f"<{count}H", data, offset))
+    offset += 2 * count
+    revealed = int.from_bytes(data[offset : offset + bit_bytes], "little")
+    offset += bit_bytes
+    rest = json.loads(zlib.decompress(data[offset : offset + body_bytes]))
+
+    rng_version, gauss_next = rest.pop("rng")
+    room_rest = rest.pop("rooms")
+    rest["rng_state"] = [rng_version, internal, gauss_next]
+    rest["rooms"] = {"count": count, "tags": tags, "text": text, **room_rest}
+    protos = template.npcs
+    rest["npcs"] = [
+        {**copy.deepcopy(protos[i].fields()), **changed} if i < len(protos) else changed
+        for i, changed in enumerate(rest["npcs"])
+    ]
+    rest["player"]["revealed_rooms"] = [loc_id for loc_id in range(revealed.bit_length()) if revealed >> loc_id & 1]
+    return rest
+
+
+def read_run_file(path, template):
+    """Read a saved run in either format: pack_state bytes or JSON.
+
+    JSON saves come back as they were written, so callers can still tell
+    an older full save (version 1) from a run state by its version.
+    """
+    with open(path, "rb") as handle:
+        data = handle.read()
+    if data.startswith(RUN_FILE_MAGIC):
+        return unpack_state(data, template)
+    return json.loads(data)
+
+
+def state_changes(old, new, path=()):
+    """Return the operations that turn JSON-like data old into new.
+
+    Each operation is ["set", path, value], ["add", path, items] (extend a
+    list) or ["del", path]. Lists of the same length are compared item by
+    item unless most items changed, so a Mersenne Twister state or an NPC
+    table costs only the entries that moved. Tuples compare as lists.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key, value in new.items():
+            if key not in old:
+                ops.append(["set", [*path, key], value])
+            elif old[key] != value:
+                ops.extend(state_changes(old[key], value, (*path, key)))
+        ops.extend(["del", [*path, key]] for key in old if key not in new)
+        return ops
+    if isinstance(old, (list, tuple)) and isinstance(new, (list, tuple)) and len(new) >= len(old):
+        ops = []
+        changed = 0
+        for index, value in enumerate(new[: len(old)]):
+            if old[index] != value:
+                item_ops = state_changes(old[index], value, (*path, index))
+                changed += bool(item_ops)
+                ops.extend(item_ops)
+        if changed * 2 > len(old):
+            return [["set", list(path), new]]
+        if len(new) > len(old):
+            ops.append(["add", list(path), new[len(old) :]])
+        return ops
+    if old == new and type(old) is type(new):
+        return []
+    return [["set", list(path), new]]
+
+
+def apply_state_changes(data, ops):
+    """Apply operations from state_changes to data in place."""
+    for op in ops:
+        kind, path = op[0], op[1]
+        target = data
+        for key in path[:-1]:
+            target = target[key]
+        if kind == "add":
+            (target[path[-1]] if path else target).extend(op[2])
+        elif kind == "del":
+            del target[path[-1]]
+        else:
+            target[path[-1]] = op[2]
+    return data
+
+
+class SaveJournal:
+    """A run save kept as a base snapshot plus an append-only log of changes.
+
+    The base is written with pack_state for the world in data_dir; a JSON
+    base from older versions is still read.
+
+    record() appends only what changed since the last call as one JSON line,
+    so a turn costs what it changed rather than the size of the run. Once the
+    log passes compact_bytes, a fresh base is written on a background thread
+    and the log restarts. Every line carries the generation of the base it
+    follows, so load() can replay the log whether or not a crash interrupted
+    a compaction, and it stops at a line torn by a crash.
+    """
+
+    def __init__(self, base_path, journal_path, compact_bytes=64 * 1024, data_dir=DATA_DIR, world_cache=None):
+        self.base_path = Path(base_path)
+        self.journal_path = Path(journal_path)
+        self.compact_bytes = compact_bytes
+        self.data_dir = data_dir
+        self.world_cache = world_cache
+        self.generation = 0
+        self.last = None
+        self.lines = []
+        self.log_bytes = 0
+        self.handle = None
+        self.compacting = None
+        self.written = None
+
+    def load(self):
+        """Return the saved run state with its log replayed, or None.
+
+        Data from an older save format is returned as it is, without a log.
+        """
+        try:
+            base = read_run_file(self.base_path, world_template(self.data_dir, self.world_cache))
+        except (OSError, ValueError, struct.error, zlib.error):
+            return None
+        if base.get("version") != RUN_STATE_VERSION:
+            return base
+        generation = base.pop("generation", 0)
+        lines = []
+        torn = False
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        torn = True
+                        break
+                    if not line.endswith("\n"):
+                        # Whole but unterminated: rewrite the log so the next record starts a new line.
+                        torn = True
+                        line += "\n"
+                    if entry["gen"] >= generation:
+                        apply_state_changes(base, entry["ops"])
+                        generation = entry["gen"]
+                        lines.append(line)
+        except OSError:
+            pass
+        self.last = base
+        self.generation = generation
+        self.lines = lines
+        self.log_bytes = sum(map(len, lines))
+        if torn:
+            self._rewrite_log()
+        return copy.deepcopy(base)
+
+    def record(self, state):
+        """Save state (from save_state), logging only what changed since last time."""
+        self._finish_compaction()
+        if self.last is None:
+            self.clear()
+            self.last = json.loads(json.dumps(state))
+            self._compact()
+            return
+        ops = state_changes(self.last, state)
+        if not ops:
+            return
+        line = json.dumps({"gen": self.generation, "ops": ops}, separators=(",", ":")) + "\n"
+        apply_state_changes(self.last, json.loads(line)["ops"])
+        self.lines.append(line)
+        self.log_bytes += len(line)
+        try:
+            if self.handle is None:
+                self.handle = open(self.journal_path, "a", encoding="utf-8")
+            self.handle.write(line)
+            self.handle.flush()
+        except OSError:
+            pass
+        if self.log_bytes > self.compact_bytes and self.compacting is None:
+            self._compact()
+
+    def clear(self):
+        """Delete the save and its log."""
+        self.close()
+        for path in (self.base_path, self.journal_path):
+            try:
+                path.unlink(missing_ok=True)
+            except OSError:
+                pass
+        self.generation = 0
+        self.last = None
+        self.lines = []
+        self.log_bytes = 0
+
+    def close(self):
+        """Wait for a running compaction, then sync and close the log."""
+        if self.compacting is not None:
+            self.compacting.join()
+        self._finish_compaction()
+        if self.handle is not None:
+            try:
+                os.fsync(self.handle.fileno())
+            except OSError:
+                pass
+            self.handle.close()
+            self.handle = None
+
+    def _compact(self):
+        self.generation += 1
+        data = pack_state(dict(self.last, generation=self.generation), world_template(self.data_dir, self.world_cache))
+        self.lines = []
+        self.log_bytes = 0
+        self.compacting = threading.Thread(target=self._write_base, args=(data, self.generation), daemon=True)
+        self.compacting.start()
+
+    def _write_base(self, data, generation):
+        temp_path = self.base_path.with_name(self.base_path.name + ".tmp")
+        try:
+            with open(temp_path, "wb") as handle:
+                handle.write(data)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(temp_path, self.base_path)
+        except OSError:
+            return
+        self.written = generation
+
+    def _finish_compaction(self):
+        # Once the new base is on disk, the log only needs the lines written after it.
+        if self.compacting is None or self.compacting.is_alive():
+            return
+        self.compacting = None
+        if self.written is not None:
+            self._rewrite_log()
+        self.written = None
+
+    def _rewrite_log(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+        temp_path = self.journal_path.with_name(self.journal_path.name + ".tmp")
+        try:
+            with open(temp_path, "w", encoding="utf-8") as handle:
+                handle.writelines(self.lines)
+            os.replace(temp_path, self.journal_path)
+        except OSError:
+            pass
+
+
+class SaveWriter:
+    """Writes run states to a SaveJournal on its own thread.
+
+    submit() hands over a state from save_state and returns at once. While
+    the writer is busy, newer states replace older waiting ones, so a burst
+    of commands costs one write of the latest state. A failed write is
+    logged and kept in error, and the writer carries on with the next one.
+    """
+
+    def __init__(self, journal):
+        self.journal = journal
+        self.pending = None
+        self.reset = False
+        self.busy = False
+        self.closed = False
+        self.stopped = False
+        self.error = None
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, state):
+        with self.condition:
+            self.pending = state
+            self.condition.notify_all()
+
+    def clear(self):
+        """Delete the save, dropping any state still waiting to be written."""
+        with self.condition:
+            self.pending = None
+            self.reset = True
+            self.condition.notify_all()
+
+    def flush(self):
+        """Block until everything submitted so far is written."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.stopped or not (self.busy or self.reset or self.pending is not None))
+
+    def close(self):
+        """Write what is waiting, stop the thread and sync the journal to disk."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.journal.close()
+
+    def _run(self):
+        try:
+            while True:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.closed or self.reset or self.pending is not None)
+                    if not (self.reset or self.pending is not None):
+                        return
+                    reset, state = self.reset, self.pending
+                    self.reset, self.pending = False, None
+                    self.busy = True
+                try:
+                    if reset:
+                        self.journal.clear()
+                    if state is not None:
+                        self.journal.record(state)
+                except Exception as exc:
+                    self.error = exc
+                    log.exception("Could not write the run save")
+                finally:
+                    with self.condition:
+                        self.busy = False
+                        self.condition.notify_all()
+        finally:
+            # Never leave flush() waiting on a thread that is gone.
+            with self.condition:
+                self.stopped = True
+                self.condition.notify_all()
+
+
+RUN_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS saves (
+    player TEXT NOT NULL,
+    slot TEXT NOT NULL,
+    player_class TEXT NOT NULL,
+    mutator TEXT NOT NULL,
+    turns INTEGER NOT NULL,
+    xp INTEGER NOT NULL,
+    ending TEXT,
+    updated REAL NOT NULL,
+    state BLOB NOT NULL,
+    PRIMARY KEY (player, slot)
+);
+CREATE INDEX IF NOT EXISTS saves_by_updated ON saves (player, updated);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    seed INTEGER,
+    player_class TEXT NOT NULL,
+    mutator TEXT NOT NULL,
+    ending TEXT NOT NULL,
+    turns INTEGER NOT NULL,
+    xp INTEGER NOT NULL,
+    quests INTEGER NOT NULL,
+    death_cause TEXT,
+    finished REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_player ON runs (player, finished);
+CREATE INDEX IF NOT EXISTS runs_by_xp ON runs (xp);
+CREATE INDEX IF NOT EXISTS runs_by_class ON runs (player_class, xp);
+CREATE INDEX IF NOT EXISTS runs_by_mutator ON runs (mutator, xp);
+CREATE INDEX IF NOT EXISTS runs_by_ending ON runs (ending, turns);
+CREATE TABLE IF NOT EXISTS meta (
+    player TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta_increments (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS meta_increments_by_player ON meta_increments (player, id);
+"""
+SAVE_COLUMNS = ("slot", "player_class", "mutator", "turns", "xp", "ending", "updated")
+RUN_COLUMNS = ("player", "seed", "player_class", "mutator", "ending", "turns", "xp", "quests", "death_cause", "finished")
+
+
+class RunStore:
+    """Save slots, meta progression and finished-run history in one SQLite file.
+
+    Each player keeps any number of named slots holding pack_state data. The
+    fields people search by (class, mutator, turns, XP, ending) are indexed
+    columns, so listing saves or ranking runs never decodes a save. The file
+    runs in WAL mode, so readers in other processes don't block the writer.
+    Every write is a transaction of its own unless made inside batch().
+    Meta progression is posted as increments (see fold_meta) and folded in
+    by merge_meta, so concurrent runs never overwrite each other's progress.
+    """
+
+    def __init__(self, path, data_dir=DATA_DIR, world_cache=None):
+        self.path = path
+        self.data_dir = data_dir
+        self.world_cache = world_cache
+        self.lock = threading.RLock()
+        self.depth = 0
+        self.meta_views = {}
+        self.db = sqlite3.connect(str(path), timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(RUN_STORE_SCHEMA)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Group the writes made inside the block into one transaction."""
+        with self.lock:
+            if self.depth == 0:
+                self.db.execute("BEGIN IMMEDIATE")
+            self.depth += 1
+            try:
+                yield self
+            except BaseException:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.db.execute("ROLLBACK")
+                raise
+            self.depth -= 1
+            if self.depth == 0:
+                self.db.execute("COMMIT")
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def save(self, name, slot, player):
+        self.put_state(name, slot, save_state(player))
+
+    def put_state(self, name, slot, state):
+        fields = state["player"]
+        data = pack_state(state, world_template(self.data_dir, self.world_cache))
+        with self.batch():
+            self.db.execute(
+                "INSERT OR REPLACE INTO saves VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    name,
+                    slot,
+                    fields["player_class"],
+                    fields["mutator"]["name"],
+                    fields["turn_count"],
+                    fields["xp"],
+                    fields["ending"],
+                    time.time(),
+                    data,
+                ),
+            )
+
+    def load(self, name, slot):
+        """Return the run state saved in slot (for load_state), or None."""
+        with self.lock:
+            row = self.db.execute("SELECT state FROM saves WHERE player = ? AND slot = ?", (name, slot)).fetchone()
+        return unpack_state(row[0], world_template(self.data_dir, self.world_cache)) if row else None
+
+    def delete(self, name, slot):
+        with self.batch():
+            self.db.execute("DELETE FROM saves WHERE player = ? AND slot = ?", (name, slot))
+
+    def list_saves(self, name):
+        """Each of name's slots with its indexed fields, most recently saved first."""
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT {', '.join(SAVE_COLUMNS)} FROM saves WHERE player = ? ORDER BY updated DESC", (name,)
+            ).fetchall()
+        return [dict(zip(SAVE_COLUMNS, row)) for row in rows]
+
+    def record_runs(self, name, summaries):
+        """Add run_summary results to name's history in one transaction."""
+        now = time.time()
+        rows = [
+            (
+                name,
+                s["seed"],
+                s["class"],
+                s["mutator"],
+                s["ending"],
+                s["turns"],
+                s["xp"],
+                s["quests"],
+                s["death_cause"],
+                now,
+            )
+            for s in summaries
+        ]
+        with self.batch():
+            self.db.executemany(f"INSERT INTO runs ({', '.join(RUN_COLUMNS)}) VALUES ({', '.join('?' * len(RUN_COLUMNS))})", rows)
+
+    def record_run(self, name, summary):
+        self.record_runs(name, [summary])
+
+    def runs(self, name=None, player_class=None, mutator=None, ending=None, order="finished", limit=20):
+        """Finished runs matching the filters, best first when order is "xp", newest first otherwise."""
+        filters = {"player": name, "player_class": player_class, "mutator": mutator, "ending": ending}
+        where = [f"{column} = ?" for column, value in filters.items() if value is not None]
+        params = [value for value in filters.values() if value is not None]
+        sort = "xp DESC, turns ASC" if order == "xp" else "finished DESC, id DESC"
+        query = f"SELECT {', '.join(RUN_COLUMNS)} FROM runs"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        with self.lock:
+            rows = self.db.execute(f"{query} ORDER BY {sort} LIMIT ?", (*params, limit)).fetchall()
+        return [dict(zip(RUN_COLUMNS, row)) for row in rows]
+
+    def leaderboard(self, player_class=None, mutator=None, limit=10):
+        return self.runs(player_class=player_class, mutator=mutator, order="xp", limit=limit)
+
+    def get_meta(self, name):
+        """name's meta progression with posted increments folded in, cached until the file changes."""
+        with self.lock:
+            # data_version moves when another connection commits, total_changes when this one does.
+            version = (self.db.execute("PRAGMA data_version").fetchone()[0], self.db.total_changes)
+            cached = self.meta_views.get(name)
+            if cached is not None and cached[0] == version:
+                return copy.deepcopy(cached[1])
+            meta = default_meta()
+            row = self.db.execute("SELECT data FROM meta WHERE player = ?", (name,)).fetchone()
+            if row:
+                meta.update(json.loads(row[0]))
+            for (data,) in self.db.execute("SELECT data FROM meta_increments WHERE player = ? ORDER BY id", (name,)):
+                fold_meta(meta, json.loads(data))
+            self.meta_views[name] = (version, meta)
+        return copy.deepcopy(meta)
+
+    def put_meta(self, name, meta):
+        with self.batch():
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (name, json.dumps(meta)))
+
+    def post_meta(self, name, increments):
+        """Add meta increments for name without rewriting its progression."""
+        with self.batch():
+            self.db.executemany(
+                "INSERT INTO meta_increments (player, data) VALUES (?, ?)",
+                [(name, json.dumps(increment)) for increment in increments],
+            )
+
+    def merge_meta(self):
+        """Fold every posted increment into its player's progression in one transaction."""
+        with self.batch():
+            names = [row[0] for row in self.db.execute("SELECT DISTINCT player FROM meta_increments")]
+            for name in names:
+                self.put_meta(name, self.get_meta(name))
+            self.db.execute("DELETE FROM meta_increments")
+
+
+def run_summary(player):
+    return {
+        "seed": player.seed,
+        "class": player.player_class,
+        "mutator": player.mutator["name"],
+        "ending": player.ending or "Timeout",
+        "turns": player.turn_count,
+        "xp": player.xp,
+        "quests": sum(1 for q in player.quests if q["completed"]),
+        "death_cause": player.death_cause,
+    }
+
+
+def run_headless(policy=random_policy, seed=None, player_class="adventurer", mutator=None, max_steps=1000, data_dir=DATA_DIR):
+    """Play one complete run with no UI and return its summary.
+
+    policy(player) returns the next command text. If the policy has an
+    answer(prompt) attribute it also answers confirmations; otherwise
+    default_prompt_answer does. Runs that reach max_steps policy decisions
+    end as "Timeout".
+    """
+    player = new_run(
+        seed,
+        player_class,
+        mutator,
+        data_dir=data_dir,
+        input_func=getattr(policy, "answer", default_prompt_answer),
+        output_func=None,
+        show_ascii_minimap=False,
+        interface_mode="ui",
+    )
+    player.begin_session()
+
+    steps = 0
+    while not player.game_over and steps < max_steps:
+        player.run_command(policy(player))
+        steps += 1
+
+    summary = run_summary(player)
+    if hasattr(policy, "nodes_per_second"):
+        summary["nodes_per_second"] = policy.nodes_per_second
+    return summary
+
+
+def _run_headless_job(job):
+    seed, options = job
+    return run_headless(seed=seed, **options)
+
+
+def simulate_runs(count, seed=0, workers=None, **options):
+    """Run count headless games with seeds seed..seed+count-1.
+
+    workers=1 plays them in this process; otherwise they are spread over a
+    process pool (one worker per core by default). options are passed to
+    run_headless, so a custom policy must be picklable (a module-level function).
+    """
+    jobs = [(seed + i, options) for i in range(count)]
+    if workers == 1:
+        return [_run_headless_job(job) for job in jobs]
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run_headless_job, jobs, chunksize=max(1, count // (workers * 4))))
+
+
+def summarize_runs(summaries):
+    """Aggregate run summaries into ending and death-cause counts plus averages."""
+    runs = len(summaries)
+    summary = {
+        "runs": runs,
+        "endings": dict(Counter(s["ending"] for s in summaries)),
+        "deaths_by_cause": dict(Counter(s["death_cause"] for s in summaries if s["ending"] == "Death")),
+        "avg_turns": sum(s["turns"] for s in summaries) / runs if runs else 0,
+        "avg_xp": sum(s["xp"] for s in summaries) / runs if runs else 0,
+        "avg_quests": sum(s["quests"] for s in summaries) / runs if runs else 0,
+    }
+    rates = [s["nodes_per_second"] for s in summaries if "nodes_per_second" in s]
+    if rates:
+        summary["avg_nodes_per_second"] = sum(rates) / len(rates)
+    return summary
+
+
+def benchmark_saves(runs=20, turns=100, seed=0, data_dir=DATA_DIR):
+    """Compare the JSON and packed formats on run states from random play.
+
+    Each run is played for up to turns commands and saved with save_state.
+    Returns average bytes and milliseconds to encode and decode per format,
+    timed as the best of five passes.
+    """
+    template = world_template(data_dir)
+    states = []
+    for i in range(runs):
+        player = new_run(
+            seed + i, data_dir=data_dir, record=True, input_func=default_prompt_answer, output_func=None, interface_mode="ui"
+        )
+        player.begin_session()
+        for _ in range(turns):
+            if player.game_over:
+                break
+            player.run_command(random_policy(player))
+        states.append(save_state(player))
+
+    formats = {
+        "json": (lambda state: json.dumps(state).encode("utf-8"), json.loads),
+        "binary": (lambda state: pack_state(state, template), lambda data: unpack_state(data, template)),
+    }
+    report = {"runs": runs, "turns": turns}
+    for name, (encode, decode) in formats.items():
+        saved = loaded = float("inf")
+        for _ in range(5):
+            start = time.perf_counter()
+            blobs = [encode(state) for state in states]
+            saved = min(saved, time.perf_counter() - start)
+            start = time.perf_counter()
+            for blob in blobs:
+                decode(blob)
+            loaded = min(loaded, time.perf_counter() - start)
+        report[name] = {
+            "bytes": sum(map(len, blobs)) / runs,
+            "save_ms": saved * 1000 / runs,
+            "load_ms": loaded * 1000 / runs,
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dungeons of Dork core. Run src/DunDork.py to launch the UI version.")
+    parser.add_argument("--simulate", type=int, metavar="RUNS", help="play RUNS headless games and print a summary")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--player-class", default="adventurer", choices=CLASSES)
+    parser.add_argument("--mutator", default=None, choices=[m["name"] for m in MUTATORS])
+    parser.add_argument("--policy", default="random", choices=["random", "search"])
+    parser.add_argument("--nodes", type=int, default=400, help="search positions per decision")
+    parser.add_argument("--time-budget", type=float, default=None, help="search seconds per decision")
+    parser.add_argument("--replay", metavar="FILE", help="fast-forward a recorded replay and print where it ends")
+    parser.add_argument("--stop-turn", type=int, default=None)
+    parser.add_argument("--store", metavar="FILE", help="add simulated runs to this SQLite run history (--simulate)")
+    parser.add_argument("--meta", metavar="FILE", help="post simulated wins to this meta progression file (--simulate)")
+    parser.add_argument("--bench-saves", type=int, metavar="RUNS", help="compare JSON and packed save size and speed")
+    parser.add_argument("--turns", type=int, default=100, help="commands played per run before saving (--bench-saves)")
+    args = parser.parse_args(argv)
+    if args.bench_saves:
+        print(json.dumps(benchmark_saves(args.bench_saves, args.turns, seed=args.seed), indent=2))
+        return
+    if args.replay:
+        player = replay_run(Replay.load(args.replay), stop_turn=args.stop_turn)
+        summary = run_summary(player)
+        summary["ending"] = player.ending or "In progress"
+        print(json.dumps(summary, indent=2))
+        return
+    if not args.simulate:
+        print("Run src/DunDork.py to launch the UI version.")
+        return
+    summaries = simulate_runs(
+        args.simulate,
+        seed=args.seed,
+        workers=args.workers,
+        player_class=args.player_class,
+        mutator=args.mutator,
+        policy=SearchPolicy(args.nodes, args.time_budget) if args.policy == "search" else random_policy,
+    )
+    increments = [increment for increment in map(summary_increment, summaries) if increment is not None]
+    if args.store:
+        store = RunStore(args.store)
+        with store.batch():
+            store.record_runs("simulation", summaries)
+            store.post_meta("simulation", increments)
+        store.close()
+    if args.meta:
+        post_meta(args.meta, increments)
+    print(json.dumps(summarize_runs(summaries), indent=2))
 
 
 if __name__ == "__main__":
-    print("Run src/DunDork.py to launch the UI version.")
+    main()
@@ -0,0 +1,303 @@
+"""Load generator and latency benchmark for the Dungeons of Dork session server.
+
+Starts simulated clients that each open a session and play it over the
+JSON-lines protocol, either from a command script or by picking random
+legal commands. Reports throughput, latency percentiles per command verb and
+the server's RSS and CPU use over time, so hosts can be sized by concurrent
+sessions per core.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import random
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+def _load_sibling(name):
+    try:
+        return importlib.import_module(name)
+    except ModuleNotFoundError:
+        module_path = Path(__file__).resolve().with_name(f"{name}.py")
+        spec = importlib.util.spec_from_file_location(name, module_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+
+core = _load_sibling("DunDorkCore")
+server = _load_sibling("DunDorkServer")
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * fraction // 1))
+    return ordered[int(rank) - 1]
+
+
+def command_verb(text, answering=False):
+    if answering:
+        return "ANSWER"
+    verb, _ = core.Player.parse_command(text)
+    return verb or "UNKNOWN"
+
+
+class LoadStats:
+    """Latency samples per verb plus server samples taken while the load runs.
+
+    Clients also count the sessions they hold open, so the peak is known even
+    when a short load starts and ends between two server samples.
+    """
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = 0
+        self.server = []
+        self.open_sessions = 0
+        self.peak_sessions = 0
+
+    def session_opened(self):
+        self.open_sessions += 1
+        self.peak_sessions = max(self.peak_sessions, self.open_sessions)
+
+    def session_closed(self):
+        self.open_sessions -= 1
+
+    def record(self, verb, seconds):
+        self.latencies.setdefault(verb, []).append(seconds)
+
+    def report(self, elapsed, clients, concurrency):
+        commands = sum(len(v) for verb, v in self.latencies.items() if verb != "NEW")
+        verbs = {}
+        for verb, samples in sorted(self.latencies.items()):
+            ordered = sorted(samples)
+            verbs[verb] = {
+                "count": len(ordered),
+                "p50_ms": percentile(ordered, 0.50) * 1000,
+                "p95_ms": percentile(ordered, 0.95) * 1000,
+                "p99_ms": percentile(ordered, 0.99) * 1000,
+            }
+        report = {
+            "clients": clients,
+            "concurrency": concurrency,
+            "seconds": elapsed,
+            "commands": commands,
+            "commands_per_second": commands / elapsed if elapsed else 0.0,
+            "errors": self.errors,
+            "verbs": verbs,
+            "server": self.server,
+        }
+        if len(self.server) >= 2:
+            first, last = self.server[0], self.server[-1]
+            wall = last["t"] - first["t"]
+            cpu = last["cpu_seconds"] - first["cpu_seconds"]
+            peak = max(self.peak_sessions, *(sample["sessions"] for sample in self.server))
+            report["server_cpu_utilization"] = cpu / wall if wall else 0.0
+            report["peak_sessions"] = peak
+            if cpu > 0 and peak:
+                report["sessions_per_core"] = peak * wall / cpu
+        return report
+
+
+async def play_client(index, stats, commands, think_time, script, seed, address):
+    rng = random.Random(seed + index)
+    client = await server.GameClient.connect(**address)
+    try:
+        start = time.perf_counter()
+        reply = await client.request(op="new", seed=seed + index, legal=True)
+        stats.record("NEW", time.perf_counter() - start)
+        if not reply.get("ok"):
+            stats.errors += 1
+            return
+        session = reply["session"]
+        stats.session_opened()
+        try:
+            legal = reply.get("legal") or ["look"]
+            question = None
+            for step in range(commands):
+                if think_time:
+                    await asyncio.sleep(think_time * rng.uniform(0.5, 1.5))
+                if question:
+                    text = "y"
+                elif script:
+                    text = script[step % len(script)]
+                else:
+                    text = rng.choice(legal)
+                start = time.perf_counter()
+                reply = await client.request(op="command", session=session, text=text, legal=not script)
+                stats.record(command_verb(text, answering=bool(question)), time.perf_counter() - start)
+                if not reply.get("ok"):
+                    stats.errors += 1
+                    break
+                question = reply.get("question")
+                legal = reply.get("legal") or ["look"]
+                if reply["delta"].get("game_over"):
+                    break
+            await client.request(op="close", session=session)
+        finally:
+            stats.session_closed()
+    finally:
+        await client.close()
+
+
+async def sample_server(stats, address, interval, done):
+    client = await server.GameClient.connect(**address)
+    start = time.perf_counter()
+    try:
+        while True:
+            reply = await client.request(op="stats")
+            stats.server.append(
+                {
+                    "t": time.perf_counter() - start,
+                    "sessions": reply["sessions"],
+                    "rss_kb": reply["rss_kb"],
+                    "cpu_seconds": reply["cpu_seconds"],
+                }
+            )
+            if done.is_set():
+                return
+            try:
+                await asyncio.wait_for(done.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await client.close()
+
+
+async def run_load(
+    clients=10,
+    concurrency=None,
+    commands=50,
+    think_time=0.0,
+    script=None,
+    seed=0,
+    host="127.0.0.1",
+    port=8765,
+    path=None,
+    sample_interval=0.5,
+):
+    """Play clients sessions against a running server and return the report.
+
+    At most concurrency clients (default: all of them) play at once. Each
+    plays commands commands, waiting about think_time seconds before each.
+    """
+    address = {"host": host, "port": port, "path": path}
+    concurrency = concurrency or clients
+    stats = LoadStats()
+    done = asyncio.Event()
+    sampler = asyncio.create_task(sample_server(stats, address, sample_interval, done))
+    gate = asyncio.Semaphore(concurrency)
+
+    async def gated(index):
+        async with gate:
+            try:
+                await play_client(index, stats, commands, think_time, script, seed, address)
+            except (ConnectionError, OSError):
+                stats.errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(gated(i) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await sampler
+    return stats.report(elapsed, clients, concurrency)
+
+
+def spawn_server(extra_args=()):
+    """Start DunDorkServer.py on a free port in a child process; return (process, port)."""
+    script = Path(__file__).resolve().with_name("DunDorkServer.py")
+    process = subprocess.Popen(
+        [sys.executable, str(script), "--port", "0", *extra_args],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = process.stdout.readline()
+    match = re.search(r":(\d+)\s*$", line)
+    if not match:
+        process.terminate()
+        raise Exception(f"Server did not start: {line.strip()!r}")
+    return process, int(match.group(1))
+
+
+def format_report(report):
+    lines = [
+        f"{report['clients']} clients, concurrency {report['concurrency']}: "
+        f"{report['commands']} commands in {report['seconds']:.2f}s "
+        f"({report['commands_per_second']:.0f}/s), {report['errors']} errors",
+        f"{'verb':<12}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+    ]
+    for verb, row in report["verbs"].items():
+        lines.append(f"{verb:<12}{row['count']:>8}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}")
+    if report["server"]:
+        rss = [s["rss_kb"] for s in report["server"] if s["rss_kb"] is not None]
+        if rss:
+            lines.append(f"server RSS: start {rss[0] / 1024:.1f} MiB, peak {max(rss) / 1024:.1f} MiB")
+    if "sessions_per_core" in report:
+        lines.append(
+            f"server CPU {report['server_cpu_utilization']:.0%} at {report['peak_sessions']} sessions "
+            f"(~{report['sessions_per_core']:.0f} sessions per core)"
+        )
+    elif "server_cpu_utilization" in report:
+        lines.append(f"server CPU {report['server_cpu_utilization']:.0%}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Dungeons of Dork session server.")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=None, help="clients playing at once (default: all)")
+    parser.add_argument("--commands", type=int, default=100, help="commands per client")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds between a client's commands")
+    parser.add_argument("--script", metavar="FILE", help="play these commands (one per line) instead of random legal ones")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH")
+    parser.add_argument("--spawn", action="store_true", help="start a local server process for the run")
+    parser.add_argument("--sample-interval", type=float, default=0.5)
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    script = None
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as handle:
+            script = [line.strip() for line in handle if line.strip()]
+
+    process = None
+    host, port, path = args.host, args.port, args.unix
+    if args.spawn:
+        process, port = spawn_server(["--max-sessions", str(max(args.clients, 1))])
+        host, path = "127.0.0.1", None
+    try:
+        report = asyncio.run(
+            run_load(
+                clients=args.clients,
+                concurrency=args.concurrency,
+                commands=args.commands,
+                think_time=args.think_time,
+                script=script,
+                seed=args.seed,
+                host=host,
+                port=port,
+                path=path,
+                sample_interval=args.sample_interval,
+            )
+        )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
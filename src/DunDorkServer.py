@@ -0,0 +1,515 @@
+"""Asyncio server hosting many Dungeons of Dork sessions over JSON lines.
+
+Every request is one JSON object on one line, and so is every reply:
+
+    {"op": "new", "seed": 7, "player_class": "scout"}   -> session, events, state
+    {"op": "command", "session": "...", "text": "n"}     -> events, delta, question
+    {"op": "state", "session": "..."}                    -> state
+    {"op": "close", "session": "..."}
+    {"op": "stats"}                                      -> sessions, resident, rss_kb, cpu_seconds
+
+With a run store (a core.RunStore SQLite file), new and load take a
+"player" name and finished runs are added to that player's history:
+
+    {"op": "save", "session": "...", "slot": "a"}
+    {"op": "load", "player": "ann", "slot": "a"}         -> session, events, state
+    {"op": "saves", "player": "ann"}                     -> saves
+    {"op": "leaderboard", "player_class": "scout"}       -> runs
+    {"op": "meta", "player": "ann"}                      -> meta (wins, unlocks, ...)
+
+Replies echo the request's "id" when one is given, and new/command replies
+list the legal commands when the request sets "legal": true. Failed requests get
+"ok": false and an "error" message. Sessions belong to the server, not the
+connection, so a client may reconnect and carry on with its session id.
+Questions such as drop confirmations never block: the reply carries the
+question and the next command text answers it.
+
+With a hibernation directory, sessions idle for longer than idle_seconds, or
+the least recently used ones beyond max_resident, are written there with
+core.save_state and dropped from memory. Their next request loads them back,
+so clients never notice. Hibernated sessions also survive a server restart.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import secrets
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+try:
+    import DunDorkCore as core
+except ModuleNotFoundError:
+    module_path = Path(__file__).resolve().with_name("DunDorkCore.py")
+    spec = importlib.util.spec_from_file_location("DunDorkCore", module_path)
+    core = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(core)
+
+
+log = logging.getLogger("DunDorkServer")
+
+
+class UnknownSession(LookupError):
+    pass
+
+
+def event_to_json(event):
+    return {"kind": event.kind, "text": event.text, "color": event.color, "fields": event.fields}
+
+
+def session_state(player):
+    """The client-visible state of a run; replies send what changed in it."""
+    npc = player.pending_encounter
+    question = player.pending_question
+    return {
+        "room": player.current_loc,
+        "hp": player.health,
+        "max_hp": player.max_health,
+        "xp": player.xp,
+        "turn": player.turn_count,
+        "backpack": list(player.backpack),
+        "combat": npc.Name if npc is not None else None,
+        "question": question["text"] if question is not None else None,
+        "game_over": player.game_over,
+        "ending": player.ending,
+    }
+
+
+PLAYER_OPTIONS = {"input_func": None, "output_func": None, "show_ascii_minimap": False, "interface_mode": "ui"}
+
+
+class Session:
+    """One hosted run: a prompt-free Player whose events are collected per request."""
+
+    def __init__(self, session_id, player, state=None, player_name="guest"):
+        self.id = session_id
+        self.player = player
+        self.player_name = player_name
+        self.events = []
+        self.state = state
+        self.last_active = time.monotonic()
+        player.sinks.append(self.events.append)
+
+    def run(self, text):
+        self.last_active = time.monotonic()
+        self.player.run_command(text)
+        return self.flush()
+
+    def flush(self):
+        """Return (events, delta) since the previous flush; the first delta is the whole state."""
+        events = [event_to_json(e) for e in self.events]
+        self.events.clear()
+        state = session_state(self.player)
+        if self.state is None:
+            delta = state
+        else:
+            delta = {key: value for key, value in state.items() if self.state[key] != value}
+        self.state = state
+        return events, delta
+
+    def to_state(self):
+        """The run as core.save_state data, with the last reported state alongside."""
+        return dict(core.save_state(self.player), session=self.state, player_name=self.player_name)
+
+    @classmethod
+    def from_state(cls, session_id, state, data_dir=core.DATA_DIR, world_cache=None):
+        reported = state.pop("session")
+        player_name = state.pop("player_name", "guest")
+        player = core.load_state(state, data_dir, world_cache, **PLAYER_OPTIONS)
+        return cls(session_id, player, reported, player_name)
+
+
+def process_rss_kb():
+    """Resident set size of this process in KiB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class GameServer:
+    """Holds every session and answers requests from any connection."""
+
+    def __init__(
+        self,
+        data_dir=core.DATA_DIR,
+        max_sessions=10000,
+        record=False,
+        world_cache=None,
+        hibernate_dir=None,
+        idle_seconds=None,
+        max_resident=None,
+        store=None,
+    ):
+        self.data_dir = data_dir
+        self.max_sessions = max_sessions
+        self.record = record
+        self.world_cache = world_cache
+        self.hibernate_dir = Path(hibernate_dir) if hibernate_dir else None
+        self.idle_seconds = idle_seconds
+        self.max_resident = max_resident
+        self.store = core.RunStore(store, data_dir, world_cache) if store else None
+        # Resident sessions, least recently used first; hibernated ones are only ids on disk.
+        self.sessions = OrderedDict()
+        self.hibernated = set()
+        # Sessions being written out, and thaws in flight that later requests can wait on.
+        self.freezing = set()
+        self.thawing = {}
+        self.sweeper = None
+        if self.hibernate_dir is not None:
+            self.hibernate_dir.mkdir(parents=True, exist_ok=True)
+            self.hibernated = {path.stem for path in self.hibernate_dir.glob("*.run")}
+
+    @property
+    def session_count(self):
+        return len(self.sessions) + len(self.hibernated)
+
+    async def start(self, host="127.0.0.1", port=8765, path=None):
+        """Listen on a Unix socket at path, or on host:port, and return the asyncio server."""
+        if self.hibernate_dir is not None and self.idle_seconds:
+            self.sweeper = asyncio.create_task(self.sweep_idle())
+        if path:
+            return await asyncio.start_unix_server(self.handle_client, path=path)
+        return await asyncio.start_server(self.handle_client, host, port)
+
+    async def sweep_idle(self):
+        while True:
+            await asyncio.sleep(min(self.idle_seconds, 30))
+            try:
+                await self.hibernate_idle()
+            except Exception:
+                log.exception("Idle session sweep failed")
+
+    def session_path(self, session_id):
+        return self.hibernate_dir / f"{session_id}.run"
+
+    def write_session(self, path, state):
+        data = core.pack_state(state, core.world_template(self.data_dir, self.world_cache))
+        temp_path = path.with_suffix(".tmp")
+        with open(temp_path, "wb") as handle:
+            handle.write(data)
+        os.replace(temp_path, path)
+
+    def read_session(self, session_id):
+        path = self.session_path(session_id)
+        state = core.read_run_file(path, core.world_template(self.data_dir, self.world_cache))
+        session = Session.from_state(session_id, state, self.data_dir, self.world_cache)
+        path.unlink()
+        return session
+
+    async def hibernate(self, session):
+        """Write session to disk and drop it from memory; return whether it was dropped.
+
+        Packing and writing run off the event loop. A session used or closed
+        while it was being written stays as it is and the stale file is removed.
+        """
+        if session.id in self.freezing:
+            return False
+        self.freezing.add(session.id)
+        path = self.session_path(session.id)
+        try:
+            last_active = session.last_active
+            await asyncio.to_thread(self.write_session, path, session.to_state())
+        finally:
+            self.freezing.discard(session.id)
+        if self.sessions.get(session.id) is not session or session.last_active != last_active:
+            await asyncio.to_thread(path.unlink, missing_ok=True)
+            return False
+        del self.sessions[session.id]
+        self.hibernated.add(session.id)
+        return True
+
+    async def hibernate_many(self, sessions):
+        """Hibernate each of sessions, logging (not raising) failures; return how many went."""
+        count = 0
+        for session in sessions:
+            try:
+                count += await self.hibernate(session)
+            except Exception:
+                log.exception("Could not hibernate session %s", session.id)
+        return count
+
+    async def hibernate_idle(self, now=None):
+        """Hibernate every session idle for idle_seconds or more; return how many."""
+        if self.hibernate_dir is None or not self.idle_seconds:
+            return 0
+        cutoff = (time.monotonic() if now is None else now) - self.idle_seconds
+        return await self.hibernate_many([s for s in self.sessions.values() if s.last_active <= cutoff])
+
+    async def enforce_resident_limit(self, keep=None):
+        if self.hibernate_dir is None or self.max_resident is None:
+            return
+        excess = len(self.sessions) - len(self.freezing) - self.max_resident
+        if excess > 0:
+            oldest = [s for s in self.sessions.values() if s is not keep and s.id not in self.freezing]
+            await self.hibernate_many(oldest[:excess])
+
+    async def thaw(self, session_id):
+        """Load a hibernated session back; concurrent requests for it share one load."""
+        pending = self.thawing.get(session_id)
+        if pending is None:
+            pending = self.thawing[session_id] = asyncio.ensure_future(asyncio.to_thread(self.read_session, session_id))
+        try:
+            session = await asyncio.shield(pending)
+        finally:
+            if self.thawing.get(session_id) is pending and pending.done():
+                del self.thawing[session_id]
+        if session_id in self.hibernated:
+            self.hibernated.discard(session_id)
+            self.sessions[session.id] = session
+        elif session_id not in self.sessions:
+            raise UnknownSession(f"Unknown session: {session_id!r}")
+        return self.sessions[session_id]
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("expected a JSON object")
+                except ValueError as exc:
+                    reply = {"ok": False, "error": f"Bad request: {exc}"}
+                else:
+                    reply = await self.handle_request(request)
+                writer.write(json.dumps(reply, default=str).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, request):
+        op = request.get("op")
+        handler = getattr(self, f"op_{op}", None) if isinstance(op, str) else None
+        if handler is None:
+            reply = {"ok": False, "error": f"Unknown op: {op!r}"}
+        else:
+            try:
+                reply = await handler(request)
+            except UnknownSession as exc:
+                reply = {"ok": False, "error": str(exc)}
+            except Exception as exc:
+                reply = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+        if "id" in request:
+            reply["id"] = request["id"]
+        return reply
+
+    async def session(self, request):
+        """The requested session, loaded back from disk if it was hibernated."""
+        session_id = request.get("session")
+        session = self.sessions.get(session_id)
+        if session is None:
+            if session_id not in self.hibernated:
+                raise UnknownSession(f"Unknown session: {session_id!r}")
+            session = await self.thaw(session_id)
+        session.last_active = time.monotonic()
+        self.sessions.move_to_end(session_id)
+        await self.enforce_resident_limit(keep=session)
+        return session
+
+    async def op_new(self, request):
+        if self.session_count >= self.max_sessions:
+            return {"ok": False, "error": "Server is full."}
+        player_class = request.get("player_class", "adventurer")
+        if player_class not in core.CLASSES:
+            return {"ok": False, "error": f"Unknown class: {player_class!r}"}
+        mutator = request.get("mutator")
+        if mutator is not None and mutator not in [m["name"] for m in core.MUTATORS]:
+            return {"ok": False, "error": f"Unknown mutator: {mutator!r}"}
+        # The parsed world is cached, but placing items and NPCs still runs per session; keep it off the event loop.
+        player = await asyncio.to_thread(
+            core.new_run,
+            request.get("seed"),
+            player_class,
+            mutator,
+            data_dir=self.data_dir,
+            record=self.record,
+            world_cache=self.world_cache,
+            **PLAYER_OPTIONS,
+        )
+        return await self.open_session(player, request)
+
+    async def open_session(self, player, request, begin=True):
+        session = Session(secrets.token_hex(8), player, player_name=request.get("player", "guest"))
+        self.sessions[session.id] = session
+        await self.enforce_resident_limit(keep=session)
+        if begin:
+            player.begin_session()
+        events, state = session.flush()
+        reply = {"ok": True, "session": session.id, "seed": player.seed, "events": events, "state": state}
+        if request.get("legal"):
+            reply["legal"] = player.legal_commands()
+        return reply
+
+    def run_store(self):
+        if self.store is None:
+            raise Exception("This server has no run store.")
+        return self.store
+
+    async def op_command(self, request):
+        session = await self.session(request)
+        text = request.get("text")
+        if not isinstance(text, str):
+            return {"ok": False, "error": "Command text is required."}
+        events, delta = session.run(text)
+        if delta.get("game_over") and self.store is not None:
+            summary = core.run_summary(session.player)
+            increment = core.summary_increment(summary)
+            with self.store.batch():
+                self.store.record_run(session.player_name, summary)
+                if increment is not None:
+                    self.store.post_meta(session.player_name, [increment])
+        reply = {
+            "ok": True,
+            "session": session.id,
+            "events": events,
+            "delta": delta,
+            "question": session.state["question"],
+        }
+        if request.get("legal"):
+            reply["legal"] = session.player.legal_commands()
+        return reply
+
+    async def op_state(self, request):
+        session = await self.session(request)
+        return {"ok": True, "session": session.id, "state": session_state(session.player)}
+
+    async def op_close(self, request):
+        session_id = request.get("session")
+        if session_id in self.hibernated:
+            self.session_path(session_id).unlink(missing_ok=True)
+            self.hibernated.discard(session_id)
+            return {"ok": True, "session": session_id}
+        session = await self.session(request)
+        del self.sessions[session.id]
+        return {"ok": True, "session": session.id}
+
+    async def op_save(self, request):
+        session = await self.session(request)
+        slot = request.get("slot")
+        if not isinstance(slot, str) or not slot:
+            return {"ok": False, "error": "A slot name is required."}
+        self.run_store().save(session.player_name, slot, session.player)
+        return {"ok": True, "session": session.id, "slot": slot}
+
+    async def op_load(self, request):
+        if self.session_count >= self.max_sessions:
+            return {"ok": False, "error": "Server is full."}
+        state = self.run_store().load(request.get("player", "guest"), request.get("slot"))
+        if state is None:
+            return {"ok": False, "error": f"No save in slot {request.get('slot')!r}."}
+        # A resumed run carries on from its saved turn, so unlike a new one it is not begun again.
+        player = await asyncio.to_thread(core.load_state, state, self.data_dir, self.world_cache, **PLAYER_OPTIONS)
+        return await self.open_session(player, request, begin=False)
+
+    async def op_saves(self, request):
+        return {"ok": True, "saves": self.run_store().list_saves(request.get("player", "guest"))}
+
+    async def op_leaderboard(self, request):
+        runs = self.run_store().leaderboard(request.get("player_class"), request.get("mutator"), int(request.get("limit", 10)))
+        return {"ok": True, "runs": runs}
+
+    async def op_meta(self, request):
+        return {"ok": True, "meta": self.run_store().get_meta(request.get("player", "guest"))}
+
+    async def op_stats(self, request):
+        times = os.times()
+        return {
+            "ok": True,
+            "sessions": self.session_count,
+            "resident": len(self.sessions),
+            "rss_kb": process_rss_kb(),
+            "cpu_seconds": times.user + times.system,
+        }
+
+
+class GameClient:
+    """Minimal JSON-lines client, used by tests and tools."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765, path=None):
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, **fields):
+        self.writer.write(json.dumps(fields).encode("utf-8") + b"\n")
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Server closed the connection.")
+        return json.loads(line)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def serve(host="127.0.0.1", port=8765, path=None, **options):
+    game = GameServer(**options)
+    server = await game.start(host, port, path)
+    where = path or "{}:{}".format(*server.sockets[0].getsockname()[:2])
+    print(f"Dungeons of Dork server listening on {where}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host Dungeons of Dork sessions over newline-delimited JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--max-sessions", type=int, default=10000)
+    parser.add_argument("--record", action="store_true", help="record a replay for every session")
+    parser.add_argument("--world-cache", metavar="FILE", help="keep the parsed world in this file between server starts")
+    parser.add_argument("--hibernate-dir", metavar="DIR", help="write idle sessions here instead of keeping them in memory")
+    parser.add_argument("--idle-seconds", type=float, default=300.0, help="hibernate sessions idle this long (with --hibernate-dir)")
+    parser.add_argument("--max-resident", type=int, help="keep at most this many sessions in memory (with --hibernate-dir)")
+    parser.add_argument("--store", metavar="FILE", help="SQLite file for save slots and finished-run history")
+    args = parser.parse_args(argv)
+    options = {
+        "max_sessions": args.max_sessions,
+        "record": args.record,
+        "world_cache": args.world_cache,
+        "hibernate_dir": args.hibernate_dir,
+        "idle_seconds": args.idle_seconds,
+        "max_resident": args.max_resident,
+        "store": args.store,
+    }
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, **options))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
 from pathlib import Path
 from types import SimpleNamespace
 import importlib.util
+import json
+import os
+import shutil
+import sys
+import threading
+
+import pytest
 
 
 MODULE_PATH = Path(__file__).resolve().parents[1] / "src" / "DunDorkCore.py"
@@ -205,3 +212,676 @@ def test_quit_works_during_combat(monkeypatch):
     player.handle_encounter_turn()
 
     assert player.game_over is True
+
+
+def test_route_table_matches_direct_path():
+    player = make_player()
+
+    assert player.shortest_path_step(1, 2) == ("S", 1)
+    assert player.shortest_path_step(2, 2) == (None, 0)
+    assert player.shortest_path_step(1, 999) == (None, 999)
+
+
+def test_solve_rune_rebuilds_route_table():
+    player = make_player()
+    player.locs[1].N = 0
+    player.routes.rebuild()
+    player.current_loc = 2
+    player.secret_room = 2
+    player.secret_shortcut_target = 1
+
+    assert player.shortest_path_step(2, 1) == (None, 999)
+    assert player.solve_rune("dork") is True
+    assert player.shortest_path_step(2, 1) == ("E", 1)
+
+
+def test_route_table_repairs_sealed_and_reopened_edges():
+    locs = [
+        SimpleNamespace(ID=1, N=0, S=3, E=2, W=0),
+        SimpleNamespace(ID=2, N=0, S=4, E=0, W=1),
+        SimpleNamespace(ID=3, N=1, S=0, E=4, W=0),
+        SimpleNamespace(ID=4, N=2, S=0, E=0, W=3),
+    ]
+    routes = DunDork.RouteTable(locs)
+    assert routes.step(1, 4) == ("S", 2)
+
+    before = routes.recomputed
+    routes.disable_edge(1, "S")
+    assert routes.step(1, 4) == ("E", 2)
+    assert routes.step(1, 3) == ("E", 3)
+    assert 0 < routes.recomputed - before < 16
+
+    routes.enable_edge(1, "S")
+    assert routes.dist == DunDork.RouteTable(locs).dist
+    assert routes.hops == DunDork.RouteTable(locs).hops
+
+
+def test_timed_block_seals_route_until_it_expires():
+    player = make_player()
+    player.turn_count = 12
+    player.spawn_timed_events()
+
+    assert player.timed_block["dir"] == "S"
+    assert player.shortest_path_step(1, 2) == (None, 999)
+
+    player.timed_block["ttl"] = 1
+    player.apply_end_of_turn_effects()
+    assert player.shortest_path_step(1, 2) == ("S", 1)
+
+
+def test_distance_field_steps_towards_nearest_goal():
+    locs = [
+        SimpleNamespace(ID=1, N=0, S=0, E=2, W=0),
+        SimpleNamespace(ID=2, N=0, S=0, E=3, W=1),
+        SimpleNamespace(ID=3, N=0, S=0, E=4, W=2),
+        SimpleNamespace(ID=4, N=0, S=0, E=0, W=3),
+    ]
+    routes = DunDork.RouteTable(locs)
+    field = routes.field([1, 4])
+
+    assert field.distance(2) == 1 and field.step(2) == "W"
+    assert field.distance(3) == 1 and field.step(3) == "E"
+    assert field.step(1) is None
+    assert routes.field([4, 1]) is field
+
+
+def test_field_cache_evicts_least_recently_used():
+    locs = [SimpleNamespace(ID=i, N=0, S=0, E=i + 1 if i < 20 else 0, W=i - 1) for i in range(1, 21)]
+    routes = DunDork.RouteTable(locs)
+    shared = routes.field([1, 20])
+    for loc_id in range(2, 2 + routes.max_cached_fields * 2):
+        routes.field([loc_id])
+        assert routes.field([20, 1]) is shared
+
+    assert len(routes.fields) == routes.max_cached_fields
+
+
+def test_npcs_head_for_relic_rooms_through_shared_field():
+    player = make_player()
+    player.locs[1].ObjectID = 3
+    npc = player.npcs[0]
+    npc.CurrentLocationID = 1
+    player.current_loc = 2
+
+    player.move_npcs()
+
+    assert npc.CurrentLocationID == 2
+
+
+def test_occupancy_index_tracks_npc_moves_and_defeats():
+    player = make_player()
+    npc = player.npcs[0]
+
+    player.relocate_npc(npc, player.current_loc)
+    assert player.active_hostile_npcs_here() == [npc]
+    assert player.room_visual_token(1).startswith("@")
+    assert player.room_visual_token(2) == "?002"
+
+    player.relocate_npc(npc, 2)
+    assert player.active_hostile_npcs_here() == []
+    assert player.room_visual_token(2) == "!002"
+
+    player.pending_encounter = npc
+    player.defeat_npc(npc)
+    assert player.npcs_in_room(2) == []
+    assert npc.CurrentLocationID == -1
+
+
+def test_run_command_advances_turn_and_reports_new_room():
+    player = make_player()
+    player.new_location = False
+
+    assert player.run_command("s") is True
+    assert player.turn_count == 1
+    assert player.current_loc == 2
+    assert player.new_location is False
+
+
+def test_headless_run_plays_to_completion_with_summary():
+    summary = DunDork.run_headless(seed=7, player_class="fighter", mutator="Ironman")
+
+    assert summary["seed"] == 7
+    assert summary["class"] == "fighter"
+    assert summary["mutator"] == "Ironman"
+    assert summary["ending"] in {"Death", "Timeout", "Quit", "Narrow Escape", "Warrior's Escape", "Scholar's Escape"}
+    assert summary == DunDork.run_headless(seed=7, player_class="fighter", mutator="Ironman")
+
+
+def test_simulate_runs_in_process_pool_matches_serial(monkeypatch):
+    # Workers unpickle jobs by module name, as they would for a normal import.
+    monkeypatch.setitem(sys.modules, "DunDorkCore", DunDork)
+    serial = DunDork.simulate_runs(3, seed=11, workers=1, max_steps=50)
+    pooled = DunDork.simulate_runs(3, seed=11, workers=2, max_steps=50)
+
+    assert [s["seed"] for s in serial] == [11, 12, 13]
+    assert pooled == serial
+    assert DunDork.summarize_runs(serial)["runs"] == 3
+
+
+def test_worlds_built_from_same_seed_are_identical():
+    def layout(seed):
+        rng = DunDork.GameRandom(seed)
+        locs, _, npcs, _ = DunDork.build_world(rng=rng)
+        return (
+            [(l.ID, l.Tag, l.ObjectID, l.Story) for l in locs],
+            [(n.ID, n.CurrentLocationID, tuple(n.Patrol)) for n in npcs],
+            rng.random(),
+        )
+
+    first = layout(42)
+    DunDork.random.random()  # global random state must not matter
+    assert layout(42) == first
+    assert layout(43) != first
+
+
+def test_player_randomness_comes_from_its_own_generator():
+    player = make_player()
+    player.rng = DunDork.GameRandom(3)
+    other = make_player()
+    other.rng = DunDork.GameRandom(3)
+    lore = []
+    for p in (player, other):
+        DunDork.random.seed(len(lore))
+        for _ in range(3):
+            p.location().Tag = "lore"
+            p.location().EventResolved = False
+            p.handle_room_event()
+        lore.append(sorted(p.lore_seen))
+
+    assert lore[0] == lore[1]
+    assert player.seed == 3
+
+
+def test_events_carry_fields_and_render_lazily():
+    player = make_player()
+    events = []
+    player.sinks.append(events.append)
+    player.output_func = None
+    npc = player.npcs[0]
+    npc.ObjectID = 99
+    player.relocate_npc(npc, player.current_loc)
+    player.pending_encounter = npc
+
+    player.resolve_attack()
+
+    kinds = [e.kind for e in events]
+    assert kinds == ["damage_dealt", "damage_taken"]
+    assert events[1].fields["amount"] == 8
+    assert events[1].fields["source"] == "Gump"
+    assert events[1].text == "Gump retaliates. You lose 8 health."
+
+
+def test_no_sinks_skips_message_formatting():
+    class Unformattable:
+        def __format__(self, spec):
+            raise AssertionError("event text should not be rendered")
+
+    player = make_player()
+    player.output_func = None
+
+    assert player.emit("noise", "{value}", value=Unformattable()) is None
+
+
+def test_xp_note_is_shown_in_text_but_not_speech():
+    player = make_player()
+    events = []
+    player.sinks.append(events.append)
+
+    player.add_xp(5, "trap avoided")
+
+    assert events[0].text == "+5 XP (trap avoided)"
+    assert events[0].speech == "+5 XP"
+
+
+def run_state(player):
+    return (
+        player.turn_count,
+        player.current_loc,
+        player.health,
+        player.xp,
+        list(player.backpack),
+        [(n.ID, n.CurrentLocationID) for n in player.npcs],
+        player.ending,
+    )
+
+
+def test_replay_reproduces_recorded_run(tmp_path):
+    player = DunDork.new_run(seed=11, player_class="scout", record=True, input_func=DunDork.default_prompt_answer, output_func=None)
+    player.begin_session()
+    choices = DunDork.random.Random(2)
+    for _ in range(150):
+        if player.game_over:
+            break
+        player.run_command(choices.choice(player.legal_commands()))
+    path = tmp_path / "run.replay"
+    player.replay.save(path)
+
+    replayed = DunDork.replay_run(DunDork.Replay.load(path))
+
+    assert run_state(replayed) == run_state(player)
+    assert replayed.replay.to_dict() == player.replay.to_dict()
+
+
+def test_replay_fast_forward_stops_at_turn():
+    player = DunDork.new_run(seed=4, record=True, input_func=DunDork.default_prompt_answer, output_func=None)
+    player.begin_session()
+    for command in ["n", "s", "map", "n", "e", "w"]:
+        player.run_command(command)
+
+    partial = DunDork.replay_run(player.replay, stop_turn=2)
+
+    assert partial.turn_count == 2
+    assert partial.output_func is None and partial.sinks == []
+
+
+def test_fork_branches_without_touching_the_original():
+    player = DunDork.new_run(seed=8, input_func=DunDork.default_prompt_answer, output_func=None)
+    player.begin_session()
+    before = run_state(player)
+    rooms = [loc.fields() for loc in player.locs]
+    routes = player.routes
+
+    branch = player.fork()
+    for command in ["n", "s", "e", "w", "n", "n"]:
+        branch.run_command(command)
+
+    assert run_state(player) == before
+    assert [loc.fields() for loc in player.locs] == rooms and player.routes is routes
+    assert branch.turn_count > 0
+    assert branch.locs.rooms is player.locs.rooms and branch.locs.changes != player.locs.changes
+
+
+def test_restore_returns_to_snapshot_and_replays_identically():
+    player = DunDork.new_run(seed=9, record=True, input_func=DunDork.default_prompt_answer, output_func=None)
+    player.begin_session()
+    snap = player.snapshot()
+    commands = ["n", "e", "s", "w", "map", "n"]
+    for command in commands:
+        player.run_command(command)
+    first = run_state(player)
+
+    player.restore(snap)
+    assert player.turn_count == 0 and len(player.replay.steps) == 1
+    for command in commands:
+        player.run_command(command)
+
+    assert run_state(player) == first
+    assert run_state(DunDork.replay_run(player.replay)) == first
+
+
+def test_state_key_ignores_random_stream_but_not_position():
+    player = make_player()
+    left = player.fork()
+    left.rng.seed(1)
+    right = player.fork()
+    right.rng.seed(2)
+
+    assert left.state_key() == right.state_key()
+    left.run_command("s")
+    assert left.state_key() != right.state_key()
+
+
+def test_search_policy_respects_node_budget_and_reuses_table():
+    player = DunDork.new_run(seed=2, input_func=DunDork.default_prompt_answer, output_func=None)
+    player.begin_session()
+    player.run_command(player.legal_commands()[0])
+    policy = DunDork.SearchPolicy(node_budget=60, seed=1)
+
+    command = policy(player)
+
+    assert command in player.legal_commands()
+    assert 60 <= policy.last["nodes"] < 60 + policy.depth + policy.rollout
+    assert policy.last["nodes_per_second"] > 0
+    root = policy.table[player.state_key()]
+    first = policy.last["playouts"]
+    policy(player)
+    assert root[0] == first + policy.last["playouts"]
+
+
+def test_search_policy_always_plays_out_at_least_once():
+    player = DunDork.new_run(seed=3, input_func=DunDork.default_prompt_answer, output_func=None)
+    player.begin_session()
+    player.run_command(player.legal_commands()[0])
+
+    for policy in (DunDork.SearchPolicy(node_budget=0), DunDork.SearchPolicy(node_budget=None, time_budget=0)):
+        assert policy(player) in player.legal_commands()
+        assert policy.last["playouts"] == 1
+    with pytest.raises(ValueError):
+        DunDork.SearchPolicy(node_budget=None)
+    with pytest.raises(ValueError):
+        DunDork.SearchPolicy(depth=0)
+
+
+def test_unknown_mutator_is_a_value_error():
+    with pytest.raises(ValueError, match="Unknown mutator: 'Nope'"):
+        DunDork.new_run(mutator="Nope", input_func=None, output_func=None)
+
+
+def test_combat_forecast_matches_playing_it_out():
+    player = make_player()
+    player.output_func = None
+    npc = player.npcs[0]
+    player.relocate_npc(npc, player.current_loc)
+    player.pending_encounter = npc
+    player.health = 30
+
+    forecast = player.combat_forecast()
+    for command in forecast["actions"]:
+        player.run_command(command)
+
+    assert forecast["outcome"] == "win"
+    assert forecast["actions"] == ["attack"] * 4
+    assert player.health == forecast["hp"] == 6
+    assert npc.ID in player.defeated_npcs
+
+
+def test_forecast_command_is_free_and_memoized():
+    player = make_player()
+    events = []
+    player.sinks.append(events.append)
+    player.output_func = None
+    npc = player.npcs[0]
+    npc.IsBoss = True
+    npc.Telegraph = {"name": "Shadow Lance", "damage": 8}
+    player.relocate_npc(npc, player.current_loc)
+    player.pending_encounter = npc
+    player.health = 20
+
+    player.run_command("forecast")
+    hits = DunDork._solve_combat_round.cache_info().hits
+    player.run_command("forecast")
+
+    assert player.health == 20 and npc.Telegraph is not None
+    assert [e.fields["outcome"] for e in events] == ["death", "death"]
+    assert DunDork._solve_combat_round.cache_info().hits > hits
+
+
+def test_questions_wait_for_the_next_command_without_input_func():
+    player = make_player()
+    player.input_func = None
+    player.output_func = None
+    player.backpack[0] = 1
+
+    assert player.run_command("drop torch") is False
+    assert player.pending_question["text"] == "Drop Torch? Y/N > "
+    assert player.turn_count == 0 and player.backpack[0] == 1
+
+    assert player.run_command("y") is True
+    assert player.pending_question is None
+    assert player.turn_count == 1 and player.location().ObjectID == 1
+
+
+def test_world_template_is_cached_until_the_csvs_change(tmp_path):
+    data_dir = tmp_path / "data"
+    shutil.copytree(DunDork.DATA_DIR, data_dir, ignore=shutil.ignore_patterns("*.json", "*.png"))
+    cache_path = tmp_path / "world.cache"
+
+    first = DunDork.world_template(data_dir, cache_path)
+    assert DunDork.world_template(data_dir, cache_path) is first
+    assert cache_path.exists()
+
+    # A touched but unchanged file is recognised by its digest.
+    locations = data_dir / "locations.csv"
+    os.utime(locations, ns=(1, 1))
+    DunDork.WORLD_TEMPLATES.clear()
+    reloaded = DunDork.world_template(data_dir, cache_path)
+    assert reloaded is not first
+    assert [r.fields() for r in reloaded.rooms] == [r.fields() for r in first.rooms]
+    assert reloaded.routes.dist == first.routes.dist
+
+    # A damaged cache, or one in another format, is rebuilt rather than trusted.
+    for damaged in (b"\x80\x04garbage", cache_path.read_bytes()[:100], b"\xfb\x00\x00\x00\x00"):
+        cache_path.write_bytes(damaged)
+        DunDork.WORLD_TEMPLATES.clear()
+        assert DunDork.world_template(data_dir, cache_path).routes.dist == first.routes.dist
+
+    locations.write_text(locations.read_text(encoding="utf-8").replace("small room with stone walls", "tiny cell"), encoding="utf-8")
+    changed = DunDork.world_template(data_dir, cache_path)
+    assert changed.rooms[0].Story.startswith("You're in a tiny cell.")
+
+    locs, _, _, routes = changed.instantiate(DunDork.GameRandom(1))
+    locs[0].Story = "edited"
+    locs[0].N = 5
+    routes.disable_edge(1, "S")
+    assert changed.rooms[0].Story.startswith("You're in a tiny cell.") and changed.rooms[0].N == 0
+    assert not changed.routes.disabled and locs.rooms is changed.rooms and locs.changes[0]["N"] == 5
+
+
+def test_runs_share_static_world_and_copy_it_on_edit():
+    first = DunDork.new_run(1, input_func=None, output_func=None)
+    second = DunDork.new_run(2, input_func=None, output_func=None)
+    assert first.routes is second.routes
+    assert first.locs[0].info is second.locs[0].info
+    assert not hasattr(first.locs[0], "__dict__")
+
+    assert first.objs is second.objs and first.obj_by_id is second.obj_by_id
+
+    first.writable_routes().disable_edge(1, "S")
+    first.locs[0].N = 11
+    assert first.routes is not second.routes and not second.routes.disabled
+    assert second.locs[0].N == 0 and first.locs[0].info.N == 0
+    assert first.locs.changes == {0: {"N": 11}} and not second.locs.changes
+
+    player = make_player()
+    assert isinstance(player.locs[0], DunDork.Location) and player.locs[0].IsDark == 0
+    assert isinstance(player.npcs[0], DunDork.NPC) and player.npcs[0].StartLocationID == 0
+
+
+def test_saved_state_resumes_the_same_run():
+    commands = ["n", "e", "s", "w", "n", "quit"]
+    player = DunDork.new_run(seed=12, record=True, input_func=None, output_func=None)
+    player.begin_session()
+    for command in commands[:3]:
+        player.run_command(command)
+
+    state = json.loads(json.dumps(DunDork.save_state(player)))
+    thawed = DunDork.load_state(state, input_func=None, output_func=None)
+    assert run_state(thawed) == run_state(player)
+    assert thawed.locs.changes == player.locs.changes and thawed.rng.random() == player.rng.random()
+
+    for command in commands[3:]:
+        player.run_command(command)
+        thawed.run_command(command)
+    assert run_state(thawed) == run_state(player)
+    assert thawed.pending_question == player.pending_question is not None
+    assert thawed.replay.steps == player.replay.steps
+
+
+def test_save_journal_replays_changes_after_a_crash(tmp_path, monkeypatch):
+    base_path, log_path = tmp_path / "save.json", tmp_path / "save.journal"
+
+    def play(journal, commands):
+        player = DunDork.new_run(seed=4, record=True, input_func=None, output_func=None)
+        player.begin_session()
+        journal.record(DunDork.save_state(player))
+        for command in commands:
+            player.run_command(command)
+            journal.record(DunDork.save_state(player))
+            journal.close()
+        return json.loads(json.dumps(DunDork.save_state(player)))
+
+    commands = ["n", "e", "s", "w", "n", "look", "n", "e"]
+    journal = DunDork.SaveJournal(base_path, log_path, compact_bytes=300)
+    expected = play(journal, commands)
+    assert DunDork.read_run_file(base_path, DunDork.world_template())["generation"] > 1
+
+    with open(log_path, "a", encoding="utf-8") as handle:
+        handle.write('{"gen": 9, "ops": [["set", ["play')
+    assert DunDork.SaveJournal(base_path, log_path).load() == expected
+    assert log_path.read_text().endswith("\n")
+
+    # A whole last line that lost its newline is kept, and the next turn starts a line of its own.
+    resumed = DunDork.SaveJournal(base_path, log_path)
+    state = resumed.load()
+    state["player"]["xp"] += 1
+    resumed.record(state)
+    resumed.close()
+    log_path.write_text(log_path.read_text().rstrip("\n"))
+    resumed = DunDork.SaveJournal(base_path, log_path)
+    assert resumed.load() == state
+    state["player"]["xp"] += 1
+    resumed.record(state)
+    resumed.close()
+    assert DunDork.SaveJournal(base_path, log_path).load() == state
+
+    # Compactions that never land leave the first base and every logged change.
+    journal.clear()
+    real_write = DunDork.SaveJournal._write_base
+    monkeypatch.setattr(
+        DunDork.SaveJournal,
+        "_write_base",
+        lambda self, data, generation: generation == 1 and real_write(self, data, generation),
+    )
+    assert play(journal, commands) == expected
+    assert journal.generation > 1 and DunDork.read_run_file(base_path, DunDork.world_template())["generation"] == 1
+    assert DunDork.SaveJournal(base_path, log_path).load() == expected
+
+    journal.clear()
+    assert not base_path.exists() and not log_path.exists()
+
+
+def test_save_writer_coalesces_bursts_and_flushes_on_close():
+    class SlowJournal:
+        def __init__(self):
+            self.records = []
+            self.gate = threading.Event()
+            self.closed = False
+
+        def record(self, state):
+            self.gate.wait()
+            self.records.append(state)
+
+        def clear(self):
+            self.records.append("cleared")
+
+        def close(self):
+            self.closed = True
+
+    journal = SlowJournal()
+    writer = DunDork.SaveWriter(journal)
+    for turn in range(20):
+        writer.submit({"turn": turn})
+    journal.gate.set()
+    writer.flush()
+    assert journal.records[-1] == {"turn": 19} and len(journal.records) <= 2
+
+    writer.submit({"turn": 20})
+    writer.clear()
+    writer.submit({"turn": 21})
+    writer.close()
+    assert journal.records[-2:] == ["cleared", {"turn": 21}] and journal.closed
+
+
+def test_save_writer_survives_a_failed_write(caplog):
+    class FlakyJournal:
+        def __init__(self):
+            self.records = []
+
+        def record(self, state):
+            if state["turn"] == 1:
+                raise KeyError("turn")
+            self.records.append(state)
+
+        def close(self):
+            pass
+
+    journal = FlakyJournal()
+    writer = DunDork.SaveWriter(journal)
+    writer.submit({"turn": 1})
+    writer.flush()
+    writer.submit({"turn": 2})
+    writer.close()
+
+    assert journal.records == [{"turn": 2}] and isinstance(writer.error, KeyError)
+    assert "Could not write the run save" in caplog.text
+
+
+def test_packed_run_state_round_trips_and_checks_the_world(tmp_path):
+    player = DunDork.new_run(seed=6, record=True, input_func=DunDork.default_prompt_answer, output_func=None)
+    player.begin_session()
+    for command in ["n", "e", "take", "s", "w", "n"]:
+        player.run_command(command)
+    state = json.loads(json.dumps(DunDork.save_state(player)))
+    template = DunDork.world_template()
+
+    data = DunDork.pack_state(state, template)
+    assert data.startswith(DunDork.RUN_FILE_MAGIC) and len(data) < len(json.dumps(state)) / 2
+    assert DunDork.unpack_state(data, template) == state
+
+    (tmp_path / "run.dork").write_bytes(data)
+    (tmp_path / "run.json").write_text(json.dumps({"version": 1, "locs": []}))
+    assert DunDork.read_run_file(tmp_path / "run.dork", template) == state
+    assert DunDork.read_run_file(tmp_path / "run.json", template)["version"] == 1
+
+    other = DunDork.WorldTemplate(template.gens, template.rooms, template.objs, template.npcs, template.routes)
+    other.digest = "0" * 64
+    with pytest.raises(ValueError, match="does not match this world"):
+        DunDork.unpack_state(data, other)
+
+    report = DunDork.benchmark_saves(runs=2, turns=5)
+    assert report["binary"]["bytes"] < report["json"]["bytes"]
+
+
+def test_meta_increments_from_many_writers_are_never_lost(tmp_path):
+    meta_path = tmp_path / "meta.json"
+
+    def post_wins():
+        for _ in range(50):
+            DunDork.post_meta(meta_path, [DunDork.win_increment("fighter", 10, "Narrow Escape")], merge_bytes=500)
+
+    threads = [threading.Thread(target=post_wins) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    DunDork.post_meta(meta_path, [DunDork.win_increment("scout", 5, "Scholar's Escape"), {"last_class": "scholar"}])
+
+    meta = DunDork.load_meta(meta_path)
+    assert meta["wins"] == 201 and meta["total_xp"] == 2005
+    assert meta["best_ending"] == "Scholar's Escape" and meta["last_class"] == "scholar"
+    assert meta["unlocked_classes"] == ["adventurer", "fighter", "scholar", "scout"]
+
+    # A merge that stopped after saving the folded file must not count its log twice.
+    DunDork.merge_meta(meta_path)
+    log_path = tmp_path / "meta.json.merging"
+    token = DunDork._read_meta_file(meta_path)["merged_log"]
+    log_path.write_text('{"log": "%s"}\n{"wins": 7}\n' % token)
+    assert DunDork.load_meta(meta_path)["wins"] == 201
+    DunDork.merge_meta(meta_path)
+    assert not log_path.exists() and DunDork.load_meta(meta_path)["wins"] == 201
+
+
+def test_meta_log_torn_by_a_crash_keeps_later_posts(tmp_path):
+    meta_path = tmp_path / "meta.json"
+    log_path = tmp_path / "meta.json.log"
+    win = DunDork.win_increment("fighter", 10, "Narrow Escape")
+
+    log_path.write_text('{"log": "ab')
+    DunDork.post_meta(meta_path, [win])
+    DunDork.post_meta(meta_path, [win])
+    with open(log_path, "a", encoding="utf-8") as handle:
+        handle.write('{"wins": 1, "total_')
+    DunDork.post_meta(meta_path, [win])
+    with open(log_path, "a", encoding="utf-8") as handle:
+        handle.write('{"wins": 1, "total_xp": 10}')
+    DunDork.post_meta(meta_path, [win])
+
+    assert DunDork.load_meta(meta_path)["wins"] == 5 and DunDork.load_meta(meta_path)["total_xp"] == 50
+    DunDork.merge_meta(meta_path)
+    assert not log_path.exists() and DunDork.load_meta(meta_path)["wins"] == 5
+
+
+def test_run_store_merges_posted_meta_in_one_transaction(tmp_path):
+    store = DunDork.RunStore(tmp_path / "runs.db")
+    other = DunDork.RunStore(tmp_path / "runs.db")
+    store.post_meta("ann", [DunDork.win_increment("adventurer", 30, "Warrior's Escape")] * 3)
+    assert other.get_meta("ann")["wins"] == 3
+    store.post_meta("ann", [DunDork.win_increment("scout", 10, "Narrow Escape")])
+    assert other.get_meta("ann")["total_xp"] == 100
+
+    other.merge_meta()
+    assert store.db.execute("SELECT COUNT(*) FROM meta_increments").fetchone() == (0,)
+    meta = store.get_meta("ann")
+    assert meta["wins"] == 4 and meta["best_ending"] == "Warrior's Escape" and "scholar" in meta["unlocked_classes"]
+    store.close()
+    other.close()
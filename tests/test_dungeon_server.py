@@ -0,0 +1,171 @@
+from pathlib import Path
+import asyncio
+import importlib.util
+import socket
+
+import pytest
+
+
+MODULE_PATH = Path(__file__).resolve().parents[1] / "src" / "DunDorkServer.py"
+SPEC = importlib.util.spec_from_file_location("DunDorkServer", MODULE_PATH)
+DunDorkServer = importlib.util.module_from_spec(SPEC)
+SPEC.loader.exec_module(DunDorkServer)
+
+
+def test_sessions_play_independently_over_loopback():
+    async def scenario():
+        game = DunDorkServer.GameServer()
+        server = await game.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            client = await DunDorkServer.GameClient.connect("127.0.0.1", port)
+            first = await client.request(op="new", seed=3, id=1)
+            second = await client.request(op="new", seed=3)
+            assert first["ok"] and first["id"] == 1
+            assert first["state"] == second["state"]
+            assert any(e["kind"] == "room_entered" for e in first["events"])
+
+            reply = await client.request(op="command", session=first["session"], text="quit")
+            assert reply["question"] == "Are you sure? Y/N > "
+            assert reply["events"][-1]["kind"] == "question"
+            reply = await client.request(op="command", session=first["session"], text="y")
+            assert reply["question"] is None
+            assert reply["delta"]["game_over"] is True and reply["delta"]["ending"] == "Quit"
+
+            other = await client.request(op="state", session=second["session"])
+            assert other["state"]["game_over"] is False
+            missing = await client.request(op="command", session="nope", text="n")
+            assert missing == {"ok": False, "error": "Unknown session: 'nope'"}
+            closed = await client.request(op="close", session=first["session"])
+            assert closed["ok"] and list(game.sessions) == [second["session"]]
+            await client.close()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets unavailable")
+def test_unix_socket_and_bad_lines(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "dork.sock")
+        server = await DunDorkServer.GameServer().start(path=path)
+        async with server:
+            client = await DunDorkServer.GameClient.connect(path=path)
+            client.writer.write(b"not json\n")
+            reply = await client.reader.readline()
+            assert b'"ok": false' in reply
+            reply = await client.request(op="new", player_class="wizard")
+            assert reply == {"ok": False, "error": "Unknown class: 'wizard'"}
+            await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_load_generator_reports_latency_per_verb():
+    loadgen_path = MODULE_PATH.with_name("DunDorkLoadgen.py")
+    spec = importlib.util.spec_from_file_location("DunDorkLoadgen", loadgen_path)
+    DunDorkLoadgen = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(DunDorkLoadgen)
+
+    async def scenario():
+        game = DunDorkServer.GameServer()
+        server = await game.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            report = await DunDorkLoadgen.run_load(
+                clients=3, concurrency=2, commands=5, script=["look", "inventory"], port=port, sample_interval=0.05
+            )
+        assert report["errors"] == 0 and report["commands"] == 15
+        assert report["verbs"]["NEW"]["count"] == 3
+        assert report["verbs"]["LOOK"]["count"] == 9
+        assert report["verbs"]["LOOK"]["p50_ms"] <= report["verbs"]["LOOK"]["p99_ms"]
+        assert report["server"] and game.sessions == {}
+        assert report["peak_sessions"] == 2
+
+    asyncio.run(scenario())
+    assert DunDorkLoadgen.percentile([1, 2, 3, 4], 0.5) == 2
+
+
+def test_least_recently_used_sessions_hibernate_to_disk(tmp_path):
+    async def scenario():
+        game = DunDorkServer.GameServer(hibernate_dir=tmp_path, max_resident=1, idle_seconds=60)
+        first = await game.handle_request({"op": "new", "seed": 5})
+        await game.handle_request({"op": "command", "session": first["session"], "text": "n"})
+        second = await game.handle_request({"op": "new", "seed": 5})
+        assert list(game.sessions) == [second["session"]]
+        assert (tmp_path / f"{first['session']}.run").exists()
+
+        reply = await game.handle_request({"op": "command", "session": first["session"], "text": "quit"})
+        assert reply["ok"] and reply["question"] == "Are you sure? Y/N > "
+        assert reply["delta"] == {"question": "Are you sure? Y/N > "}
+        assert list(game.sessions) == [first["session"]] and game.hibernated == {second["session"]}
+
+        stats = await game.handle_request({"op": "stats"})
+        assert stats["sessions"] == 2 and stats["resident"] == 1
+        assert await game.hibernate_idle(now=game.sessions[first["session"]].last_active + 60) == 1
+
+        restarted = DunDorkServer.GameServer(hibernate_dir=tmp_path)
+        reply = await restarted.handle_request({"op": "command", "session": first["session"], "text": "y"})
+        assert reply["delta"]["ending"] == "Quit"
+        closed = await restarted.handle_request({"op": "close", "session": second["session"]})
+        assert closed["ok"] and not list(tmp_path.glob("*.run"))
+
+    asyncio.run(scenario())
+
+
+def test_failed_hibernation_is_logged_and_the_sweep_carries_on(tmp_path, caplog):
+    async def scenario():
+        game = DunDorkServer.GameServer(hibernate_dir=tmp_path, idle_seconds=0.01)
+        first = await game.handle_request({"op": "new", "seed": 5})
+        write_session = game.write_session
+
+        def broken(path, state):
+            game.write_session = write_session
+            raise OSError("disk full")
+
+        game.write_session = broken
+        sweeper = asyncio.create_task(game.sweep_idle())
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if game.hibernated:
+                break
+        sweeper.cancel()
+        assert game.hibernated == {first["session"]} and not game.sessions
+
+        second, third = await asyncio.gather(
+            game.handle_request({"op": "state", "session": first["session"]}),
+            game.handle_request({"op": "state", "session": first["session"]}),
+        )
+        assert second == third and second["ok"] and list(game.sessions) == [first["session"]]
+
+    asyncio.run(scenario())
+    assert "Could not hibernate session" in caplog.text and "disk full" in caplog.text
+
+
+def test_run_store_keeps_slots_and_finished_runs(tmp_path):
+    async def scenario():
+        game = DunDorkServer.GameServer(store=tmp_path / "runs.db")
+        first = await game.handle_request({"op": "new", "seed": 5, "player": "ann"})
+        await game.handle_request({"op": "command", "session": first["session"], "text": "n"})
+        saved = await game.handle_request({"op": "save", "session": first["session"], "slot": "before quit"})
+        assert saved["ok"]
+
+        listing = await game.handle_request({"op": "saves", "player": "ann"})
+        assert [row["slot"] for row in listing["saves"]] == ["before quit"]
+        assert listing["saves"][0]["player_class"] == "adventurer"
+
+        loaded = await game.handle_request({"op": "load", "player": "ann", "slot": "before quit"})
+        state = (await game.handle_request({"op": "state", "session": first["session"]}))["state"]
+        assert loaded["ok"] and loaded["state"]["room"] == state["room"]
+        missing = await game.handle_request({"op": "load", "player": "bob", "slot": "before quit"})
+        assert missing == {"ok": False, "error": "No save in slot 'before quit'."}
+
+        for text in ["quit", "y"]:
+            await game.handle_request({"op": "command", "session": loaded["session"], "text": text})
+        board = await game.handle_request({"op": "leaderboard", "player_class": "adventurer"})
+        assert [(run["player"], run["ending"]) for run in board["runs"]] == [("ann", "Quit")]
+
+        plain = await DunDorkServer.GameServer().handle_request({"op": "saves"})
+        assert plain == {"ok": False, "error": "Exception: This server has no run store."}
+        game.store.close()
+
+    asyncio.run(scenario())